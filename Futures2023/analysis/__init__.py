@@ -0,0 +1,9 @@
+"""Analysis of the recorded pillar sessions
+
+    python -m analysis --data data --out results
+
+See loading.py for reading the recordings and metrics.py for the metrics.
+"""
+from .loading import Frames, load_sessions, parse_csv, parse_rec, source_paths
+from .metrics import (coactivation, hue_distribution, inter_touch_intervals, observed_seconds, summarise,
+                      touch_rates, touch_runs)
@@ -0,0 +1,114 @@
+"""Command line entry point: python -m analysis
+
+Loads every recording in --data, computes the metrics and writes
+    <out>/metrics.npz    every array (rates, dwell times, intervals, co-activation, hue histograms)
+    <out>/summary.json   the parameters, the input files and summary statistics
+The same inputs and parameters always give the same outputs.
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from .loading import NUM_TUBES, load_sessions, source_paths
+from .metrics import coactivation, hue_distribution, inter_touch_intervals, summarise, touch_rates, touch_runs
+
+
+def analyse(frames, max_gap=5.0, hue_bins=16):
+    runs = touch_runs(frames, max_gap)
+    intervals = inter_touch_intervals(runs)
+    coact = coactivation(frames)
+    return dict(
+        touch_rates=touch_rates(frames, runs, max_gap),
+        touch_pillar=runs["pillar"],
+        touch_tube=runs["tube"],
+        touch_start=runs["start"],
+        dwell=runs["dwell"],
+        interval_pillar=intervals["pillar"],
+        interval_tube=intervals["tube"],
+        interval=intervals["interval"],
+        coactivation=coact["counts"],
+        coactivation_conditional=coact["conditional"],
+        pillar_coactivation=coact["pillar_counts"],
+        hue_histogram=hue_distribution(frames, hue_bins),
+    ), coact["instants"]
+
+
+def plot_touches(frames, session):
+    """Touch raster of one session, which tube of which pillar was touched when"""
+    import matplotlib.pyplot as plt
+
+    mask = frames["session"] == session
+    t = frames["t"][mask] - frames["t"][mask].min(initial=0)
+    fig, ax = plt.subplots()
+    for p in np.unique(frames["pillar"][mask]):
+        rows = frames["pillar"][mask] == p
+        touched_rows, tubes = np.nonzero(frames["touch"][mask][rows])
+        ax.plot(t[rows][touched_rows], tubes + p * (frames.num_tubes + 1), "|", label=f"Pillar {p}")
+    ax.set_xlabel("Seconds")
+    ax.set_ylabel("Tube")
+    ax.set_title(f"Touches in {os.path.basename(frames.sources[session])}")
+    ax.legend()
+    plt.show()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Touch and light metrics over the recorded pillar sessions")
+    parser.add_argument("--data", default="data", help="Folder with raveforest_data_*.csv and *.frames.rec files")
+    parser.add_argument("--cache", default=".analysis_cache", help="Folder for parsed CSV files, empty to disable")
+    parser.add_argument("--out", default="results", help="Folder for metrics.npz and summary.json")
+    parser.add_argument("--workers", default=None, type=int, help="Processes parsing CSV files (default all cores)")
+    parser.add_argument("--max-gap", default=5.0, type=float, help="Seconds without samples that split a session")
+    parser.add_argument("--hue-bins", default=16, type=int)
+    parser.add_argument("--num-tubes", default=NUM_TUBES, type=int)
+    parser.add_argument("--plot", default=None, type=int, help="Show the touch raster of this session index")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    paths = source_paths(args.data)
+    frames = load_sessions(args.data, args.cache or None, args.workers, args.num_tubes, paths)
+    loaded = time.perf_counter()
+    print(f"Loaded {len(frames)} samples from {len(paths)} files in {loaded - started:.2f}s")
+
+    results, instants = analyse(frames, args.max_gap, args.hue_bins)
+    print(f"Computed metrics in {time.perf_counter() - loaded:.3f}s")
+
+    os.makedirs(args.out, exist_ok=True)
+    np.savez_compressed(os.path.join(args.out, "metrics.npz"), **results)
+
+    rates = results["touch_rates"]
+    pillars = [int(p) for p in frames.pillars]
+    summary = dict(
+        parameters=dict(max_gap=args.max_gap, hue_bins=args.hue_bins, num_tubes=args.num_tubes),
+        sources=[os.path.basename(p) for p in paths],
+        samples=len(frames),
+        instants=instants,
+        touches=int(len(results["dwell"])),
+        touch_rate_per_minute={p: [round(float(r), 4) for r in rates[p]] for p in pillars},
+        dwell_seconds=summarise(results["dwell"]),
+        inter_touch_seconds=summarise(results["interval"]),
+        pillar_coactivation=results["pillar_coactivation"].astype(int).tolist(),
+        hue_histogram={p: results["hue_histogram"][p].astype(int).tolist() for p in pillars},
+    )
+    with open(os.path.join(args.out, "summary.json"), "w") as f:
+        json.dump(summary, f, indent=2, sort_keys=True)
+
+    for p in pillars:
+        print(f"Pillar {p}: {rates[p].sum():.2f} touches/min " + " ".join(f"{r:.2f}" for r in rates[p]))
+    dwell, interval = summary["dwell_seconds"], summary["inter_touch_seconds"]
+    if dwell["count"]:
+        print(f"Dwell: {dwell['count']} touches, median {dwell['p50']:.2f}s, p90 {dwell['p90']:.2f}s")
+    if interval["count"]:
+        print(f"Inter-touch: median {interval['p50']:.2f}s, p90 {interval['p90']:.2f}s")
+    print(f"Pillar co-activation (instants both touched):\n{results['pillar_coactivation'].astype(int)}")
+    print(f"Wrote {args.out}/metrics.npz and {args.out}/summary.json")
+
+    if args.plot is not None:
+        plot_touches(frames, args.plot)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,213 @@
+"""Loading the recorded sessions into NumPy arrays
+
+Two sources, both turned into the same Frames arrays:
+
+    data/raveforest_data_*.csv        the 2023 recordings, rows of str() dicts parsed with
+                                      regular expressions (never eval) and cached as .npz
+    data/raveforest_session_*.rec     raveforest/session_recorder.py recordings, memory mapped
+
+CSV files are parsed in parallel worker processes. The parsed arrays are
+cached per file in `cache_dir`, keyed on the file's size and modification
+time, so later runs only parse new or changed files.
+"""
+import csv
+import glob
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "raveforest"))
+from session_recorder import load_recording, recording_paths, touch_matrix  # noqa: E402
+
+NUM_TUBES = 7
+CACHE_VERSION = 1
+FIELDS = ("t", "session", "pillar", "touch", "hue", "brightness")
+
+# e.g. "0: {'id': 0, ... 'touch_status': [False, True, ...], ..."
+TOUCH_RE = re.compile(r"(\d+): \{'id': \d+.*?'touch_status': \[([^\]]*)\]")
+# e.g. "0: {'lights': [[0, 0], [85, 200], ...], 'notes': [...]}"
+LIGHTS_RE = re.compile(r"(\d+): \{'lights': \[(.*?)\]\], 'notes'")
+NUMBER_RE = re.compile(r"\d+")
+
+
+class Frames(dict):
+    """Column arrays of one sample per row and pillar
+
+    t           float64  seconds (CSV timestamps are local time, spread evenly within each second)
+    session     int32    index into .sources
+    pillar      uint8
+    touch       bool     (n, num_tubes)
+    hue         uint8    (n, num_tubes) hue sent to each tube
+    brightness  uint8    (n, num_tubes)
+    """
+
+    def __init__(self, arrays, sources=()):
+        super().__init__(arrays)
+        self.sources = list(sources)
+
+    def __len__(self):
+        return len(self["t"])
+
+    @property
+    def num_tubes(self):
+        return self["touch"].shape[1]
+
+    @property
+    def pillars(self):
+        return np.unique(self["pillar"])
+
+
+def _empty(num_tubes=NUM_TUBES):
+    return dict(
+        t=np.zeros(0, np.float64), pillar=np.zeros(0, np.uint8),
+        touch=np.zeros((0, num_tubes), bool), hue=np.zeros((0, num_tubes), np.uint8),
+        brightness=np.zeros((0, num_tubes), np.uint8),
+    )
+
+
+def _fit_columns(values, num_tubes):
+    values = values[:num_tubes]
+    return values + [0] * (num_tubes - len(values))
+
+
+def _csv_times(stamps):
+    """'2023-10-08-17-00-48' strings to seconds, rows within one second spread evenly over it"""
+    if not stamps:
+        return np.zeros(0, np.float64)
+    iso = np.array([s[:10] + "T" + s[11:].replace("-", ":") for s in stamps], dtype="datetime64[s]")
+    seconds = (iso - np.datetime64(0, "s")).astype(np.float64)
+    # Rows are in order, so the rank within a run of equal stamps is the distance from the run start
+    starts = np.r_[0, np.flatnonzero(np.diff(seconds)) + 1]
+    counts = np.diff(np.r_[starts, len(seconds)])
+    rank = np.arange(len(seconds)) - np.repeat(starts, counts)
+    return seconds + rank / np.repeat(counts, counts)
+
+
+def parse_csv(path, num_tubes=NUM_TUBES):
+    """Frames arrays of one raveforest_data_*.csv file"""
+    stamps, rows, pillars, touches, hues, brightnesses = [], [], [], [], [], []
+    with open(path, newline="") as f:
+        for row in csv.reader(f):
+            if len(row) < 4:
+                continue
+            lights = {int(p): NUMBER_RE.findall(values) for p, values in LIGHTS_RE.findall(row[3])}
+            for p, touch in TOUCH_RE.findall(row[2]):
+                p = int(p)
+                numbers = [int(n) for n in lights.get(p, ())]
+                rows.append(len(stamps))
+                pillars.append(p)
+                touches.append(_fit_columns([s.strip() == "True" for s in touch.split(",")], num_tubes))
+                hues.append(_fit_columns(numbers[0::2], num_tubes))
+                brightnesses.append(_fit_columns(numbers[1::2], num_tubes))
+            stamps.append(row[0])
+    if not rows:
+        return _empty(num_tubes)
+    return dict(
+        t=_csv_times(stamps)[np.array(rows)],  # every pillar of a row shares its time
+        pillar=np.array(pillars, np.uint8),
+        touch=np.array(touches, bool),
+        hue=np.array(hues, np.uint8),
+        brightness=np.array(brightnesses, np.uint8),
+    )
+
+
+def parse_rec(path, num_tubes=NUM_TUBES):
+    """Frames arrays of one session_recorder .frames.rec segment"""
+    records = load_recording(path)
+    tubes = records.dtype["hue"].shape[0]
+    arrays = dict(
+        t=np.asarray(records["t"], np.float64),
+        pillar=np.asarray(records["pillar"], np.uint8),
+        touch=touch_matrix(records, tubes),
+        hue=np.asarray(records["hue"], np.uint8),
+        brightness=np.asarray(records["brightness"], np.uint8),
+    )
+    if tubes != num_tubes:
+        for key in ("touch", "hue", "brightness"):
+            resized = np.zeros((len(records), num_tubes), arrays[key].dtype)
+            width = min(tubes, num_tubes)
+            resized[:, :width] = arrays[key][:, :width]
+            arrays[key] = resized
+    return arrays
+
+
+def _cache_path(cache_dir, path):
+    return os.path.join(cache_dir, os.path.basename(path) + ".npz")
+
+
+def _source_key(path, num_tubes):
+    stat = os.stat(path)
+    return np.array([CACHE_VERSION, stat.st_size, stat.st_mtime_ns, num_tubes], np.int64)
+
+
+def load_cached(path, cache_dir, num_tubes=NUM_TUBES):
+    """Parsed arrays of a CSV from the cache, None when missing or out of date"""
+    cache_path = _cache_path(cache_dir, path)
+    if not os.path.exists(cache_path):
+        return None
+    try:
+        with np.load(cache_path) as cached:
+            if not np.array_equal(cached["source_key"], _source_key(path, num_tubes)):
+                return None
+            return {key: cached[key] for key in FIELDS if key != "session"}
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def parse_and_cache(path, cache_dir, num_tubes=NUM_TUBES):
+    arrays = parse_csv(path, num_tubes)
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Written under a temporary name so a half written cache is never read
+        tmp_path = _cache_path(cache_dir, path) + ".tmp.npz"
+        np.savez(tmp_path, source_key=_source_key(path, num_tubes), **arrays)
+        os.replace(tmp_path, _cache_path(cache_dir, path))
+    return arrays
+
+
+def source_paths(data_dir="data"):
+    """Every CSV and .frames.rec recording in data_dir, oldest first by the time in its name"""
+    csv_paths = glob.glob(os.path.join(data_dir, "raveforest_data_*.csv"))
+    rec_paths = recording_paths(data_dir, "frames")
+    # Both names end in a %Y-%m-%d-%H-%M-%S stamp, which sorts chronologically
+    return sorted(csv_paths + rec_paths, key=lambda p: os.path.basename(p).split("_")[-1])
+
+
+def load_sessions(data_dir="data", cache_dir=".analysis_cache", workers=None, num_tubes=NUM_TUBES, paths=None):
+    """Frames of every recording in data_dir, each file its own session
+
+    CSV files missing from the cache are parsed in `workers` processes
+    (os.cpu_count() by default), everything else is read directly.
+    """
+    if paths is None:
+        paths = source_paths(data_dir)
+    loaded = {}
+    to_parse = []
+    for path in paths:
+        if path.endswith(".rec"):
+            loaded[path] = parse_rec(path, num_tubes)
+            continue
+        cached = load_cached(path, cache_dir, num_tubes) if cache_dir else None
+        if cached is None:
+            to_parse.append(path)
+        else:
+            loaded[path] = cached
+
+    if len(to_parse) > 1 and workers != 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {path: pool.submit(parse_and_cache, path, cache_dir, num_tubes) for path in to_parse}
+            for path, future in futures.items():
+                loaded[path] = future.result()
+    else:
+        for path in to_parse:
+            loaded[path] = parse_and_cache(path, cache_dir, num_tubes)
+
+    parts = [loaded[path] for path in paths]
+    if not parts:
+        return Frames(dict(_empty(num_tubes), session=np.zeros(0, np.int32)))
+    arrays = {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+    arrays["session"] = np.repeat(np.arange(len(parts), dtype=np.int32), [len(part["t"]) for part in parts])
+    return Frames(arrays, sources=paths)
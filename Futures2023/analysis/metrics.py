@@ -0,0 +1,142 @@
+"""Vectorised interaction metrics over Frames (see loading.py)
+
+Samples are grouped into blocks: one pillar, one session and no gap longer
+than `max_gap` seconds between consecutive samples. A touch is a run of
+consecutive touched samples of one tube within a block, so runs never span
+a restart of the controller or a gap in the recording.
+"""
+import numpy as np
+
+
+def sort_frames(frames):
+    """Indices putting frames in (session, pillar, time) order"""
+    return np.lexsort((frames["t"], frames["pillar"], frames["session"]))
+
+
+def blocks(frames, max_gap=5.0):
+    """Sorted order, block id per sorted sample, and the time each sample covers
+
+    A sample covers the time until the next sample of its block, the last
+    sample of a block the median sample interval.
+    """
+    order = sort_frames(frames)
+    if len(order) == 0:
+        return order, np.zeros(0, np.int64), np.zeros(0, np.float64)
+    t = frames["t"][order]
+    key = frames["session"][order].astype(np.int64) * 256 + frames["pillar"][order]
+    dt = np.diff(t)
+    new_block = np.r_[True, (np.diff(key) != 0) | (dt > max_gap)]
+    block = np.cumsum(new_block) - 1
+
+    inside = ~new_block[1:]
+    typical = float(np.median(dt[inside])) if inside.any() else 0.0
+    covers = np.full(len(t), typical)
+    covers[:-1][inside] = dt[inside]
+    return order, block, covers
+
+
+def touch_runs(frames, max_gap=5.0):
+    """Every touch as (pillar, tube, start, dwell), in time order per tube"""
+    order, block, covers = blocks(frames, max_gap)
+    touched = frames["touch"][order]
+    t = frames["t"][order]
+    pillar = frames["pillar"][order]
+
+    same_as_prev = np.r_[False, block[1:] == block[:-1]][:, None]
+    same_as_next = np.r_[block[1:] == block[:-1], False][:, None]
+    prev = np.zeros_like(touched)
+    prev[1:] = touched[:-1]
+    following = np.zeros_like(touched)
+    following[:-1] = touched[1:]
+    onset = touched & ~(prev & same_as_prev)
+    offset = touched & ~(following & same_as_next)
+
+    # Onsets and offsets of one tube alternate in sorted order, so the nth of each pair up
+    tubes, start_rows = np.nonzero(onset.T)
+    _, end_rows = np.nonzero(offset.T)
+    return dict(
+        pillar=pillar[start_rows],
+        tube=tubes.astype(np.uint8),
+        block=block[start_rows],
+        start=t[start_rows],
+        dwell=t[end_rows] - t[start_rows] + covers[end_rows],
+    )
+
+
+def observed_seconds(frames, max_gap=5.0):
+    """Seconds of recording per pillar id (array indexed by pillar)"""
+    order, _, covers = blocks(frames, max_gap)
+    pillar = frames["pillar"][order]
+    return np.bincount(pillar, weights=covers, minlength=int(pillar.max(initial=0)) + 1)
+
+
+def touch_rates(frames, runs=None, max_gap=5.0):
+    """Touches per minute, (num_pillars, num_tubes) indexed by pillar id"""
+    if runs is None:
+        runs = touch_runs(frames, max_gap)
+    seconds = observed_seconds(frames, max_gap)
+    num_tubes = frames["touch"].shape[1]
+    counts = np.bincount(runs["pillar"].astype(np.int64) * num_tubes + runs["tube"],
+                         minlength=len(seconds) * num_tubes).reshape(len(seconds), num_tubes)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(seconds[:, None] > 0, counts / (seconds[:, None] / 60.0), 0.0)
+
+
+def inter_touch_intervals(runs):
+    """Seconds between the starts of consecutive touches of the same tube within a block"""
+    order = np.lexsort((runs["start"], runs["tube"], runs["block"]))
+    start = runs["start"][order]
+    same = (np.diff(runs["block"][order]) == 0) & (np.diff(runs["tube"][order]) == 0)
+    return dict(
+        pillar=runs["pillar"][order][1:][same],
+        tube=runs["tube"][order][1:][same],
+        interval=np.diff(start)[same],
+    )
+
+
+def coactivation(frames, num_pillars=None):
+    """Tube by tube co-activation across pillars
+
+    Samples taken at the same time in the same session are lined up, and
+    counts[i, j] is the number of those instants where tube i and tube j
+    (index pillar * num_tubes + tube) were both touched. conditional[i, j]
+    is counts[i, j] / counts[i, i], the chance j is touched while i is.
+    Returns counts, conditional and the pillar level any-tube counts.
+    """
+    num_tubes = frames["touch"].shape[1]
+    if num_pillars is None:
+        num_pillars = int(frames["pillar"].max(initial=0)) + 1
+    instants, instant = np.unique(np.stack([frames["session"].astype(np.float64), frames["t"]], axis=1),
+                                  axis=0, return_inverse=True)
+    instant = instant.reshape(-1)
+    active = np.zeros((len(instants), num_pillars * num_tubes), np.float64)
+    rows, tubes = np.nonzero(frames["touch"])
+    active[instant[rows], frames["pillar"][rows].astype(np.int64) * num_tubes + tubes] = 1.0
+
+    counts = active.T @ active
+    with np.errstate(divide="ignore", invalid="ignore"):
+        conditional = np.where(np.diag(counts)[:, None] > 0, counts / np.diag(counts)[:, None], 0.0)
+    pillar_active = active.reshape(len(instants), num_pillars, num_tubes).max(axis=2)
+    return dict(counts=counts, conditional=conditional, pillar_counts=pillar_active.T @ pillar_active,
+                instants=len(instants))
+
+
+def hue_distribution(frames, bins=16, lit_only=True):
+    """Histogram of the hue shown on each tube, (num_pillars, bins) indexed by pillar id
+
+    Counts tube samples, only lit tubes (brightness > 0) when lit_only.
+    """
+    hue = frames["hue"]
+    pillar = np.broadcast_to(frames["pillar"][:, None], hue.shape)
+    mask = frames["brightness"] > 0 if lit_only else np.ones(hue.shape, bool)
+    num_pillars = int(frames["pillar"].max(initial=0)) + 1
+    hue_bin = hue[mask].astype(np.int64) * bins // 256
+    return np.bincount(pillar[mask].astype(np.int64) * bins + hue_bin,
+                       minlength=num_pillars * bins).reshape(num_pillars, bins)
+
+
+def summarise(values, percentiles=(50, 90, 99)):
+    if len(values) == 0:
+        return dict(count=0, mean=None, **{f"p{p}": None for p in percentiles})
+    return dict(count=int(len(values)), mean=float(np.mean(values)),
+                **{f"p{p}": float(v) for p, v in zip(percentiles, np.percentile(values, percentiles))})
@@ -11,12 +11,11 @@ from datetime import datetime
 from pillar_hw_interface import Pillar
 from MappingInterface import MappingInterface
 from sonic import SoundManager, setup_psonic
-
-import csv
+from session_recorder import SessionRecorder
 
 class Controller():
 
-    def __init__(self, config, ws_host, ws_port):
+    def __init__(self, config, ws_host, ws_port, record_dir="data"):
         self.websocket_url = (ws_host, ws_port)
 
         self.num_pillars = len(config["pillars"])
@@ -25,7 +24,9 @@ class Controller():
         print(self.pillars)
 
         #self.mapping = MappingInterface(copy.deepcopy(config))
-        self.savefolder_name = f"raveforest_data_{datetime.now().strftime('%Y-%m-%d-%H-%M-%S')}.csv"
+        # Touches, lights and sound state changes as binary columns, see session_recorder.py
+        num_tubes = max(p.num_tubes for p in self.pillars.values())
+        self.recorder = SessionRecorder(record_dir, num_tubes=num_tubes) if record_dir else None
 
         self.sound_manager = SoundManager(config["bpm"], self.pillars)
 
@@ -122,14 +123,13 @@ class Controller():
             if sleep_interval > 0:
                 await asyncio.sleep(sleep_interval)
             index += 1
-            if index % 5 == 0:
-                with open(self.savefolder_name, mode='a') as csv_file:
-                    fields =['time', 'num_pillars','pillars','current_state','bpm','mapping_id','synths','amp','notes']
-                    writer = csv.DictWriter(csv_file,fieldnames=fields)
-                    writer.writerow(state_dicts)
+            if self.recorder is not None:
+                self.recorder.record(self.loop_idx, self.pillars, self.current_states, self.sound_manager)
 
     def stop(self):
         self.running = False
+        if self.recorder is not None:
+            self.recorder.close()
         
     def loop(self):
         # Update status of pillars
@@ -169,6 +169,7 @@ if __name__=="__main__":
     parser.add_argument("--ws-host", default="localhost", help="The internal websocket URI")
     parser.add_argument("--ws-port", default="8765", help="The internal websocket URI")
     parser.add_argument("--gui", default=True, action="store_true", help="Whether to run the Dash GUI")
+    parser.add_argument("--record-dir", default="data", help="Folder for the session recordings, empty to disable")
 
     args = parser.parse_args()
     print(args)
@@ -182,7 +183,7 @@ if __name__=="__main__":
 
     # Create a Controller instance and pass the parsed values
     print("Intiialise and run Controller")
-    controller = Controller(config, args.ws_host, args.ws_port)
+    controller = Controller(config, args.ws_host, args.ws_port, args.record_dir)
     # controller.start(args.frequency)
     asyncio.get_event_loop().run_until_complete(controller.run(args.frequency))
     # asyncio.get_event_loop().run_forever()
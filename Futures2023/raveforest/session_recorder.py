@@ -0,0 +1,239 @@
+"""Columnar session recorder for the pillars
+
+Replaces the CSV of str() dicts. Each sample is written as fixed size NumPy
+records to two append-only binary streams per segment:
+
+    <prefix>_<start time>.frames.rec  every sample, per pillar: time, loop index,
+                                      touch bitmask, hue and brightness per tube
+    <prefix>_<start time>.sound.rec   only when a pillar's sound state changed:
+                                      time, loop index, bpm, amp, synth, notes per tube
+
+A file is a HEADER_SIZE byte header (magic plus JSON with the dtype) followed
+by raw records, so it can be memory mapped straight into a structured array
+and a record cut short by a crash is simply ignored. Segments rotate after
+`max_segment_bytes` or `max_segment_seconds`.
+
+    recorder = SessionRecorder("data", num_tubes=7)
+    recorder.record(loop_idx, pillars, current_states, sound_manager)
+    ...
+    frames = load_session("data", "frames")          # one structured array, all segments
+    touched = touch_matrix(frames)                   # (n, num_tubes) bool
+"""
+import atexit
+import glob
+import json
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+
+MAGIC = b"RFREC\x01\n"
+HEADER_SIZE = 1024
+STREAMS = ("frames", "sound")
+
+
+def frame_dtype(num_tubes):
+    return np.dtype([
+        ("t", "<f8"),
+        ("loop", "<u4"),
+        ("pillar", "u1"),
+        ("touch", "<u2"),  # bit i set while tube i is touched
+        ("hue", "u1", (num_tubes,)),
+        ("brightness", "u1", (num_tubes,)),
+    ])
+
+
+def sound_dtype(num_tubes):
+    return np.dtype([
+        ("t", "<f8"),
+        ("loop", "<u4"),
+        ("pillar", "u1"),
+        ("bpm", "<u2"),
+        ("amp", "<f4"),
+        ("synth", "S16"),
+        ("notes", "u1", (num_tubes,)),
+    ])
+
+
+def touch_bitmask(touch_status):
+    mask = 0
+    for i, touched in enumerate(touch_status):
+        if touched:
+            mask |= 1 << i
+    return mask
+
+
+def touch_matrix(frames, num_tubes=None):
+    """Unpack the touch bitmasks of a frames array into an (n, num_tubes) bool array"""
+    if num_tubes is None:
+        num_tubes = frames.dtype["hue"].shape[0]
+    return ((frames["touch"][:, None] >> np.arange(num_tubes, dtype=np.uint16)) & 1).astype(bool)
+
+
+def _fit(values, length, fill=0):
+    values = list(values)[:length]
+    return values + [fill] * (length - len(values))
+
+
+class RecordFile():
+    """One append-only stream of records, buffered in memory and written in blocks"""
+
+    def __init__(self, path, dtype, metadata=None, buffer_rows=256):
+        self.path = path
+        self.dtype = dtype
+        self.buffer = np.zeros(buffer_rows, dtype=dtype)
+        self.count = 0
+        self.written = 0
+
+        header = dict(metadata or {}, dtype=np.lib.format.dtype_to_descr(dtype))
+        header_bytes = MAGIC + json.dumps(header).encode("utf-8")
+        if len(header_bytes) > HEADER_SIZE:
+            raise ValueError(f"Record header for {path} is longer than {HEADER_SIZE} bytes")
+        self.file = open(path, "wb")
+        self.file.write(header_bytes.ljust(HEADER_SIZE, b" "))
+
+    def append(self):
+        """The next free row of the buffer, written out once the buffer is full"""
+        if self.count == len(self.buffer):
+            self.flush()
+        row = self.buffer[self.count]
+        self.count += 1
+        return row
+
+    def flush(self):
+        if self.count:
+            self.file.write(self.buffer[:self.count].tobytes())
+            self.written += self.count
+            self.count = 0
+        self.file.flush()
+
+    def size(self):
+        return HEADER_SIZE + (self.written + self.count) * self.dtype.itemsize
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+
+class SessionRecorder():
+
+    def __init__(self, folder="data", num_tubes=7, prefix="raveforest_session", max_segment_bytes=64 * 2**20,
+                 max_segment_seconds=3600.0, flush_interval=5.0):
+        self.folder = folder
+        self.num_tubes = num_tubes
+        self.prefix = prefix
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_seconds = max_segment_seconds
+        self.flush_interval = flush_interval
+
+        self.dtypes = {"frames": frame_dtype(num_tubes), "sound": sound_dtype(num_tubes)}
+        self.files = {}
+        self.segment_start = None
+        self.last_flush = time.time()
+        self.last_sound = {}  # pillar id -> last recorded (bpm, amp, synth, notes)
+
+        os.makedirs(folder, exist_ok=True)
+        atexit.register(self.close)
+
+    def _open_segment(self, now):
+        self.close()
+        stamp = datetime.fromtimestamp(now).strftime("%Y-%m-%d-%H-%M-%S")
+        metadata = dict(format="raveforest-session", version=1, num_tubes=self.num_tubes, created=now)
+        for stream in STREAMS:
+            path = os.path.join(self.folder, f"{self.prefix}_{stamp}.{stream}.rec")
+            self.files[stream] = RecordFile(path, self.dtypes[stream], dict(metadata, stream=stream))
+        self.segment_start = now
+        # A new segment starts with every pillar's full sound state
+        self.last_sound.clear()
+        print(f"Recording session to {self.folder}/{self.prefix}_{stamp}.*.rec")
+
+    def record(self, loop_idx, pillars, current_states, sound_manager, now=None):
+        """Record one sample of every pillar: touches and lights always, sound state when it changed"""
+        now = time.time() if now is None else now
+        if (not self.files or now - self.segment_start >= self.max_segment_seconds
+                or self.files["frames"].size() >= self.max_segment_bytes):
+            self._open_segment(now)
+
+        bpm = sound_manager.get_bpm()
+        amps = sound_manager.get_amps()
+        synths = sound_manager.get_synths()
+        for p_id, pillar in pillars.items():
+            state = current_states.get(p_id) or {}
+            lights = _fit(state.get("lights", ()), self.num_tubes, (0, 0))
+
+            row = self.files["frames"].append()
+            row["t"] = now
+            row["loop"] = loop_idx
+            row["pillar"] = p_id
+            row["touch"] = touch_bitmask(pillar.get_all_touch_status())
+            row["hue"] = [int(light[0]) for light in lights]
+            row["brightness"] = [int(light[1]) for light in lights]
+
+            sound = (bpm, float(amps.get(p_id, 0.0)), str(synths.get(p_id, "")),
+                     tuple(_fit(state.get("notes", ()), self.num_tubes)))
+            if self.last_sound.get(p_id) != sound:
+                self.last_sound[p_id] = sound
+                row = self.files["sound"].append()
+                row["t"] = now
+                row["loop"] = loop_idx
+                row["pillar"] = p_id
+                row["bpm"], row["amp"], synth, row["notes"] = sound
+                row["synth"] = synth.encode("ascii", "replace")[:16]
+
+        if now - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        self.last_flush = time.time()
+        for record_file in self.files.values():
+            record_file.flush()
+
+    def close(self):
+        for record_file in self.files.values():
+            record_file.close()
+        self.files = {}
+
+
+def read_header(path):
+    with open(path, "rb") as f:
+        header = f.read(HEADER_SIZE)
+    if not header.startswith(MAGIC):
+        raise ValueError(f"{path} is not a session recording")
+    metadata = json.loads(header[len(MAGIC):].rstrip(b" ").decode("utf-8"))
+    metadata["dtype"] = np.lib.format.descr_to_dtype(_descr_from_json(metadata["dtype"]))
+    return metadata
+
+
+def _descr_from_json(descr):
+    # JSON turns the descr tuples and sub-array shapes into lists
+    return [(field[0], field[1]) if len(field) == 2 else (field[0], field[1], tuple(field[2])) for field in descr]
+
+
+def load_recording(path, mmap=True):
+    """Records of one .rec file as a structured array, memory mapped unless mmap is False"""
+    dtype = read_header(path)["dtype"]
+    count = (os.path.getsize(path) - HEADER_SIZE) // dtype.itemsize  # drops a half written record
+    if count <= 0:
+        return np.zeros(0, dtype=dtype)
+    if mmap:
+        return np.memmap(path, dtype=dtype, mode="r", offset=HEADER_SIZE, shape=(count,))
+    with open(path, "rb") as f:
+        f.seek(HEADER_SIZE)
+        return np.fromfile(f, dtype=dtype, count=count)
+
+
+def recording_paths(folder="data", stream="frames", prefix="raveforest_session"):
+    return sorted(glob.glob(os.path.join(folder, f"{prefix}_*.{stream}.rec")))
+
+
+def load_session(folder="data", stream="frames", prefix="raveforest_session", paths=None, num_tubes=7):
+    """Every segment of a stream in time order as one structured array"""
+    if paths is None:
+        paths = recording_paths(folder, stream, prefix)
+    arrays = [load_recording(path) for path in paths]
+    arrays = [array for array in arrays if len(array)]
+    if not arrays:
+        return np.zeros(0, dtype=frame_dtype(num_tubes) if stream == "frames" else sound_dtype(num_tubes))
+    return np.concatenate(arrays)
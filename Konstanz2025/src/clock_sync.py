@@ -0,0 +1,216 @@
+import collections
+import statistics
+import threading
+import time
+
+from scamp import wait
+
+
+class ClockSync():
+    """Keeps the SCAMP session of every pillar on one shared beat grid over MQTT
+
+    Every pillar publishes a beacon each `period` seconds with its wall time,
+    session beat and tempo. The pillar with the lowest id among those heard
+    within `peer_timeout` is the leader, so a leader that goes offline is
+    replaced without any negotiation.
+
+    Clock messages bypass the client's outbound queue (queued=False) since
+    their timestamps must be taken when they are actually sent.
+
+    Followers estimate the offset to the leader's wall clock NTP style: a
+    ping carries t0, the leader stamps t1 on receipt and t2 on reply, the
+    pong arrives at t3.
+
+        offset = ((t1 - t0) + (t2 - t3)) / 2
+        rtt = (t3 - t0) - (t2 - t1)
+
+    The sample with the smallest round trip in the last `window` pings is
+    used, since broker queueing only ever adds delay. From the leader's
+    latest beacon a follower predicts the leader's beat now, compares the
+    phase (modulo `phase_period` beats) with its own and ramps its tempo
+    towards the leader's, sped up or slowed by at most `max_slew` so the
+    phase error closes over `slew_time` seconds. Local bpm changes are
+    overridden on followers, the leader's tempo is the one everyone plays.
+
+    Offset, round trip, jitter and phase error are published per pillar on
+    <base_topic>/<pillar_id>/clock/stats every `stats_interval` seconds.
+    """
+
+    def __init__(self, mqtt_client, session, pillar_id, base_topic=None, period=1.0, peer_timeout=3.5,
+                 window=8, phase_period=4.0, slew_time=4.0, max_slew=0.05, stats_interval=5.0):
+        self.client = mqtt_client
+        self.session = session
+        self.pillar_id = str(pillar_id)
+        self.base_topic = (base_topic or getattr(mqtt_client, "base_topic", "pillars")).rstrip("/")
+        self.period = period
+        self.peer_timeout = peer_timeout
+        self.phase_period = phase_period
+        self.slew_time = slew_time
+        self.max_slew = max_slew
+        self.stats_interval = stats_interval
+
+        self.lock = threading.Lock()
+        self.peers = {}  # pillar id -> (local receive time, beacon)
+        self.samples = collections.deque(maxlen=window)  # (rtt, offset)
+        self.pending_pings = {}  # seq -> t0
+        self.ping_seq = 0
+        self.leader_id = self.pillar_id
+        self.phase_error = 0.0
+        self.last_stats_time = 0.0
+        self.fork = None
+
+    # ---------- Topics ----------
+
+    def _beacon_topic(self, pillar_id="+"):
+        return f"{self.base_topic}/clock/beacon/{pillar_id}"
+
+    def _ping_topic(self, pillar_id):
+        return f"{self.base_topic}/clock/{pillar_id}/ping"
+
+    def _pong_topic(self, pillar_id):
+        return f"{self.base_topic}/clock/{pillar_id}/pong"
+
+    # ---------- Lifecycle ----------
+
+    def start(self):
+        """Register the handlers and run the sync loop as a fork of the session"""
+        for topic, handler in ((self._beacon_topic(), self.on_beacon),
+                               (self._ping_topic(self.pillar_id), self.on_ping),
+                               (self._pong_topic(self.pillar_id), self.on_pong)):
+            self.client.on(topic, handler)
+            if hasattr(self.client, "subscribe"):
+                self.client.subscribe(topic, qos=0)
+        self.fork = self.session.fork(self._run)
+        print(f"[CLOCK] Clock sync started for {self.pillar_id}")
+
+    def stop(self):
+        if self.fork is not None and self.fork.alive:
+            self.fork.kill()
+        self.fork = None
+
+    # ---------- Handlers (MQTT network thread) ----------
+
+    def on_beacon(self, topic, payload, props=None):
+        if not isinstance(payload, dict) or "id" not in payload or str(payload["id"]) == self.pillar_id:
+            return
+        with self.lock:
+            self.peers[str(payload["id"])] = (time.time(), payload)
+
+    def on_ping(self, topic, payload, props=None):
+        t1 = time.time()
+        if not isinstance(payload, dict) or "from" not in payload:
+            return
+        self.client.publish(self._pong_topic(payload["from"]), {
+            "from": self.pillar_id, "seq": payload["seq"], "t0": payload["t0"], "t1": t1, "t2": time.time(),
+        }, qos=0, queued=False)
+
+    def on_pong(self, topic, payload, props=None):
+        t3 = time.time()
+        if not isinstance(payload, dict):
+            return
+        with self.lock:
+            if self.pending_pings.pop(payload.get("seq"), None) is None:
+                return  # Late reply to a ping we already gave up on
+            if str(payload.get("from")) != self.leader_id:
+                return
+            t0, t1, t2 = payload["t0"], payload["t1"], payload["t2"]
+            rtt = (t3 - t0) - (t2 - t1)
+            offset = ((t1 - t0) + (t2 - t3)) / 2.0
+            self.samples.append((rtt, offset))
+
+    # ---------- Sync loop (session fork) ----------
+
+    def _elect_locked(self, now):
+        for pillar_id, (received, _) in list(self.peers.items()):
+            if now - received > self.peer_timeout:
+                del self.peers[pillar_id]
+        leader = min([self.pillar_id] + list(self.peers))
+        if leader != self.leader_id:
+            print(f"[CLOCK] Leader is now {leader}")
+            self.leader_id = leader
+            self.samples.clear()
+            self.pending_pings.clear()
+        return leader
+
+    def _offset_locked(self):
+        """Offset and round trip of the best recent sample, None before the first pong"""
+        if not self.samples:
+            return None
+        return min(self.samples)
+
+    def _step(self):
+        now = time.time()
+        beat = self.session.beat()
+        tempo = self.session.tempo
+        with self.lock:
+            leader = self._elect_locked(now)
+            best = self._offset_locked()
+            leader_beacon = self.peers.get(leader, (None, None))[1]
+            if leader != self.pillar_id:
+                self.ping_seq += 1
+                self.pending_pings = {seq: t0 for seq, t0 in self.pending_pings.items()
+                                      if now - t0 < self.peer_timeout}
+                self.pending_pings[self.ping_seq] = now
+                seq = self.ping_seq
+
+        self.client.publish(self._beacon_topic(self.pillar_id), {
+            "id": self.pillar_id, "leader": leader == self.pillar_id, "t": now, "beat": beat, "tempo": tempo,
+        }, qos=0, queued=False)
+
+        if leader == self.pillar_id:
+            self.phase_error = 0.0
+            return
+        self.client.publish(self._ping_topic(leader), {"from": self.pillar_id, "seq": seq, "t0": now},
+                            qos=0, queued=False)
+        if best is None or leader_beacon is None:
+            return
+
+        # Where the leader's beat grid is now, in its clock and so in ours
+        _, offset = best
+        leader_tempo = leader_beacon["tempo"]
+        leader_beat = leader_beacon["beat"] + (now + offset - leader_beacon["t"]) * leader_tempo / 60.0
+        error = (leader_beat - beat) % self.phase_period
+        if error >= self.phase_period / 2:
+            error -= self.phase_period
+        self.phase_error = error
+
+        # Proportional slew: close the phase error over slew_time, never faster than max_slew
+        correction = error / (self.slew_time * leader_tempo / 60.0)
+        correction = max(-self.max_slew, min(self.max_slew, correction))
+        target = leader_tempo * (1.0 + correction)
+        if abs(target - tempo) > 1e-3:
+            self.session.set_tempo_target(target, self.period, duration_units="time")
+
+    def _run(self):
+        while True:
+            try:
+                self._step()
+                if time.time() - self.last_stats_time >= self.stats_interval:
+                    self.publish_stats()
+            except Exception as e:
+                print(f"[CLOCK] Sync step failed: {e}")
+            wait(self.period, units="time")
+
+    # ---------- Stats ----------
+
+    def stats(self):
+        with self.lock:
+            best = self._offset_locked()
+            offsets = [offset for _, offset in self.samples]
+            return {
+                "leader": self.leader_id,
+                "is_leader": self.leader_id == self.pillar_id,
+                "peers": sorted(self.peers),
+                "offset_ms": best[1] * 1000.0 if best else None,
+                "rtt_ms": best[0] * 1000.0 if best else None,
+                "jitter_ms": statistics.pstdev(offsets) * 1000.0 if len(offsets) > 1 else None,
+                "phase_error_beats": self.phase_error,
+                "tempo": self.session.tempo,
+                "samples": len(self.samples),
+            }
+
+    def publish_stats(self):
+        self.last_stats_time = time.time()
+        stats = self.stats()
+        self.client.publish(f"{self.base_topic}/{self.pillar_id}/clock/stats", stats, qos=0)
+        return stats
@@ -0,0 +1,329 @@
+"""
+local_broker.py — In-process stand-in for an MQTT broker and the paho client.
+
+Implements the subset of MQTT the pillars use: subscribe with wildcards
+(matched with paho's MQTTMatcher), retained messages (an empty retained
+payload clears the topic), Last Will on an ungraceful disconnect and QoS
+passed through unchanged. Delivery is in order per client on one delivery
+thread per client, the same threading model as paho's loop_start().
+
+LocalMqttClient has the paho Client methods MqttPillarClient calls, so it
+can be swapped in with MqttPillarClient(..., broker=LocalBroker()) or by
+using MqttPillarClientMock, which defaults to the shared LocalBroker.default().
+Used for running several pillars in one process and for load testing
+(testing/mqtt_benchmark.py), not as a network broker.
+"""
+from __future__ import annotations
+
+import itertools
+import queue
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from paho.mqtt.client import MQTT_ERR_NO_CONN, MQTT_ERR_SUCCESS, topic_matches_sub
+from paho.mqtt.matcher import MQTTMatcher
+
+
+class LocalMessage:
+    """The attributes of paho's MQTTMessage handlers read"""
+
+    __slots__ = ("topic", "payload", "qos", "retain", "properties", "timestamp")
+
+    def __init__(self, topic: str, payload: bytes, qos: int = 0, retain: bool = False) -> None:
+        self.topic = topic
+        self.payload = payload
+        self.qos = qos
+        self.retain = retain
+        self.properties = None
+        self.timestamp = time.monotonic()
+
+
+class LocalMessageInfo:
+    """Stand-in for paho's MQTTMessageInfo, local publishes complete immediately"""
+
+    def __init__(self, mid: int, rc: int = MQTT_ERR_SUCCESS) -> None:
+        self.mid = mid
+        self.rc = rc
+
+    def wait_for_publish(self, timeout: Optional[float] = None) -> None:
+        pass
+
+    def is_published(self) -> bool:
+        return self.rc == MQTT_ERR_SUCCESS
+
+
+class LocalBroker:
+    _default: Optional["LocalBroker"] = None
+    _default_lock = threading.Lock()
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._subscriptions = MQTTMatcher()  # topic filter -> {client: qos}
+        self._retained: Dict[str, LocalMessage] = {}
+        self._clients: Dict[str, "LocalMqttClient"] = {}
+
+        self.published = 0
+        self.delivered = 0
+        self.bytes_published = 0
+
+    @classmethod
+    def default(cls) -> "LocalBroker":
+        """Broker shared by every MqttPillarClientMock in this process"""
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls()
+            return cls._default
+
+    def create_client(self, client_id: str, **kwargs: Any) -> "LocalMqttClient":
+        return LocalMqttClient(self, client_id)
+
+    # ---------- Broker side ----------
+
+    def connect(self, client: "LocalMqttClient") -> None:
+        with self._lock:
+            previous = self._clients.get(client.client_id)
+            self._clients[client.client_id] = client
+        if previous is not None and previous is not client:
+            # Same client id connecting again takes over, like a real broker
+            previous._drop(send_will=False)
+
+    def disconnect(self, client: "LocalMqttClient", send_will: bool) -> None:
+        with self._lock:
+            if self._clients.get(client.client_id) is client:
+                del self._clients[client.client_id]
+            self._unsubscribe_all_locked(client)
+        if send_will and client._will is not None:
+            topic, payload, qos, retain = client._will
+            self.publish(topic, payload, qos, retain)
+
+    def subscribe(self, client: "LocalMqttClient", topic_filter: str, qos: int) -> None:
+        with self._lock:
+            try:
+                subscribers = self._subscriptions[topic_filter]
+            except KeyError:
+                subscribers = {}
+                self._subscriptions[topic_filter] = subscribers
+            subscribers[client] = qos
+            retained = [message for topic, message in self._retained.items()
+                        if topic_matches_sub(topic_filter, topic)]
+        for message in retained:
+            client._deliver(message)
+
+    def unsubscribe(self, client: "LocalMqttClient", topic_filter: str) -> None:
+        with self._lock:
+            try:
+                self._subscriptions[topic_filter].pop(client, None)
+            except KeyError:
+                pass
+
+    def _unsubscribe_all_locked(self, client: "LocalMqttClient") -> None:
+        for topic_filter in client._filters:
+            try:
+                self._subscriptions[topic_filter].pop(client, None)
+            except KeyError:
+                pass
+
+    def publish(self, topic: str, payload: bytes, qos: int = 0, retain: bool = False) -> int:
+        """Deliver to every matching subscriber once, returns how many got it"""
+        message = LocalMessage(topic, payload, qos, retain)
+        with self._lock:
+            self.published += 1
+            self.bytes_published += len(payload)
+            if retain:
+                if payload:
+                    self._retained[topic] = message
+                else:
+                    self._retained.pop(topic, None)
+            receivers = set()
+            for subscribers in self._subscriptions.iter_match(topic):
+                receivers.update(subscribers)
+            self.delivered += len(receivers)
+        for client in receivers:
+            # Live messages are not flagged retained, only the replay on subscribe is
+            client._deliver(LocalMessage(topic, payload, qos, False))
+        return len(receivers)
+
+    def reset(self) -> None:
+        """Drop every client, subscription and retained message"""
+        with self._lock:
+            clients = list(self._clients.values())
+        for client in clients:
+            client._drop(send_will=False)
+        with self._lock:
+            self._subscriptions = MQTTMatcher()
+            self._retained.clear()
+            self._clients.clear()
+            self.published = self.delivered = self.bytes_published = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "clients": len(self._clients),
+                "retained": len(self._retained),
+                "published": self.published,
+                "delivered": self.delivered,
+                "bytes_published": self.bytes_published,
+            }
+
+
+class LocalMqttClient:
+    """The part of paho.mqtt.client.Client that MqttPillarClient uses, backed by a LocalBroker"""
+
+    def __init__(self, broker: LocalBroker, client_id: str) -> None:
+        self.broker = broker
+        self.client_id = client_id
+        self._will: Optional[Tuple[str, bytes, int, bool]] = None
+        self._filters: Dict[str, int] = {}
+        self._mids = itertools.count(1)
+        self._inbox: "queue.Queue[Optional[Tuple[str, Any]]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self.connected = False
+
+        self.on_connect = None
+        self.on_disconnect = None
+        self.on_message = None
+        self.on_subscribe = None
+        self.on_publish = None
+
+    # ---------- Setup (no-ops locally) ----------
+
+    def username_pw_set(self, username: Optional[str] = None, password: Optional[str] = None) -> None:
+        pass
+
+    def tls_set(self, *args: Any, **kwargs: Any) -> None:
+        pass
+
+    def reconnect_delay_set(self, min_delay: int = 1, max_delay: int = 120) -> None:
+        pass
+
+    def will_set(self, topic: str, payload: Any = None, qos: int = 0, retain: bool = False) -> None:
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        self._will = (topic, payload or b"", qos, retain)
+
+    # ---------- Connection ----------
+
+    def connect(self, host: str = "", port: int = 1883, keepalive: int = 60, **kwargs: Any) -> int:
+        self._inbox.put(("connect", None))
+        if self._thread is None:
+            self.loop(timeout=0)
+        return MQTT_ERR_SUCCESS
+
+    def connect_async(self, host: str = "", port: int = 1883, keepalive: int = 60, **kwargs: Any) -> None:
+        self._inbox.put(("connect", None))
+
+    def disconnect(self, *args: Any, **kwargs: Any) -> int:
+        if self.connected:
+            self.broker.disconnect(self, send_will=False)
+            self.connected = False
+            self._inbox.put(("disconnect", 0))
+        return MQTT_ERR_SUCCESS
+
+    def simulate_connection_loss(self) -> None:
+        """Drop the connection as if the network failed, the broker publishes the Last Will"""
+        self._drop(send_will=True)
+
+    def reconnect(self) -> int:
+        self._inbox.put(("connect", None))
+        return MQTT_ERR_SUCCESS
+
+    def _drop(self, send_will: bool) -> None:
+        if self.connected:
+            self.connected = False
+            self.broker.disconnect(self, send_will=send_will)
+            self._inbox.put(("disconnect", 7))  # MQTT_ERR_CONN_LOST
+
+    # ---------- Pub/sub ----------
+
+    def subscribe(self, topic: str, qos: int = 0, **kwargs: Any) -> Tuple[int, int]:
+        if not self.connected:
+            return MQTT_ERR_NO_CONN, 0
+        mid = next(self._mids)
+        self._filters[topic] = qos
+        self.broker.subscribe(self, topic, qos)
+        self._inbox.put(("subscribe", (mid, [qos])))
+        return MQTT_ERR_SUCCESS, mid
+
+    def unsubscribe(self, topic: str, **kwargs: Any) -> Tuple[int, int]:
+        self._filters.pop(topic, None)
+        self.broker.unsubscribe(self, topic)
+        return MQTT_ERR_SUCCESS, next(self._mids)
+
+    def publish(self, topic: str, payload: Any = None, qos: int = 0, retain: bool = False, **kwargs: Any) -> LocalMessageInfo:
+        mid = next(self._mids)
+        if not self.connected:
+            return LocalMessageInfo(mid, MQTT_ERR_NO_CONN)
+        if payload is None:
+            payload = b""
+        elif isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        elif isinstance(payload, (int, float)):
+            payload = str(payload).encode("utf-8")
+        self.broker.publish(topic, bytes(payload), qos, retain)
+        if self.on_publish is not None:
+            self._inbox.put(("publish", mid))
+        return LocalMessageInfo(mid)
+
+    def _deliver(self, message: LocalMessage) -> None:
+        self._inbox.put(("message", message))
+
+    # ---------- Network loop stand-in ----------
+
+    def loop_start(self) -> int:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name=f"local-mqtt-{self.client_id}", daemon=True)
+            self._thread.start()
+        return MQTT_ERR_SUCCESS
+
+    def loop_stop(self, force: bool = False) -> int:
+        if self._thread is not None:
+            self._inbox.put(None)
+            if self._thread is not threading.current_thread():
+                self._thread.join(timeout=1.0)
+            self._thread = None
+        return MQTT_ERR_SUCCESS
+
+    def loop(self, timeout: float = 1.0, max_packets: int = 1) -> int:
+        """Process what is pending when no loop thread is running"""
+        if self._thread is not None:
+            return MQTT_ERR_SUCCESS
+        while True:
+            try:
+                item = self._inbox.get_nowait()
+            except queue.Empty:
+                return MQTT_ERR_SUCCESS
+            if item is not None:
+                self._handle(item)
+
+    def _run(self) -> None:
+        while True:
+            item = self._inbox.get()
+            if item is None:
+                break
+            self._handle(item)
+
+    def _handle(self, item: Tuple[str, Any]) -> None:
+        kind, data = item
+        try:
+            if kind == "message":
+                if self.connected and self.on_message is not None:
+                    self.on_message(self, None, data)
+            elif kind == "connect":
+                if not self.connected:
+                    self.broker.connect(self)
+                    self.connected = True
+                    if self.on_connect is not None:
+                        self.on_connect(self, None, {}, 0, None)
+            elif kind == "disconnect":
+                if self.on_disconnect is not None:
+                    self.on_disconnect(self, None, {}, data, None)
+            elif kind == "subscribe":
+                if self.on_subscribe is not None:
+                    self.on_subscribe(self, None, data[0], data[1], None)
+            elif kind == "publish":
+                if self.on_publish is not None:
+                    self.on_publish(self, None, data, 0, None)
+        except Exception as e:
+            # Same as paho: a failing callback must not kill the loop
+            print(f"Local MQTT callback error for {self.client_id} ({kind}): {e}")
@@ -4,73 +4,68 @@ import socket
 import threading
 import queue
 import time
+import copy
 
 from pillar_hw_interface import Pillar
 from mapping_interface import RotationMapper, EventRotationMapper, generate_mapping_interface
 from sound_manager import SoundManager
 from mqtt_manager import MqttPillarClient, MqttPillarClientMock
-
-import requests
+from clock_sync import ClockSync
+from telemetry import TelemetryExporter
 
 import csv
 
-class APISender(threading.Thread):
-    def __init__(self, endpoint, data_queue, interval=0.2):
-        """
-        A thread that sends data packets to an API at a specified interval.
-
-        :param endpoint: The API endpoint URL.
-        :param data_queue: A queue for receiving data from the main loop.
-        :param interval: Time between requests in seconds (5Hz = 0.2s).
-        """
-        super().__init__()
-        self.endpoint = endpoint
-        self.data_queue = data_queue
-        self.interval = interval
-        self.running = True
-
-    def run(self):
-        while self.running:
-            try:
-                # Get the latest data, or wait for it (timeout to prevent hanging on stop)
-                data = self.data_queue.get(timeout=1)  
-                response = requests.post(self.endpoint, json=data, timeout=2)
-                # print(f"Sent data: {data}, Response: {response.status_code}")
-            except queue.Empty:
-                # If no data is available, continue waiting
-                pass
-            except requests.RequestException as e:
-                print(f"Request failed: {e}")
-
-            time.sleep(self.interval)
-
-    def stop(self):
-        self.running = False
-
 class Controller():
 
-    def __init__(self, hostname, config):
+    def __init__(self, hostname, config, sound_manager=None):
+        self.hostname = hostname
         self.config = config
         self.num_pillars = len(config["pillars"])        
         self.pillar_config = config["pillars"][hostname]
         self.pillar_manager = Pillar(**self.pillar_config)
         self.mapping_interface = generate_mapping_interface(config, self.pillar_config)
-        self.sound_manager = SoundManager(hostname, self.pillar_config)
+        # A sound_manager can be passed in, e.g. a recording stand-in for testing/mqtt_benchmark.py
+        if sound_manager is None:
+            sound_manager = SoundManager(hostname, self.pillar_config,
+                                         shared_state_backend=self.pillar_config.get("shared_state_backend", "local"))
+        self.sound_manager = sound_manager
         self.loop_idx = 0
         self.running = True
 
-        self.data_queue = queue.Queue()  # Thread-safe queue for data exchange
+        # Loop snapshots for the API, bounded and sent in batches (telemetry.py)
+        self.telemetry = None
+        telemetry_config = dict(config.get("telemetry", {}))
+        if telemetry_config.pop("enable", False) and config.get("tonnetz_server_api_endpoint"):
+            self.telemetry = TelemetryExporter(config["tonnetz_server_api_endpoint"], **telemetry_config)
+            self.telemetry.start()
+
+        # Last sound state sent and the merged state of every other pillar, broadcasts only carry changes.
+        # Set before MQTT connects, an echo can arrive during connect_and_loop's wait
+        self.last_broadcast_state = {}
+        self.broadcast_seq = 0
+        self.peer_sound_states = {}
 
         self.mqtt_enabled = config["mqtt"]["enable"]
         # MQTT to finish
         if self.mqtt_enabled:
             mqttObject = MqttPillarClientMock if config["mqtt"]["mock"] else MqttPillarClient
+            # Note-only broadcasts go out as a few bytes of struct, other deltas as msgpack (JSON without it)
             self.mqtt_client = mqttObject(
                 broker_host=config["mqtt"]["mqtt_broker_ip"],
-                pillar_id=hostname
+                pillar_id=hostname,
+                codecs={"sound_state/+": ("notes", "msgpack")},
             )
-            self.mqtt_client.announce_online()
-            self.mqtt_client.on("sound_state/*", self.on_other_pillar_receive)
+            # Echo notes are ephemeral: QoS 0 and every note of a tick merged into one message
+            self.mqtt_client.set_topic_policy("sound_state/+", qos=0, batch=True)
+            self.mqtt_client.on("sound_state/+", self.on_other_pillar_receive)
+            self.mqtt_client.subscribe("sound_state/+", qos=0)
+            self.mqtt_client.connect_and_loop()
+
+            # Keep every pillar's SCAMP clock on the leader's beat grid so echoes land on the beat
+            clock_sync_config = dict(config["mqtt"].get("clock_sync", {}))
+            if clock_sync_config.pop("enable", True):
+                self.clock_sync = ClockSync(self.mqtt_client, self.sound_manager.session, hostname, **clock_sync_config)
+                self.clock_sync.start()
 
     def start(self, frequency):
         """Starts the main control loop
@@ -85,27 +80,39 @@ class Controller():
 
     def stop(self):
         self.running = False
+        if self.telemetry is not None:
+            self.telemetry.stop()
 
-    def on_other_pillar_receive(self, their_sound_state):
+    def on_other_pillar_receive(self, topic, sound_state, props=None):
         # On receive of a different pillar do something
         # E.g. play a sound, change a light or something. 
-
-        # TODO: If received from yourself, ignore... 
-
-        sound_state = json.loads(their_sound_state)
-        if "reaction_notes" in sound_state:
+        # The payload is already decoded by the MQTT client and only holds what changed
+
+        sender = topic.rsplit("/", 1)[-1]
+        if sender == self.hostname or not isinstance(sound_state, dict):
+            return
+        notes = sound_state.pop("reaction_notes", [])
+        sound_state.pop("seq", None)
+        if sound_state:
+            self.peer_sound_states.setdefault(sender, {}).update(sound_state)
+        if len(notes) > 0:
             # Currently telling composer to play all the reaction notes
-            notes = sound_state["reaction_notes"]
-            if len(notes) > 0:
-                self.sound_manager.update_pillar_setting("broadcast_notes", notes) 
+            self.sound_manager.update_pillar_setting("broadcast_notes", notes) 
 
     def broadcast_notes_to_other_pillars(self, sound_state):
         # Send Reaction Notes (or other sound state) to other pillars
 
-        # Currently only send if there is a reaction note
+        # Currently only send if there is a reaction note, with the rest of
+        # the state only where it changed since the last broadcast
         if sound_state.has_reaction_notes():
-            data = json.dumps(sound_state.to_json())
-            self.mqtt_client.publish(f"sound_state/{hostname}", data)
+            state = sound_state.to_json()
+            delta = {k: v for k, v in state.items()
+                     if k != "reaction_notes" and self.last_broadcast_state.get(k) != v}
+            self.last_broadcast_state = copy.deepcopy(state)
+            self.broadcast_seq = (self.broadcast_seq + 1) & 0xFFFF
+            delta["reaction_notes"] = list(state["reaction_notes"])
+            delta["seq"] = self.broadcast_seq
+            self.mqtt_client.publish(f"sound_state/{self.hostname}", delta)
             print("Sending Notes via MQTT Client")
     
     def loop(self):
@@ -132,15 +139,18 @@ class Controller():
         # Send any sound state "reaction notes" to other pillars
         if self.mqtt_enabled:
             self.broadcast_notes_to_other_pillars(sound_state)
+            self.mqtt_client.flush()
 
         self.sound_manager.tick(time_delta=1/30.0)
         
-        data = {
-            "btn_press": current_btn_press,
-            "sound_state": sound_state.to_json(),
-            "light_state": list(light_state)
-        }
-        self.data_queue.put(data)
+        if self.telemetry is not None:
+            data = {
+                "ts": time.time(),  # batched, so the server can't use the arrival time
+                "btn_press": current_btn_press,
+                "sound_state": sound_state.to_json(),
+                "light_state": list(light_state)
+            }
+            self.telemetry.put(data)
 
         self.loop_idx += 1
 
@@ -98,6 +98,9 @@ class SoundState(object):
         self.baseline_style = BASELINE_STYLE[new_idx]        
         return self.baseline_style
     
+    def has_reaction_notes(self):
+        return len(self.reaction_notes) > 0
+
     def clear_reaction_notes(self):
         self.reaction_notes.clear()
         return self.reaction_notes
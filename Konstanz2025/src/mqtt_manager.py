@@ -30,52 +30,39 @@ Quick start:
     # Publish state that late joiners should pick up immediately
     pillar.publish_retained(f"{pillar.base_topic}/mode", {"mode": "attract"}, qos=1)
 
+    # Send note broadcasts as a compact struct (see payload_codec.py)
+    pillar.set_codec(f"{pillar.base_topic}/broadcast/notes", "notes", "msgpack")
+
+    # Publishes are queued and sent by a flush thread (see outbound_queue.py),
+    # ephemeral notes can skip the PUBACK and state only needs its latest value
+    pillar.set_topic_policy(f"{pillar.base_topic}/broadcast/notes", qos=0, batch=True)
+    pillar.set_topic_policy(f"{pillar.base_topic}/+/state/#", coalesce=True)
+    pillar.flush()  # e.g. at the end of a controller tick, sends everything queued now
+
+    # Handlers run on worker threads (handler_workers=2 by default), messages on one
+    # topic always go to the same worker so they are handled in order
+
     # On clean shutdown (e.g., SIGINT):
     pillar.close()
 """
 from __future__ import annotations
 
-import json
+import queue
 import socket
 import time
 import threading
-from typing import Any, Callable, Dict, Optional, Tuple, List
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple, List
 
 import paho.mqtt.client as mqtt
 from paho.mqtt.matcher import MQTTMatcher
 
+from payload_codec import JSON_CODEC, CodecError, decode_payload, encode_payload, resolve_codecs
+from outbound_queue import DEFAULT_POLICY, OutboundQueue, TopicPolicy
+from local_broker import LocalBroker
+
 JSONDict = Dict[str, Any]
 Handler = Callable[[str, Any, Optional[mqtt.Properties]], None]
 
-class MqttPillarClientMock:
-    def __init__(
-        self,
-        broker_host: str,
-        broker_port: int = 1883,
-        client_id: Optional[str] = None,
-        username: Optional[str] = None,
-        password: Optional[str] = None,
-        tls: bool = False,
-        keepalive: int = 30,
-        base_topic: str = "pillars",
-        pillar_id: Optional[str] = None,
-        clean_session: bool = True,
-        default_qos: int = 1,
-        retain_presence: bool = True,
-        reconnect_delay: Tuple[int, int] = (1, 30),
-    ) -> None:
-        pass
-
-    def on(self, topic_filter: str, handler: Handler) -> None:
-        pass
-
-    def publish(self, topic: str, payload: Any, qos: Optional[int] = None, retain: bool = False) -> mqtt.MQTTMessageInfo:
-        pass
-
-    def announce_online(self) -> None:
-        pass
-
-
 class MqttPillarClient:
     """Manage MQTT connection, presence, pub/sub, and trigger helpers.
 
@@ -85,7 +72,11 @@ class MqttPillarClient:
     - Retained presence + Last Will
     - Topic handler registry supporting wildcards
     - JSON payload convenience (auto encode/decode)
+    - Optional compact binary codecs per topic (payload_codec.py)
+    - Bounded outbound queue with per-topic QoS, coalescing and batching (outbound_queue.py)
     - Background network loop for easy integration in main loops
+    - In-process broker for testing several pillars without a network (local_broker.py)
+    - Cached topic -> handler dispatch, handlers run off the network thread on a worker pool
     """
 
     def __init__(
@@ -103,6 +94,13 @@ class MqttPillarClient:
         default_qos: int = 1,
         retain_presence: bool = True,
         reconnect_delay: Tuple[int, int] = (1, 30),
+        codecs: Optional[Dict[str, Sequence[str]]] = None,
+        max_queued: int = 1000,
+        flush_interval: float = 0.05,
+        broker: Optional[Any] = None,
+        handler_workers: int = 2,
+        max_pending_messages: int = 1000,
+        dispatch_cache_size: int = 1024,
     ) -> None:
         self.broker_host = broker_host
         self.broker_port = broker_port
@@ -115,15 +113,47 @@ class MqttPillarClient:
         # Internal state
         self._connected_evt = threading.Event()
         self._stop_evt = threading.Event()
+        self._flush_now = threading.Event()
         self._handlers = MQTTMatcher()  # supports wildcard topics
+        self._codecs = MQTTMatcher()  # topic filter -> codecs tried in order when publishing
+        self._policies = MQTTMatcher()  # topic filter -> TopicPolicy for the outbound queue
+        self._subscriptions: Dict[str, int] = {}  # re-sent on every connect, clean sessions forget them
         self._lock = threading.RLock()
-
-        # paho-mqtt client (v2 callback API)
-        self.client = mqtt.Client(
-            mqtt.CallbackAPIVersion.VERSION2,
-            client_id=(client_id or self.pillar_id),
-            clean_session=clean_session,
-        )
+        self._outbound = OutboundQueue(max_messages=max_queued)
+        # Held for a whole drain -> publish -> requeue, so concurrent flushes (flush thread and
+        # Controller.loop) can not send batches out of order or requeue stale messages after newer ones
+        self._flush_lock = threading.Lock()
+        self.flush_interval = flush_interval
+        self._flush_thread: Optional[threading.Thread] = None
+        self.sent_count = 0
+        self.send_errors = 0
+
+        # Concrete topic -> matching (filter, handler) pairs, cleared whenever a handler is registered
+        self._dispatch_cache: Dict[str, Tuple[Tuple[str, Handler], ...]] = {}
+        self.dispatch_cache_size = dispatch_cache_size
+        # Incoming messages are decoded and handled on worker threads so a slow handler never
+        # stalls paho's network thread (keepalives, acks). handler_workers=0 handles them inline.
+        self._handler_queues: List["queue.Queue[Optional[mqtt.MQTTMessage]]"] = []
+        self._handler_threads: List[threading.Thread] = []
+        self.handler_dropped = 0
+        for i in range(handler_workers):
+            q: "queue.Queue[Optional[mqtt.MQTTMessage]]" = queue.Queue(maxsize=max_pending_messages)
+            thread = threading.Thread(target=self._handler_loop, args=(q,), name=f"mqtt-handler-{i}", daemon=True)
+            self._handler_queues.append(q)
+            self._handler_threads.append(thread)
+            thread.start()
+        for topic_filter, codec_names in (codecs or {}).items():
+            self.set_codec(topic_filter, *codec_names)
+
+        # paho-mqtt client (v2 callback API), or an in-process one (local_broker.py)
+        if broker is not None:
+            self.client = broker.create_client(client_id or self.pillar_id)
+        else:
+            self.client = mqtt.Client(
+                mqtt.CallbackAPIVersion.VERSION2,
+                client_id=(client_id or self.pillar_id),
+                clean_session=clean_session,
+            )
 
         if username:
             self.client.username_pw_set(username=username, password=password)
@@ -151,10 +181,13 @@ class MqttPillarClient:
 
         If start_network_thread is True (default), starts a background network loop.
         Otherwise, call self.client.loop_start/loop or integrate with your own poller.
+        The connect is asynchronous, a broker that is not up yet is retried by the
+        loop and anything published meanwhile waits in the outbound queue.
         """
-        self.client.connect(self.broker_host, self.broker_port, self.keepalive)
+        self.client.connect_async(self.broker_host, self.broker_port, self.keepalive)
         if start_network_thread:
             self.client.loop_start()
+        self._start_flush_thread()
         # Wait briefly for connection (non-fatal if it takes longer)
         self._connected_evt.wait(timeout=5.0)
 
@@ -163,16 +196,74 @@ class MqttPillarClient:
         Handler signature: handler(topic: str, payload: Any, props: mqtt.Properties|None).
         """
         with self._lock:
-            self._handlers[topic_filter] = handler
+            # Stored with its filter, iter_match yields the stored values
+            self._handlers[topic_filter] = (topic_filter, handler)
+            self._dispatch_cache.clear()
 
-    def subscribe(self, topic: str, qos: Optional[int] = None) -> None:
-        self.client.subscribe(topic, qos if qos is not None else self.default_qos)
+    def set_codec(self, topic_filter: str, *codec_names: str) -> None:
+        """Publish on topics matching topic_filter with the first of codec_names that fits the payload.
 
-    def publish(self, topic: str, payload: Any, qos: Optional[int] = None, retain: bool = False) -> mqtt.MQTTMessageInfo:
-        data = self._encode(payload)
-        return self.client.publish(topic, data, qos if qos is not None else self.default_qos, retain)
+        Receivers detect the codec from the payload, so only publishers need this.
+        """
+        codecs = resolve_codecs(codec_names)
+        with self._lock:
+            self._codecs[topic_filter] = codecs
+
+    def set_topic_policy(self, topic_filter: str, qos: Optional[int] = None, coalesce: bool = False, batch: bool = False) -> None:
+        """Queue messages on topics matching topic_filter with this QoS and coalescing/batching (outbound_queue.py)."""
+        with self._lock:
+            self._policies[topic_filter] = TopicPolicy(qos, coalesce, batch)
 
-    def publish_retained(self, topic: str, payload: Any, qos: Optional[int] = None) -> mqtt.MQTTMessageInfo:
+    def subscribe(self, topic: str, qos: Optional[int] = None) -> None:
+        qos = qos if qos is not None else self.default_qos
+        with self._lock:
+            self._subscriptions[topic] = qos
+        if self._connected_evt.is_set():
+            self.client.subscribe(topic, qos)
+
+    def publish(self, topic: str, payload: Any, qos: Optional[int] = None, retain: bool = False, queued: bool = True) -> Optional[mqtt.MQTTMessageInfo]:
+        """Queue payload for the next flush, or send it now with queued=False (e.g. timestamped clock pings)."""
+        policy = self._policy(topic)
+        if qos is None:
+            qos = policy.qos if policy.qos is not None else self.default_qos
+        if not queued:
+            return self.client.publish(topic, self._encode(payload, topic), qos, retain)
+        self._outbound.put(topic, payload, qos, retain, policy)
+        return None
+
+    def flush(self) -> int:
+        """Send every queued message, returns how many were sent. Nothing is sent while disconnected."""
+        if not self._connected_evt.is_set():
+            return 0
+        with self._flush_lock:
+            messages = self._outbound.drain()
+            sent = 0
+            for i, message in enumerate(messages):
+                try:
+                    info = self.client.publish(message.topic, self._encode(message.payload, message.topic),
+                                               message.qos, message.retain)
+                    ok = info.rc == mqtt.MQTT_ERR_SUCCESS
+                except Exception as e:
+                    print(f"Publish to {message.topic} failed: {e}")
+                    ok = False
+                if not ok:
+                    # Most likely the connection dropped, keep the rest for after the reconnect
+                    self.send_errors += 1
+                    self._outbound.requeue(messages[i:])
+                    break
+                sent += 1
+            self.sent_count += sent
+        return sent
+
+    def queue_stats(self) -> JSONDict:
+        stats = self._outbound.stats()
+        stats.update(sent=self.sent_count, send_errors=self.send_errors, connected=self._connected_evt.is_set(),
+                     handler_backlog=sum(q.qsize() for q in self._handler_queues),
+                     handler_dropped=self.handler_dropped)
+        return stats
+
+    def publish_retained(self, topic: str, payload: Any, qos: Optional[int] = None) -> Optional[mqtt.MQTTMessageInfo]:
+        """Queued like publish(), so it returns None (no caller needs the MQTTMessageInfo)"""
         return self.publish(topic, payload, qos=qos, retain=True)
 
     def announce_online(self) -> None:
@@ -185,7 +276,8 @@ class MqttPillarClient:
         payload = {"from": self.pillar_id, "button": int(button_id)}
         if extra:
             payload.update(extra)
-        self.publish(topic, payload, qos=qos if qos is not None else self.default_qos)
+        # qos None lets publish() apply a set_topic_policy QoS before the default
+        self.publish(topic, payload, qos=qos)
 
     def publish_state(self, key: str, value: Any, qos: Optional[int] = None, retain: bool = True) -> None:
         topic = f"{self.base_topic}/{self.pillar_id}/state/{key}"
@@ -193,9 +285,14 @@ class MqttPillarClient:
 
     def close(self, publish_offline: bool = True) -> None:
         """Gracefully stop the loop and disconnect."""
+        self._stop_evt.set()
+        try:
+            self.flush()
+        except Exception:
+            pass
         if publish_offline and self.retain_presence:
             try:
-                self.publish_retained(f"{self.base_topic}/{self.pillar_id}/status", "offline", qos=1)
+                self.publish(f"{self.base_topic}/{self.pillar_id}/status", "offline", qos=1, retain=True, queued=False)
                 # give it a moment to flush
                 self.client.loop(timeout=0.1)
             except Exception:
@@ -208,61 +305,139 @@ class MqttPillarClient:
             self.client.disconnect()
         except Exception:
             pass
+        for q in self._handler_queues:
+            q.put(None)
+        for thread in self._handler_threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout=1.0)
 
     # ---------- Internal callbacks ----------
 
     def _on_connect(self, client: mqtt.Client, userdata: Any, flags: Dict[str, Any], rc: int, properties: Optional[mqtt.Properties] = None) -> None:
         if rc == 0:
             self._connected_evt.set()
+            with self._lock:
+                subscriptions = list(self._subscriptions.items())
+            for topic, qos in subscriptions:
+                self.client.subscribe(topic, qos)
             self.announce_online()
+            self._flush_now.set()  # send the backlog queued while disconnected
         else:
             # connection failed; will keep retrying due to reconnect_delay_set
             self._connected_evt.clear()
 
-    def _on_disconnect(self, client: mqtt.Client, userdata: Any, rc: int, properties: Optional[mqtt.Properties] = None) -> None:
+    def _on_disconnect(self, client: mqtt.Client, userdata: Any, flags: Any, rc: Any = None, properties: Optional[mqtt.Properties] = None) -> None:
         self._connected_evt.clear()
         # paho will auto-reconnect if loop is running; presence LWT will fire if ungraceful
 
     def _on_message(self, client: mqtt.Client, userdata: Any, msg: mqtt.MQTTMessage) -> None:
-        payload = self._decode(msg.payload)
+        if not self._handler_queues:
+            self._dispatch(msg)
+            return
+        # Same topic, same worker, so each topic's messages are handled in the order they arrived
+        q = self._handler_queues[hash(msg.topic) % len(self._handler_queues)]
+        try:
+            q.put_nowait(msg)
+        except queue.Full:
+            # Handlers can't keep up, drop the oldest pending message rather than block the network thread
+            try:
+                q.get_nowait()
+                self.handler_dropped += 1
+            except queue.Empty:
+                pass
+            try:
+                q.put_nowait(msg)
+            except queue.Full:
+                self.handler_dropped += 1
+
+    def _handler_loop(self, q: "queue.Queue[Optional[mqtt.MQTTMessage]]") -> None:
+        while True:
+            msg = q.get()
+            if msg is None:
+                break
+            try:
+                self._dispatch(msg)
+            except Exception as e:
+                # a bad message must not kill the worker, every later message on its topics would be lost
+                print(f"Error dispatching message on {msg.topic}: {e}")
+
+    def _dispatch(self, msg: mqtt.MQTTMessage) -> None:
+        handlers = self._matching_handlers(msg.topic)
+        if not handlers:
+            return
+        try:
+            payload = self._decode(msg.payload)
+        except CodecError as e:
+            print(f"Dropping message on {msg.topic}: {e}")
+            return
         # dispatch to exact and wildcard handlers
         # MQTTMatcher returns the most specific match first if multiple are registered
-        for (topic_filter, handler) in self._iter_matching_handlers(msg.topic):
+        for (topic_filter, handler) in handlers:
             try:
                 handler(msg.topic, payload, getattr(msg, 'properties', None))
             except Exception as e:
-                # don't crash the network thread
+                # don't crash the worker thread
                 print(f"Handler error for {topic_filter}: {e}")
 
     def _on_subscribe(self, client: mqtt.Client, userdata: Any, mid: int, granted_qos: List[int], properties: Optional[mqtt.Properties] = None) -> None:
         pass  # hook for logging if needed
 
-    def _on_publish(self, client: mqtt.Client, userdata: Any, mid: int) -> None:
+    def _on_publish(self, client: mqtt.Client, userdata: Any, mid: int, reason_code: Any = None, properties: Optional[mqtt.Properties] = None) -> None:
         pass  # hook for logging if needed
 
     # ---------- Helpers ----------
 
-    def _iter_matching_handlers(self, topic: str):
-        # MQTTMatcher iterfind yields (filter, handler)
-        for tfilter, handler in self._handlers.iter_match(topic):
-            yield tfilter, handler
+    def _policy(self, topic: str) -> TopicPolicy:
+        with self._lock:
+            return next(iter(self._policies.iter_match(topic)), DEFAULT_POLICY)
+
+    def _start_flush_thread(self) -> None:
+        if self._flush_thread is not None and self._flush_thread.is_alive():
+            return
+        self._flush_thread = threading.Thread(target=self._flush_loop, name="mqtt-flush", daemon=True)
+        self._flush_thread.start()
+
+    def _flush_loop(self) -> None:
+        while not self._stop_evt.is_set():
+            self._flush_now.wait(self.flush_interval)
+            self._flush_now.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"MQTT flush failed: {e}")
 
-    @staticmethod
-    def _encode(payload: Any) -> bytes:
-        if isinstance(payload, (bytes, bytearray)):
-            return bytes(payload)
-        if isinstance(payload, str):
-            return payload.encode("utf-8")
-        # default to JSON
-        return json.dumps(payload, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+    def _matching_handlers(self, topic: str) -> Tuple[Tuple[str, Handler], ...]:
+        handlers = self._dispatch_cache.get(topic)
+        if handlers is not None:
+            return handlers
+        with self._lock:
+            # MQTTMatcher iter_match yields the stored (filter, handler) values
+            handlers = tuple(self._handlers.iter_match(topic))
+            if len(self._dispatch_cache) >= self.dispatch_cache_size:
+                self._dispatch_cache.clear()  # e.g. many one-off topics, start over rather than grow
+            self._dispatch_cache[topic] = handlers
+        return handlers
+
+    def _encode(self, payload: Any, topic: Optional[str] = None) -> bytes:
+        codecs = (JSON_CODEC,)
+        if topic is not None:
+            with self._lock:
+                codecs = next(iter(self._codecs.iter_match(topic)), codecs)
+        return encode_payload(payload, codecs)
 
     @staticmethod
     def _decode(data: bytes) -> Any:
-        # try JSON first, fall back to utf-8 string
-        try:
-            return json.loads(data.decode("utf-8"))
-        except Exception:
-            try:
-                return data.decode("utf-8")
-            except Exception:
-                return data  # raw bytes as last resort
+        # binary codecs carry a header, anything else is JSON or a plain string
+        return decode_payload(data)
+
+
+class MqttPillarClientMock(MqttPillarClient):
+    """MqttPillarClient on the in-process LocalBroker, broker_host is ignored.
+
+    Every mock in the process shares LocalBroker.default() unless a broker is
+    passed, so pillars started in one process talk to each other as they
+    would over a real broker.
+    """
+
+    def __init__(self, broker_host: str, *args: Any, broker: Optional[Any] = None, **kwargs: Any) -> None:
+        super().__init__(broker_host, *args, broker=broker or LocalBroker.default(), **kwargs)
@@ -0,0 +1,134 @@
+import itertools
+import socket
+import struct
+import threading
+import time
+
+# Seconds between the NTP epoch (1900) used by OSC time tags and the unix epoch
+NTP_EPOCH_OFFSET = 2208988800
+
+# sclang allocates node ids for client 0 below 2**26, so ours start above that
+NODE_ID_BASE = 1 << 26
+DEFAULT_GROUP = 1
+ADD_TO_HEAD = 0
+
+MAX_BUNDLE_MESSAGES = 64  # Keeps a bundle well inside one UDP datagram
+
+
+def _osc_string(value):
+    data = value.encode("utf-8") + b"\0"
+    return data + b"\0" * (-len(data) % 4)
+
+
+def encode_message(address, *args):
+    """Encode an OSC message with int, float and string arguments"""
+    tags = ","
+    payload = []
+    for arg in args:
+        if isinstance(arg, str):
+            tags += "s"
+            payload.append(_osc_string(arg))
+        elif isinstance(arg, int):
+            tags += "i"
+            payload.append(struct.pack(">i", arg))
+        else:
+            tags += "f"
+            payload.append(struct.pack(">f", float(arg)))
+    return _osc_string(address) + _osc_string(tags) + b"".join(payload)
+
+
+def encode_bundle(timestamp, messages):
+    """Encode pre-encoded messages as one bundle to be run at unix time `timestamp`"""
+    ntp = timestamp + NTP_EPOCH_OFFSET
+    seconds = int(ntp)
+    fraction = int((ntp - seconds) * (1 << 32)) & 0xFFFFFFFF
+    parts = [b"#bundle\0", struct.pack(">II", seconds, fraction)]
+    for message in messages:
+        parts.append(struct.pack(">i", len(message)))
+        parts.append(message)
+    return b"".join(parts)
+
+
+def midi_to_hz(pitch):
+    return 440.0 * 2 ** ((pitch - 69) / 12.0)
+
+
+class OscBundler():
+    """Sends SuperCollider note events to scsynth as timestamped OSC bundles
+
+    note() turns a note into an /s_new at its start and an /n_set gate 0 at
+    its end, each stamped with an absolute time `latency` seconds ahead so
+    scsynth starts it sample accurately. Events are grouped by `quantum`
+    sized ticks and flush() sends every tick due within `horizon` as a single
+    bundle, so a chord or a burst of broadcast echoes is one UDP packet
+    instead of one message (and one SCAMP fork) per note.
+    """
+
+    def __init__(self, host="127.0.0.1", port=57110, latency=0.05, quantum=0.01, horizon=0.1):
+        self.address = (host, port)
+        self.latency = latency
+        self.quantum = quantum
+        self.horizon = horizon
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.node_ids = itertools.count(NODE_ID_BASE)
+        self.pending = {}  # tick index -> [encoded messages]
+        self.lock = threading.Lock()
+
+        self.sent_bundles = 0
+        self.sent_messages = 0
+        self.send_errors = 0
+
+    def schedule(self, at, message):
+        """Queue an encoded message to run at unix time `at`"""
+        tick = int(round(at / self.quantum))
+        with self.lock:
+            self.pending.setdefault(tick, []).append(message)
+
+    def note(self, synthdef, pitch, volume, duration, delay=0.0):
+        """Queue a gated note on synthdef starting `delay` seconds from now, returns the node id"""
+        node_id = next(self.node_ids)
+        start = time.time() + self.latency + delay
+        self.schedule(start, encode_message(
+            "/s_new", synthdef, node_id, ADD_TO_HEAD, DEFAULT_GROUP,
+            "freq", midi_to_hz(pitch), "volume", float(volume)))
+        self.schedule(start + duration, encode_message("/n_set", node_id, "gate", 0))
+        return node_id
+
+    def flush(self, now=None):
+        """Send every tick due within the horizon, one bundle per tick, returns bundles sent"""
+        if now is None:
+            now = time.time()
+        last_tick = (now + self.horizon) / self.quantum
+        with self.lock:
+            if not self.pending:
+                return 0
+            due = sorted(tick for tick in self.pending if tick <= last_tick)
+            batches = [(tick, self.pending.pop(tick)) for tick in due]
+
+        sent = 0
+        for tick, messages in batches:
+            timestamp = tick * self.quantum
+            for i in range(0, len(messages), MAX_BUNDLE_MESSAGES):
+                chunk = messages[i:i + MAX_BUNDLE_MESSAGES]
+                try:
+                    self.sock.sendto(encode_bundle(timestamp, chunk), self.address)
+                    sent += 1
+                    self.sent_messages += len(chunk)
+                except OSError as e:
+                    self.send_errors += 1
+                    print(f"[OSC] Failed to send bundle to {self.address}: {e}")
+        self.sent_bundles += sent
+        return sent
+
+    def stats(self):
+        with self.lock:
+            pending = sum(len(messages) for messages in self.pending.values())
+        return dict(
+            sent_bundles=self.sent_bundles,
+            sent_messages=self.sent_messages,
+            pending_messages=pending,
+            send_errors=self.send_errors,
+        )
+
+    def close(self):
+        self.sock.close()
@@ -0,0 +1,136 @@
+"""
+outbound_queue.py — Bounded outbound message queue for MqttPillarClient.
+
+Publishes are queued and sent together by MqttPillarClient.flush(), which
+runs every flush interval from a background thread and can also be called
+at the end of a controller tick. Per topic policies decide how a message is
+queued:
+
+    coalesce - one pending message per topic, a newer one replaces it (latest state wins)
+    batch    - one pending message per topic, newer dict payloads are merged into it
+               with list fields such as "reaction_notes" concatenated
+    qos      - QoS used when the message is sent, e.g. 0 for ephemeral notes
+
+Nothing is sent while disconnected, messages wait in the queue (dropping the
+oldest once `max_messages` are pending) and go out after the reconnect.
+"""
+from __future__ import annotations
+
+import itertools
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+
+class TopicPolicy(NamedTuple):
+    qos: Optional[int] = None  # None uses the client's default QoS
+    coalesce: bool = False
+    batch: bool = False
+
+
+DEFAULT_POLICY = TopicPolicy()
+
+
+class OutboundMessage:
+    __slots__ = ("topic", "payload", "qos", "retain")
+
+    def __init__(self, topic: str, payload: Any, qos: int, retain: bool) -> None:
+        self.topic = topic
+        self.payload = payload
+        self.qos = qos
+        self.retain = retain
+
+
+class OutboundQueue:
+    def __init__(self, max_messages: int = 1000, batch_keys: Sequence[str] = ("reaction_notes",)) -> None:
+        self.max_messages = max_messages
+        self.batch_keys = set(batch_keys)
+        self._entries: "OrderedDict[Any, OutboundMessage]" = OrderedDict()
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+        self.enqueued = 0
+        self.coalesced = 0
+        self.batched = 0
+        self.dropped = 0
+        self.max_depth = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _merge(self, old: Any, new: Any) -> Any:
+        if isinstance(old, dict) and isinstance(new, dict):
+            merged = dict(old)
+            for key, value in new.items():
+                if key in self.batch_keys and isinstance(merged.get(key), list) and isinstance(value, list):
+                    merged[key] = merged[key] + value
+                else:
+                    merged[key] = value
+            return merged
+        if isinstance(old, list) and isinstance(new, list):
+            return old + new
+        return new
+
+    def _make_room_locked(self) -> None:
+        while len(self._entries) >= self.max_messages:
+            self._entries.popitem(last=False)
+            self.dropped += 1
+
+    def put(self, topic: str, payload: Any, qos: int, retain: bool = False,
+            policy: TopicPolicy = DEFAULT_POLICY) -> None:
+        with self._lock:
+            if policy.coalesce or policy.batch:
+                key = ("topic", topic, retain)
+                pending = self._entries.get(key)
+                if pending is not None:
+                    # Keeps its place in the queue so a busy topic is never starved
+                    if policy.batch:
+                        pending.payload = self._merge(pending.payload, payload)
+                        self.batched += 1
+                    else:
+                        pending.payload = payload
+                        self.coalesced += 1
+                    pending.qos = qos
+                    return
+            else:
+                key = next(self._counter)
+            self._make_room_locked()
+            self._entries[key] = OutboundMessage(topic, payload, qos, retain)
+            self.enqueued += 1
+            if len(self._entries) > self.max_depth:
+                self.max_depth = len(self._entries)
+
+    def drain(self) -> List[OutboundMessage]:
+        """Take every pending message, oldest first"""
+        with self._lock:
+            messages = list(self._entries.values())
+            self._entries.clear()
+            return messages
+
+    def requeue(self, messages: List[OutboundMessage]) -> None:
+        """Put messages that could not be sent back in front of anything queued since"""
+        with self._lock:
+            newer = list(self._entries.items())
+            self._entries.clear()
+            for message in messages:
+                self._entries[next(self._counter)] = message
+            for key, message in newer:
+                self._entries[key] = message
+            while len(self._entries) > self.max_messages:
+                self._entries.popitem(last=False)
+                self.dropped += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "depth": len(self._entries),
+                "max_depth": self.max_depth,
+                "enqueued": self.enqueued,
+                "coalesced": self.coalesced,
+                "batched": self.batched,
+                "dropped": self.dropped,
+            }
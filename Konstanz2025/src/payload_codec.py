@@ -0,0 +1,148 @@
+"""
+payload_codec.py — Compact, versioned MQTT payload encodings for MqttPillarClient.
+
+Binary payloads start with a 3 byte header: MAGIC, codec id, codec version.
+MAGIC is never the first byte of UTF-8 text, so JSON and plain string
+payloads from older pillars still decode exactly as before and a receiver
+never needs to know which codec a topic was published with.
+
+Codecs:
+    json    - the original encoding, also used for bytes and str payloads
+    notes   - fixed struct for {"reaction_notes": [...]} (optionally "seq"), 1 byte per note
+    msgpack - any JSON-like payload, only when the msgpack package is installed
+
+A publisher picks an ordered list of codecs per topic and the first one that
+can represent the payload wins, e.g. ("notes", "msgpack") sends note-only
+broadcasts as a struct and anything else as msgpack (or JSON without it).
+"""
+from __future__ import annotations
+
+import json
+import struct
+from typing import Any, Dict, Optional, Sequence
+
+try:
+    import msgpack
+    HAS_MSGPACK = True
+except ImportError:
+    HAS_MSGPACK = False
+
+MAGIC = 0xF5  # Invalid as a leading UTF-8 byte
+HEADER = struct.Struct(">BBB")  # magic, codec id, version
+NOTES_HEADER = struct.Struct(">HB")  # seq, note count
+
+
+class CodecError(ValueError):
+    pass
+
+
+class JsonCodec:
+    name = "json"
+    codec_id = 0  # Not written, JSON payloads have no header
+    version = 1
+
+    def encode(self, payload: Any) -> Optional[bytes]:
+        if isinstance(payload, (bytes, bytearray)):
+            return bytes(payload)
+        if isinstance(payload, str):
+            return payload.encode("utf-8")
+        return json.dumps(payload, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+    def decode(self, data: bytes, version: int = 1) -> Any:
+        # try JSON first, fall back to utf-8 string
+        try:
+            return json.loads(data.decode("utf-8"))
+        except Exception:
+            try:
+                return data.decode("utf-8")
+            except Exception:
+                return data  # raw bytes as last resort
+
+
+class NoteEventCodec:
+    """{"reaction_notes": [60, 64], "seq": 7} as seq, count and one byte per MIDI note"""
+
+    name = "notes"
+    codec_id = 1
+    version = 1
+    fields = {"reaction_notes", "seq"}
+
+    def encode(self, payload: Any) -> Optional[bytes]:
+        if not isinstance(payload, dict) or "reaction_notes" not in payload or not set(payload) <= self.fields:
+            return None
+        notes = payload["reaction_notes"]
+        if len(notes) > 255 or not all(isinstance(n, int) and 0 <= n <= 127 for n in notes):
+            return None
+        return NOTES_HEADER.pack(int(payload.get("seq", 0)) & 0xFFFF, len(notes)) + bytes(notes)
+
+    def decode(self, data: bytes, version: int = 1) -> Any:
+        try:
+            seq, count = NOTES_HEADER.unpack_from(data)
+        except struct.error as e:
+            raise CodecError(f"Note payload truncated: {e}") from e
+        notes = data[NOTES_HEADER.size:NOTES_HEADER.size + count]
+        if len(notes) != count:
+            raise CodecError(f"Note payload truncated, expected {count} notes got {len(notes)}")
+        return {"reaction_notes": list(notes), "seq": seq}
+
+
+class MsgpackCodec:
+    name = "msgpack"
+    codec_id = 2
+    version = 1
+
+    def encode(self, payload: Any) -> Optional[bytes]:
+        if not HAS_MSGPACK or isinstance(payload, (bytes, bytearray, str)):
+            return None
+        try:
+            return msgpack.packb(payload, use_bin_type=True)
+        except (TypeError, ValueError):
+            return None
+
+    def decode(self, data: bytes, version: int = 1) -> Any:
+        if not HAS_MSGPACK:
+            raise CodecError("Received a msgpack payload but msgpack is not installed")
+        try:
+            return msgpack.unpackb(data, raw=False)
+        except (msgpack.ExtraData, ValueError) as e:
+            raise CodecError(f"Invalid msgpack payload: {e}") from e
+
+
+JSON_CODEC = JsonCodec()
+CODECS: Dict[str, Any] = {codec.name: codec for codec in (JSON_CODEC, NoteEventCodec(), MsgpackCodec())}
+CODECS_BY_ID: Dict[int, Any] = {codec.codec_id: codec for codec in CODECS.values() if codec is not JSON_CODEC}
+
+
+def resolve_codecs(names: Sequence[str]) -> tuple:
+    """Codec objects for names, in order, with JSON appended as the last resort"""
+    unknown = [name for name in names if name not in CODECS]
+    if unknown:
+        raise ValueError(f"Unknown payload codecs {unknown}, expected some of {sorted(CODECS)}")
+    codecs = tuple(CODECS[name] for name in names)
+    return codecs if JSON_CODEC in codecs else codecs + (JSON_CODEC,)
+
+
+def encode_payload(payload: Any, codecs: Sequence[Any] = (JSON_CODEC,)) -> bytes:
+    """Encode with the first codec that accepts the payload"""
+    for codec in codecs:
+        data = codec.encode(payload)
+        if data is None:
+            continue
+        if codec is JSON_CODEC:
+            return data
+        return HEADER.pack(MAGIC, codec.codec_id, codec.version) + data
+    return JSON_CODEC.encode(payload)
+
+
+def decode_payload(data: bytes) -> Any:
+    """Decode a payload from any codec, JSON/text unless it carries the binary header
+
+    Raises CodecError for an unknown codec or a malformed binary payload.
+    """
+    if len(data) >= HEADER.size and data[0] == MAGIC:
+        _, codec_id, version = HEADER.unpack_from(data)
+        codec = CODECS_BY_ID.get(codec_id)
+        if codec is None or version > codec.version:
+            raise CodecError(f"Unsupported payload codec {codec_id} version {version}")
+        return codec.decode(data[HEADER.size:], version)
+    return JSON_CODEC.decode(data)
@@ -1,5 +1,6 @@
 from scamp import *
 import random
+import re
 from scamp_extensions.playback.supercollider import add_sc_extensions
 
 def init_scamp_extensions():
@@ -235,6 +236,12 @@ SC_PARTS = {
     """
 }
 
+# SC_PARTS name -> the name the SynthDef registers on the server, for sending /s_new directly
+SYNTHDEF_NAMES = {
+    name: re.search(r"SynthDef\(\\(\w+)", source).group(1)
+    for name, source in SC_PARTS.items()
+}
+
 def create_supercollider_synth(s: Session, name: str):
     return s.new_supercollider_part(name, SC_PARTS[name])
     
@@ -4,7 +4,6 @@ from scamp_extensions.playback.supercollider import add_sc_extensions
 
 import expenvelope as expe
  
-import multiprocessing as mp
 from queue import Queue
 import random
 import numpy as np
@@ -13,6 +12,8 @@ from functools import reduce
 
 from interfaces import *
 from sc_synths import * 
+from shared_state import SharedState
+from osc_bundles import OscBundler
 
 add_sc_extensions()
 
@@ -74,13 +75,13 @@ class InstrumentManager:
 
 class Composer:
 
-    def __init__(self, session, initial_state):
+    def __init__(self, session, initial_state, shared_state_backend="local", bundler=None):
         self.session = session
+        # When set, reaction and broadcast notes on SC synths go out as OSC bundles instead of forks
+        self.bundler = bundler
 
         self.state = copy.deepcopy(initial_state)
 
-        self.mp_manager = mp.Manager()
-
         # Instruments
         self.instrument_manager = InstrumentManager(self.session)
         self.update_instruments(self.state["instruments"])
@@ -91,11 +92,12 @@ class Composer:
         self.key_generator = self.generate_key_generator()
         self.melody_generator = self.generate_melody_generator(next(self.key_generator))
 
-        self.shared_state = {
-            "key": self.mp_manager.Value('s', next(self.key_generator)),
-            "chord_levels": self.mp_manager.Value('d', 0),
+        # The forks are SCAMP threads in this process, so no manager process is needed
+        self.shared_state = SharedState({
+            "key": next(self.key_generator),
+            "chord_levels": 0,
             "melody_speed_multipler": 8.0
-        }
+        }, backend=shared_state_backend)
 
         self.active_forks = {
             "melody1": None,
@@ -113,8 +115,7 @@ class Composer:
         # print("Sound State Updating", setting_name, self.state[setting_name],  value)
         if self.state[setting_name] != value:
             # Interaction
-            if self.shared_state["chord_levels"].value < 4:
-                self.shared_state["chord_levels"].value += 1
+            self.shared_state["chord_levels"].add(1, maximum=4)
 
             value = copy.deepcopy(value)
             # The copy is important here
@@ -129,12 +130,14 @@ class Composer:
                 # self.session.bpm = value
                 self.session.set_tempo_target(value, 0.2)
             if setting_name == "reaction_notes":
-                for i, note in enumerate(value):
-                    self.session.fork(self.fork_melody_single_note, args=(note,))
+                if not self.bundle_melody_notes(value):
+                    for i, note in enumerate(value):
+                        self.session.fork(self.fork_melody_single_note, args=(note,))
             if setting_name == "broadcast_notes":
                 delay = self.state["broadcast"]["echo_delay_duration"]
-                for i, note in enumerate(value):
-                    self.session.fork(self.fork_melody_single_note, args=(note,delay,))
+                if not self.bundle_melody_notes(value, delay):
+                    for i, note in enumerate(value):
+                        self.session.fork(self.fork_melody_single_note, args=(note,delay,))
             
             # Play any sounds
             # self.session.fork(self.fork_melody, args=(self.shared_state,))
@@ -145,10 +148,10 @@ class Composer:
             self.instrument_manager.update_instrument(v, function=k)
 
     def update_key(self, key):
-        self.shared_state["key"].value = key
+        self.shared_state["key"].set(key)
 
     def update_chord_leve(self, level):
-        self.shared_state["chord_levels"].value += level
+        self.shared_state["chord_levels"].add(level)
 
     def generate_key_generator(self):
         # return seprocess.generators.random_walk(self.all_keys[0], clamp_min=min(self.all_keys), clamp_max=max(self.all_keys))
@@ -172,6 +175,25 @@ class Composer:
             print(f"[COMPOSER] Starting fork: {function_name}")
             self.active_forks[function_name] = self.session.fork(function, args=(self.shared_state,))
     
+    def bundle_melody_notes(self, notes, delay=0.0):
+        """Queue notes on the melody1 SC synth as one OSC bundle, False if they need forks instead
+
+        delay is in beats like wait() in fork_melody_single_note.
+        """
+        if self.bundler is None or not notes:
+            return False
+        synthdef = SYNTHDEF_NAMES.get(self.instrument_manager.instrument_names["melody1"])
+        if synthdef is None:
+            return False
+        volume = self.state["volume"]["melody1"]
+        delay_seconds = delay * 60.0 / self.session.tempo if delay > 0 else 0.0
+        for note in notes:
+            self.bundler.note(synthdef, note, volume, 0.25 * 60.0 / self.session.tempo, delay_seconds)
+        # Notes due now leave straight away, the rest go out from SoundManager.tick
+        self.bundler.flush()
+        print(f"[COMPOSER] Bundled {len(notes)} notes on {synthdef} (delay {delay})")
+        return True
+
     def fork_melody_single_note(self, note, delay=0.0):
         volume = self.state["volume"]["melody1"]
         instrument = self.instrument_manager.melody1_instrument()
@@ -279,7 +301,7 @@ class Composer:
 class SoundManager:
     """Manages and schedules sound playback for pillars using the Sonic Pi server."""          
     
-    def __init__(self, pillar_id, initial_state=None):
+    def __init__(self, pillar_id, initial_state=None, shared_state_backend="local"):
         self.pillar_id = pillar_id
         self.session = Session()
         self.state = initial_state if initial_state is not None else DEFAULT_STATE
@@ -287,7 +309,11 @@ class SoundManager:
         for k, d in DEFAULT_STATE.items(): # merge (note is not recursive)
             if k not in self.state:
                 self.state[k] = d
-        self.composer = Composer(self.session, self.state)
+        # Set "osc_bundles": false in the pillar config to go back to one SCAMP fork per note
+        self.bundler = None
+        if self.state.get("osc_bundles", True):
+            self.bundler = OscBundler(port=self.state.get("scsynth_port", 57110))
+        self.composer = Composer(self.session, self.state, shared_state_backend, self.bundler)
 
     def __repr__(self):
         """String representation of the pillar for debugging."""
@@ -300,6 +326,8 @@ class SoundManager:
     def tick(self, time_delta=1/30.0):
         # Start melody/harmony forks if needed (background always running)
         self.composer.play()
+        if self.bundler is not None:
+            self.bundler.flush()
         wait(time_delta, units="time")
 
 
@@ -0,0 +1,240 @@
+"""
+mqtt_benchmark.py — Pillar fan-out load test on the in-process MQTT broker.
+
+Starts N simulated pillars in one process, each a real Controller from
+src/main.py with its serial port on a pyserial loop:// (Pillar's fallback
+when the port does not exist), its SoundManager replaced by a recorder and
+its MqttPillarClientMock connected to the shared LocalBroker. Touches are
+written to each pillar's serial port as the Teensy would send them
+("CAP,0,1,0,0,0,0"), so every echo goes through serial parsing, the mapper,
+the broadcast, the outbound queue, the broker and the peers' handlers.
+
+Reported per pillar count:
+    msgs/s       messages published to and delivered by the broker per second
+    publish->rx  broadcast publish to peer handler latency (p50/p99, ms)
+    touch->rx    serial touch to peer handler latency (p50/p99, ms)
+    cpu          process CPU time / wall time (1.0 = one core busy)
+
+    python3 testing/mqtt_benchmark.py --pillars 1 5 10 25 50 --seconds 10 --touch_rate 2
+"""
+import argparse
+import contextlib
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from local_broker import LocalBroker  # noqa: E402
+from main import Controller  # noqa: E402
+
+DEFAULT_STATE = {
+    "volume": {"melody1": 1.0, "melody2": 0.8, "harmony": 0.5, "background": 0.3},
+    "instruments": {"melody1": "xylophone", "melody2": "lead2_synth", "harmony": "flute", "background": "strings"},
+    "key": 48,
+    "bpm": 100,
+    "melody_scale": "pentatonic",
+    "melody_number": 0,
+    "baseline_style": "long",
+    "chord_levels": 0,
+    "reaction_notes": [],
+}
+
+
+def make_config(num_pillars):
+    pillars = {}
+    for i in range(num_pillars):
+        pillars[f"bench{i:03d}"] = {
+            "id": i,
+            "port": f"/dev/null/bench{i:03d}",  # never exists, Pillar falls back to loop://
+            "pan": 0,
+            "num_tubes": 6,
+            "map": "FixedMapper",
+            "notes": [1, 2, 4, 5, 8, 11],
+            "octave": 5,
+            "bpm": 60,
+            "instruments": dict(DEFAULT_STATE["instruments"]),
+            "volume": dict(DEFAULT_STATE["volume"]),
+            "broadcast": {"echo_delay_duration": 0.0},
+        }
+    return {
+        "mqtt": {"enable": True, "mock": True, "mqtt_broker_ip": "local", "broker_ip": "local",
+                 "clock_sync": {"enable": False}},
+        "pillars": pillars,
+        "default_state": DEFAULT_STATE,
+    }
+
+
+class RecordingSoundManager():
+    """Stands in for SoundManager, records what the controller asks it to play"""
+
+    def __init__(self):
+        self.session = None
+        self.lock = threading.Lock()
+        self.settings = 0
+        self.broadcast_notes = 0
+
+    def update_pillar_setting(self, setting_name, value):
+        with self.lock:
+            self.settings += 1
+            if setting_name == "broadcast_notes":
+                self.broadcast_notes += len(value)
+
+    def tick(self, time_delta=1/30.0):
+        time.sleep(time_delta)
+
+
+class BenchController(Controller):
+    """Controller that timestamps its broadcasts and the ones it receives"""
+
+    def __init__(self, hostname, config, results):
+        super().__init__(hostname, config, sound_manager=RecordingSoundManager())
+        self.results = results
+        self.last_touch_time = None
+
+    def touch(self, tube_id):
+        """Press and release one tube over the (loop://) serial port like the Teensy"""
+        status = ["0"] * self.pillar_manager.num_touch_sensors
+        status[tube_id] = "1"
+        self.last_touch_time = time.perf_counter()
+        self.pillar_manager.ser.write(f"CAP,{','.join(status)}\n".encode())
+
+    def release(self):
+        self.pillar_manager.ser.write(f"CAP,{','.join(['0'] * self.pillar_manager.num_touch_sensors)}\n".encode())
+
+    def broadcast_notes_to_other_pillars(self, sound_state):
+        sent = sound_state.has_reaction_notes()
+        super().broadcast_notes_to_other_pillars(sound_state)
+        if sent:
+            self.results.sent(self.hostname, self.broadcast_seq, time.perf_counter(), self.last_touch_time)
+
+    def on_other_pillar_receive(self, topic, sound_state, props=None):
+        if isinstance(sound_state, dict) and "seq" in sound_state:
+            self.results.received(topic.rsplit("/", 1)[-1], sound_state["seq"], self.hostname, time.perf_counter())
+        super().on_other_pillar_receive(topic, sound_state, props)
+
+    def run(self):
+        while self.running:
+            self.loop()
+
+
+class Results():
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sends = {}  # (sender, seq) -> (publish time, touch time)
+        self.publish_latency = []
+        self.touch_latency = []
+
+    def sent(self, sender, seq, t_publish, t_touch):
+        with self.lock:
+            self.sends[(sender, seq)] = (t_publish, t_touch)
+
+    def received(self, sender, seq, receiver, t_receive):
+        with self.lock:
+            times = self.sends.get((sender, seq))
+        if times is None or receiver == sender:
+            return
+        t_publish, t_touch = times
+        with self.lock:
+            self.publish_latency.append(t_receive - t_publish)
+            if t_touch is not None:
+                self.touch_latency.append(t_receive - t_touch)
+
+
+def percentile(values, q):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100.0 * len(values)))]
+
+
+def run_benchmark(num_pillars, seconds, touch_rate, seed=None):
+    rng = random.Random(seed)
+    config = make_config(num_pillars)
+    results = Results()
+    broker = LocalBroker.default()  # every MqttPillarClientMock connects to it
+    broker.reset()
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        controllers = [BenchController(hostname, config, results) for hostname in config["pillars"]]
+        threads = [threading.Thread(target=c.run, daemon=True) for c in controllers]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.5)  # let every client connect and subscribe
+
+        start_stats = broker.stats()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        next_touch = {c.hostname: wall_start + rng.expovariate(touch_rate) for c in controllers}
+        pressed = {}
+        while time.perf_counter() - wall_start < seconds:
+            now = time.perf_counter()
+            for controller in controllers:
+                if controller.hostname in pressed and now >= pressed[controller.hostname]:
+                    controller.release()
+                    del pressed[controller.hostname]
+                elif controller.hostname not in pressed and now >= next_touch[controller.hostname]:
+                    controller.touch(rng.randrange(controller.pillar_manager.num_touch_sensors))
+                    pressed[controller.hostname] = now + 0.1
+                    next_touch[controller.hostname] = now + 0.1 + rng.expovariate(touch_rate)
+            time.sleep(0.005)
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+        end_stats = broker.stats()
+
+        for controller in controllers:
+            controller.stop()
+        for thread in threads:
+            thread.join(timeout=1.0)
+        queue_stats = [c.mqtt_client.queue_stats() for c in controllers]
+        for controller in controllers:
+            controller.mqtt_client.close()
+            # Stop the serial threads before closing the port, or they spin on a closed port
+            controller.pillar_manager.kill_read_thread.set()
+            controller.pillar_manager.write_queue.put("kill")
+            controller.pillar_manager.cleanup()
+        for controller in controllers:
+            controller.pillar_manager.serial_thread.join(timeout=1.0)
+            controller.pillar_manager.serial_write_thread.join(timeout=1.0)
+
+    published = end_stats["published"] - start_stats["published"]
+    delivered = end_stats["delivered"] - start_stats["delivered"]
+    return dict(
+        pillars=num_pillars,
+        wall=wall,
+        published_per_s=published / wall,
+        delivered_per_s=delivered / wall,
+        echoes=len(results.publish_latency),
+        publish_p50=percentile(results.publish_latency, 50) * 1000.0,
+        publish_p99=percentile(results.publish_latency, 99) * 1000.0,
+        touch_p50=percentile(results.touch_latency, 50) * 1000.0,
+        touch_p99=percentile(results.touch_latency, 99) * 1000.0,
+        cpu=cpu / wall,
+        dropped=sum(stats["dropped"] for stats in queue_stats),
+        threads=threading.active_count(),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark MQTT fan-out between simulated pillars")
+    parser.add_argument("--pillars", type=int, nargs="+", default=[1, 5, 10, 25, 50], help="Pillar counts to run")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Measured seconds per pillar count")
+    parser.add_argument("--touch_rate", type=float, default=1.0, help="Touches per second per pillar")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    print(f"{'pillars':>7} {'pub/s':>8} {'deliv/s':>9} {'echoes':>7} {'pub->rx p50/p99 ms':>19} "
+          f"{'touch->rx p50/p99 ms':>21} {'cpu':>6} {'drops':>6}")
+    for num_pillars in args.pillars:
+        r = run_benchmark(num_pillars, args.seconds, args.touch_rate, args.seed)
+        print(f"{r['pillars']:>7} {r['published_per_s']:>8.1f} {r['delivered_per_s']:>9.1f} {r['echoes']:>7} "
+              f"{r['publish_p50']:>9.2f}/{r['publish_p99']:<9.2f} {r['touch_p50']:>10.2f}/{r['touch_p99']:<10.2f} "
+              f"{r['cpu']:>6.2f} {r['dropped']:>6}")
+        sys.stdout.flush()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -8,44 +8,10 @@ import time
 from pillar_hw_interface import Pillar
 from mapping_interface import RotationMapper, EventRotationMapper, generate_mapping_interface
 from sound_manager import SoundManager
-
-import requests
+from telemetry import TelemetryExporter
 
 import csv
 
-class APISender(threading.Thread):
-    def __init__(self, endpoint, data_queue, interval=0.2):
-        """
-        A thread that sends data packets to an API at a specified interval.
-
-        :param endpoint: The API endpoint URL.
-        :param data_queue: A queue for receiving data from the main loop.
-        :param interval: Time between requests in seconds (5Hz = 0.2s).
-        """
-        super().__init__()
-        self.endpoint = endpoint
-        self.data_queue = data_queue
-        self.interval = interval
-        self.running = True
-
-    def run(self):
-        while self.running:
-            try:
-                # Get the latest data, or wait for it (timeout to prevent hanging on stop)
-                data = self.data_queue.get(timeout=1)  
-                response = requests.post(self.endpoint, json=data, timeout=2)
-                # print(f"Sent data: {data}, Response: {response.status_code}")
-            except queue.Empty:
-                # If no data is available, continue waiting
-                pass
-            except requests.RequestException as e:
-                print(f"Request failed: {e}")
-
-            time.sleep(self.interval)
-
-    def stop(self):
-        self.running = False
-
 class Controller():
 
     def __init__(self, hostname, config):
@@ -58,7 +24,12 @@ class Controller():
         self.loop_idx = 0
         self.running = True
 
-        self.data_queue = queue.Queue()  # Thread-safe queue for data exchange
+        # Loop snapshots for the API, bounded and sent in batches (telemetry.py)
+        self.telemetry = None
+        telemetry_config = dict(config.get("telemetry", {}))
+        if telemetry_config.pop("enable", False) and config.get("tonnetz_server_api_endpoint"):
+            self.telemetry = TelemetryExporter(config["tonnetz_server_api_endpoint"], **telemetry_config)
+            self.telemetry.start()
 
     def start(self, frequency):
         """Starts the main control loop
@@ -73,6 +44,8 @@ class Controller():
 
     def stop(self):
         self.running = False
+        if self.telemetry is not None:
+            self.telemetry.stop()
 
     def loop(self):
 
@@ -98,12 +71,14 @@ class Controller():
 
         self.sound_manager.tick(time_delta=1/30.0)
         
-        data = {
-            "btn_press": current_btn_press,
-            "sound_state": sound_state.to_json(),
-            "light_state": list(light_state)
-        }
-        self.data_queue.put(data)
+        if self.telemetry is not None:
+            data = {
+                "ts": time.time(),  # batched, so the server can't use the arrival time
+                "btn_press": current_btn_press,
+                "sound_state": sound_state.to_json(),
+                "light_state": list(light_state)
+            }
+            self.telemetry.put(data)
 
         self.loop_idx += 1
 
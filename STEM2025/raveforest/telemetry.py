@@ -0,0 +1,153 @@
+import collections
+import gzip
+import json
+import random
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class TelemetryExporter(threading.Thread):
+    """Sends controller loop snapshots to the API in batches from a background thread
+
+    The controller calls put() every loop, which never blocks: snapshots go
+    into a buffer of at most `max_items` and the oldest are dropped once it
+    is full, so an unreachable server costs a fixed amount of memory rather
+    than growing all day.
+
+    Every `interval` seconds up to `batch_size` snapshots are sent as one
+    POST of a JSON list, gzip compressed (Content-Encoding: gzip) unless
+    `compress` is False. With batch_size=1 and compress=False each snapshot
+    is posted on its own as a JSON object, like the old APISender.
+
+    One requests.Session keeps the connection to the server alive between
+    posts. A batch that fails (connection error, timeout or a 5xx) is
+    retried with exponential backoff and jitter, from `backoff` up to
+    `max_backoff` seconds, and dropped after `max_retries` retries. New
+    snapshots keep going into the buffer meanwhile.
+    """
+
+    def __init__(self, endpoint, max_items=600, batch_size=50, interval=1.0, timeout=2.0, compress=True,
+                 max_retries=5, backoff=0.5, max_backoff=30.0, session=None):
+        super().__init__(name="telemetry", daemon=True)
+        self.endpoint = endpoint
+        self.batch_size = max(1, batch_size)
+        self.interval = interval
+        self.timeout = timeout
+        self.compress = compress
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        self.session = session or requests.Session()
+        # One pooled keep-alive connection is all a single sender needs
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+
+        self.buffer = collections.deque(maxlen=max_items)
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.pending = []  # batch being sent or retried
+        self.retries = 0
+
+        self.queued = 0
+        self.dropped = 0
+        self.sent_items = 0
+        self.sent_batches = 0
+        self.failed_batches = 0
+        self.sent_bytes = 0
+
+    def put(self, data):
+        with self.lock:
+            if len(self.buffer) == self.buffer.maxlen:
+                self.dropped += 1  # deque drops the oldest
+            self.buffer.append(data)
+            self.queued += 1
+
+    def _next_batch(self):
+        with self.lock:
+            count = min(self.batch_size, len(self.buffer))
+            return [self.buffer.popleft() for _ in range(count)]
+
+    def _encode(self, batch):
+        payload = batch[0] if self.batch_size == 1 and not self.compress else batch
+        body = json.dumps(payload, separators=(",", ":"), default=str).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        if self.compress:
+            body = gzip.compress(body, compresslevel=5)
+            headers["Content-Encoding"] = "gzip"
+        return body, headers
+
+    def _post(self, batch):
+        """True once the server accepted the batch, False if it is worth retrying"""
+        body, headers = self._encode(batch)
+        try:
+            response = self.session.post(self.endpoint, data=body, headers=headers, timeout=self.timeout)
+        except requests.RequestException as e:
+            print(f"[TELEMETRY] Request failed: {e}")
+            return False
+        if response.status_code >= 500:
+            print(f"[TELEMETRY] Server error {response.status_code}")
+            return False
+        if response.status_code >= 400:
+            # The server rejected the data itself, sending it again will not help
+            print(f"[TELEMETRY] Batch rejected with {response.status_code}, dropping {len(batch)} snapshots")
+            self.failed_batches += 1
+            return True
+        self.sent_items += len(batch)
+        self.sent_batches += 1
+        self.sent_bytes += len(body)
+        return True
+
+    def send_pending(self):
+        """Send the current batch (or the next one), returns the seconds to wait before trying again"""
+        if not self.pending:
+            self.pending = self._next_batch()
+            self.retries = 0
+        if not self.pending:
+            return self.interval
+        if self._post(self.pending):
+            self.pending = []
+            # Keep sending straight away while a backlog is waiting
+            return 0.0 if len(self.buffer) >= self.batch_size else self.interval
+        self.retries += 1
+        if self.retries > self.max_retries:
+            print(f"[TELEMETRY] Giving up on {len(self.pending)} snapshots after {self.max_retries} retries")
+            self.failed_batches += 1
+            self.pending = []
+            self.retries = 0
+            return self.interval
+        delay = min(self.max_backoff, self.backoff * 2 ** (self.retries - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+    def run(self):
+        while not self.stop_event.is_set():
+            delay = self.send_pending()
+            if delay > 0:
+                self.stop_event.wait(delay)
+        # One last try with what is left, without retries
+        if not self.pending:
+            self.pending = self._next_batch()
+        if self.pending and self._post(self.pending):
+            self.pending = []
+        self.session.close()
+
+    def stop(self, timeout=None):
+        self.stop_event.set()
+        if self.is_alive():
+            self.join(timeout=self.timeout + 1.0 if timeout is None else timeout)
+
+    def stats(self):
+        with self.lock:
+            buffered = len(self.buffer)
+        return {
+            "buffered": buffered,
+            "pending": len(self.pending),
+            "queued": self.queued,
+            "dropped": self.dropped,
+            "sent_items": self.sent_items,
+            "sent_batches": self.sent_batches,
+            "failed_batches": self.failed_batches,
+            "sent_bytes": self.sent_bytes,
+        }
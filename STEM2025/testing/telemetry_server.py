@@ -0,0 +1,100 @@
+"""
+telemetry_server.py — Local stand-in for the telemetry API (tonnetz_server_api_endpoint).
+
+Accepts the POSTs from raveforest/telemetry.py (gzip or plain, one JSON snapshot or
+a list of them) and prints how many snapshots, batches and bytes arrived.
+--fail_rate makes a fraction of requests fail with a 503 and --delay slows
+every response, to check the exporter's retry, backoff and drop-oldest
+behaviour without the real server.
+
+    python3 testing/telemetry_server.py --port 8080 --fail_rate 0.2
+    # and in the config: "tonnetz_server_api_endpoint": "http://127.0.0.1:8080/forest.php"
+"""
+import argparse
+import gzip
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class TelemetryStats():
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.snapshots = 0
+        self.batches = 0
+        self.bytes = 0
+        self.failed = 0
+        self.connections = set()
+
+    def report(self):
+        with self.lock:
+            return (f"[TELEMETRY SERVER] {self.snapshots} snapshots in {self.batches} batches, "
+                    f"{self.bytes} bytes, {self.failed} failed on purpose, {len(self.connections)} connections")
+
+
+def make_handler(stats, fail_rate=0.0, delay=0.0):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse shows up in the stats
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if delay:
+                time.sleep(delay)
+            if random.random() < fail_rate:
+                with stats.lock:
+                    stats.failed += 1
+                self._reply(503)
+                return
+            try:
+                if self.headers.get("Content-Encoding") == "gzip":
+                    body_json = gzip.decompress(body)
+                else:
+                    body_json = body
+                data = json.loads(body_json)
+            except (OSError, ValueError):
+                self._reply(400)
+                return
+            with stats.lock:
+                stats.snapshots += len(data) if isinstance(data, list) else 1
+                stats.batches += 1
+                stats.bytes += len(body)
+                stats.connections.add(self.client_address)
+            self._reply(200)
+
+        def _reply(self, status):
+            self.send_response(status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(port=8080, fail_rate=0.0, delay=0.0, host="127.0.0.1"):
+    """Start the stand-in on a background thread, returns (server, stats)"""
+    stats = TelemetryStats()
+    server = ThreadingHTTPServer((host, port), make_handler(stats, fail_rate, delay))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the telemetry API")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--fail_rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--delay", type=float, default=0.0, help="Seconds to wait before every response")
+    args = parser.parse_args()
+
+    server, stats = serve(args.port, args.fail_rate, args.delay, host="0.0.0.0")
+    print(f"[TELEMETRY SERVER] Listening on port {args.port}")
+    try:
+        while True:
+            time.sleep(5)
+            print(stats.report())
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,239 @@
+"""Headless rendering of the SomerScience Composer
+
+Runs a SoundManager on silent SCAMP parts with the session clock fast
+forwarded, so minutes of harmony, background and reaction notes are
+generated in well under a second of wall time. Every finished note is
+captured in an EventLog and can be written as CSV or rendered to a WAV
+through a small numpy synth. Meant for benchmarking the Composer (CPU per
+simulated minute) and for checking changes without a sound card.
+
+    python raveforest/headless.py --seconds 600 --wav out.wav --events out.csv
+"""
+import argparse
+import collections
+import csv
+import logging
+import random
+import threading
+import time
+import wave
+
+import numpy as np
+
+try:
+    from scamp import Session
+    HAS_SCAMP = True
+except ImportError:
+    print("[CRITICAL] SCAMP library not found - headless rendering will be disabled")
+    HAS_SCAMP = False
+    Session = object
+
+log = logging.getLogger("raveforest.sound")
+
+NoteEvent = collections.namedtuple("NoteEvent", ["start", "end", "part", "pitch", "volume"])
+
+
+def _peak_level(note_info, parameter):
+    """Start value of a note parameter, or the highest level an envelope on it reached"""
+    level = note_info["parameter_start_values"].get(parameter, 0.0)
+    for segment in note_info["parameter_change_segments"].get(parameter, ()):
+        level = max(level, segment.start_level, segment.end_level)
+    return level
+
+
+class EventLog():
+    """Collects every note the session's parts finish, in session time seconds
+
+    Registered on each part the same way a SCAMP Transcriber is, so it also
+    sees notes played while the clock is fast forwarded (which never reach a
+    playback implementation). Chords arrive as one note per pitch.
+    """
+
+    def __init__(self):
+        self.events = []
+        self.lock = threading.Lock()
+
+    def attach(self, instrument):
+        if self not in instrument._transcribers_to_notify:
+            instrument._transcribers_to_notify.append(self)
+
+    def register_note(self, instrument, note_info):
+        start = note_info["start_time_stamp"].time_in_master
+        end = note_info["end_time_stamp"].time_in_master
+        if end <= start:
+            return
+        event = NoteEvent(start, end, instrument.name, float(_peak_level(note_info, "pitch")),
+                          float(_peak_level(note_info, "volume")))
+        with self.lock:
+            self.events.append(event)
+
+    def __len__(self):
+        return len(self.events)
+
+    def sorted_events(self):
+        with self.lock:
+            return sorted(self.events)
+
+    def clear(self):
+        with self.lock:
+            self.events.clear()
+
+    def counts(self):
+        """Number of notes per part name"""
+        with self.lock:
+            return dict(collections.Counter(event.part for event in self.events))
+
+    def write_csv(self, path):
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(NoteEvent._fields)
+            for event in self.sorted_events():
+                writer.writerow(["%.4f" % event.start, "%.4f" % event.end, event.part,
+                                 "%.2f" % event.pitch, "%.3f" % event.volume])
+
+
+class HeadlessSession(Session):
+    """SCAMP Session whose parts are all silent and logged to an EventLog
+
+    new_part() is what SoundManager and InstrumentPool call, so no soundfont
+    or audio driver is loaded anywhere.
+    """
+
+    def __init__(self, *args, event_log=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.event_log = event_log if event_log is not None else EventLog()
+
+    def new_part(self, name=None, *args, **kwargs):
+        return self.new_silent_part(name)
+
+    def new_silent_part(self, name=None, *args, **kwargs):
+        part = super().new_silent_part(name, *args, **kwargs)
+        self.event_log.attach(part)
+        return part
+
+
+def render_wav(events, path, duration=None, sample_rate=22050, gain=0.2, attack=0.005, release=0.05,
+               block_seconds=10.0):
+    """Render NoteEvents to a 16 bit mono WAV with a sine plus two harmonics per note
+
+    Notes are mixed block by block so an hour of audio never needs more than
+    one block of samples in memory. Returns the number of samples written.
+    """
+    events = sorted(events)
+    if duration is None:
+        duration = max((event.end for event in events), default=0.0) + release
+    total = int(duration * sample_rate)
+    block = int(block_seconds * sample_rate)
+    harmonics = ((1.0, 1.0), (2.0, 0.3), (3.0, 0.1))
+
+    with wave.open(path, "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(sample_rate)
+
+        next_event = 0
+        sounding = []
+        for block_start in range(0, total, block):
+            block_end = min(block_start + block, total)
+            mix = np.zeros(block_end - block_start, dtype=np.float64)
+            while next_event < len(events) and events[next_event].start * sample_rate < block_end:
+                sounding.append(events[next_event])
+                next_event += 1
+
+            still_sounding = []
+            for event in sounding:
+                first = int(event.start * sample_rate)
+                last = int((event.end + release) * sample_rate)
+                if last <= block_start:
+                    continue
+                if last > block_end:
+                    still_sounding.append(event)
+                lo, hi = max(first, block_start), min(last, block_end)
+                if hi <= lo:
+                    continue
+                t = (np.arange(lo, hi) - first) / sample_rate
+                length = event.end - event.start
+                envelope = np.minimum(t / attack, 1.0)
+                envelope *= np.exp(-3.0 * t / max(length, 0.1))
+                envelope *= np.clip((length + release - t) / release, 0.0, 1.0)
+                frequency = 440.0 * 2 ** ((event.pitch - 69) / 12.0)
+                tone = sum(weight * np.sin(2 * np.pi * frequency * ratio * t) for ratio, weight in harmonics)
+                mix[lo - block_start:hi - block_start] += gain * event.volume * envelope * tone
+            sounding = still_sounding
+
+            out.writeframes((np.clip(mix, -1.0, 1.0) * 32767).astype("<i2").tobytes())
+    return total
+
+
+def run_headless(sound_manager, seconds, time_delta=1/30.0, touch_rate=0.0, seed=None):
+    """Tick sound_manager through `seconds` of fast forwarded session time
+
+    touch_rate simulated touches per second (each a random scale note sent as
+    reaction notes) keep the melody path busy. Returns a dict of timings.
+    """
+    session = sound_manager.session
+    rng = random.Random(seed)
+    session.fast_forward()
+    start = session.time()
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    ticks = 0
+    while session.time() - start < seconds:
+        if touch_rate and rng.random() < touch_rate * time_delta:
+            key = sound_manager.composer.shared_state["key"].value
+            sound_manager.update_pillar_setting("reaction_notes", [key + rng.choice((0, 2, 4, 7, 9, 12))])
+        sound_manager.tick(time_delta)
+        ticks += 1
+    session.fast_forward(False)
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    return dict(
+        seconds=session.time() - start,
+        ticks=ticks,
+        wall_seconds=wall,
+        cpu_seconds=cpu,
+        speedup=seconds / wall if wall > 0 else float("inf"),
+        cpu_per_minute=cpu / seconds * 60.0 if seconds > 0 else 0.0,
+    )
+
+
+def main():
+    from sound_manager import SoundManager
+
+    parser = argparse.ArgumentParser(description="Render the SomerScience Composer without audio hardware")
+    parser.add_argument("--seconds", type=float, default=60.0, help="Session time to render")
+    parser.add_argument("--tick", type=float, default=1/30.0, help="SoundManager tick in seconds")
+    parser.add_argument("--touch_rate", type=float, default=0.5, help="Simulated touches per second")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--events", type=str, default=None, help="Write the note events to this CSV")
+    parser.add_argument("--wav", type=str, default=None, help="Render the note events to this WAV")
+    parser.add_argument("--sample_rate", type=int, default=22050)
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    sound_manager = SoundManager(headless=True)
+    if sound_manager.session is None or sound_manager.composer is None:
+        print("[ERROR] Headless sound manager failed to start")
+        return 1
+
+    stats = run_headless(sound_manager, args.seconds, args.tick, args.touch_rate, args.seed)
+    event_log = sound_manager.session.event_log
+    print(f"[HEADLESS] {stats['seconds']:.1f}s rendered in {stats['wall_seconds']:.2f}s "
+          f"({stats['speedup']:.0f}x), {stats['cpu_per_minute']:.3f} CPU s per minute, {len(event_log)} notes")
+    for part, count in sorted(event_log.counts().items()):
+        print(f"[HEADLESS]   {part}: {count} notes")
+
+    if args.events:
+        event_log.write_csv(args.events)
+        print(f"[HEADLESS] Wrote events to {args.events}")
+    if args.wav:
+        started = time.perf_counter()
+        render_wav(event_log.sorted_events(), args.wav, duration=stats["seconds"], sample_rate=args.sample_rate)
+        print(f"[HEADLESS] Wrote {args.wav} in {time.perf_counter() - started:.2f}s")
+    sound_manager.cleanup()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,213 @@
+import array
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Checkpoints carried in a touch trace, in the order they happen
+#   rx         - read_serial_data received the CAP bytes
+#   dequeued   - Pillar.read_from_serial saw the new touch snapshot
+#   mapped     - the mapping interface produced the sound state
+#   play       - SoundManager.play_direct_notes was entered
+#   dispatched - SCAMP returned from play_note for the first note
+TRACE_CHECKPOINTS = ("rx", "dequeued", "mapped", "play", "dispatched")
+
+# Stage name -> (start checkpoint, end checkpoint)
+TOUCH_STAGES = {
+    "serial_to_dequeue": ("rx", "dequeued"),
+    "dequeue_to_mapped": ("dequeued", "mapped"),
+    "mapped_to_play": ("mapped", "play"),
+    "play_to_dispatch": ("play", "dispatched"),
+    "total": ("rx", "dispatched"),
+}
+
+REPORT_PERCENTILES = (50, 90, 99, 99.9)
+
+
+class LogHistogram():
+    """Fixed-size HDR style histogram of durations
+
+    Values are stored in microseconds. Below 2**sub_bucket_bits every value
+    has its own bucket, above that each power of two is split into
+    2**(sub_bucket_bits - 1) linear buckets, so the relative error is bounded
+    (about 3% with the default 5 bits) and memory is a fixed array however
+    many values are recorded.
+    """
+
+    def __init__(self, max_seconds=60.0, sub_bucket_bits=5):
+        self.sub_bucket_bits = sub_bucket_bits
+        self.sub_bucket_count = 1 << sub_bucket_bits
+        self.max_value = int(max_seconds * 1e6)
+        self.counts = array.array("Q", bytes(8 * (self._index(self.max_value) + 1)))
+        self.reset()
+
+    def reset(self):
+        for i in range(len(self.counts)):
+            self.counts[i] = 0
+        self.total_count = 0
+        self.total_sum = 0
+        self.min_value = None
+        self.max_recorded = 0
+
+    def _index(self, value):
+        if value < self.sub_bucket_count:
+            return value
+        shift = value.bit_length() - self.sub_bucket_bits
+        return (shift << (self.sub_bucket_bits - 1)) + (value >> shift)
+
+    def _bucket_midpoint(self, index):
+        if index < self.sub_bucket_count:
+            return index
+        shift = (index >> (self.sub_bucket_bits - 1)) - 1
+        mantissa = index - (shift << (self.sub_bucket_bits - 1))
+        low = mantissa << shift
+        return low + ((1 << shift) >> 1)
+
+    def record(self, seconds):
+        value = min(max(int(seconds * 1e6), 0), self.max_value)
+        self.counts[self._index(value)] += 1
+        self.total_count += 1
+        self.total_sum += value
+        if self.min_value is None or value < self.min_value:
+            self.min_value = value
+        if value > self.max_recorded:
+            self.max_recorded = value
+
+    def percentile(self, pct):
+        """Value at the given percentile in milliseconds"""
+        if self.total_count == 0:
+            return 0.0
+        target = max(1, int(round(self.total_count * pct / 100.0)))
+        running = 0
+        for index, count in enumerate(self.counts):
+            running += count
+            if running >= target:
+                return min(self._bucket_midpoint(index), self.max_recorded) / 1000.0
+        return self.max_recorded / 1000.0
+
+    def summary(self, percentiles=REPORT_PERCENTILES):
+        if self.total_count == 0:
+            return dict(count=0)
+        summary = dict(
+            count=self.total_count,
+            min_ms=self.min_value / 1000.0,
+            max_ms=self.max_recorded / 1000.0,
+            mean_ms=self.total_sum / self.total_count / 1000.0,
+        )
+        for pct in percentiles:
+            summary[f"p{pct:g}_ms"] = self.percentile(pct)
+        return summary
+
+
+class LatencyTracker():
+    """Per-stage latency histograms for the touch -> sound fast path
+
+    A trace is a plain dict of checkpoint name -> time.perf_counter() value
+    that is filled in as a touch moves through the system, see TRACE_CHECKPOINTS.
+    record_trace() turns it into one sample per stage whose two checkpoints
+    are both present.
+    """
+
+    def __init__(self, stages=TOUCH_STAGES):
+        self.stages = dict(stages)
+        self.histograms = {name: LogHistogram() for name in self.stages}
+        self.lock = threading.Lock()
+        self.started_at = time.time()
+        self.server = None
+
+    def record(self, stage, seconds):
+        with self.lock:
+            self.histograms[stage].record(seconds)
+
+    def record_trace(self, trace):
+        if not trace:
+            return
+        with self.lock:
+            for name, (start, end) in self.stages.items():
+                if start in trace and end in trace:
+                    self.histograms[name].record(trace[end] - trace[start])
+
+    def snapshot(self):
+        with self.lock:
+            return dict(
+                since=self.started_at,
+                stages={name: hist.summary() for name, hist in self.histograms.items()},
+            )
+
+    def reset(self):
+        with self.lock:
+            for hist in self.histograms.values():
+                hist.reset()
+            self.started_at = time.time()
+
+    def report_line(self):
+        """Single line summary suitable for a periodic log"""
+        parts = []
+        for name, summary in self.snapshot()["stages"].items():
+            if summary["count"] == 0:
+                continue
+            parts.append(
+                f"{name}: n={summary['count']} p50={summary['p50_ms']:.1f} "
+                f"p99={summary['p99_ms']:.1f} max={summary['max_ms']:.1f}"
+            )
+        return " | ".join(parts)
+
+    def serve(self, port, host="127.0.0.1"):
+        """Expose snapshot() as JSON on http://host:port/ from a daemon thread"""
+        tracker = self
+
+        class LatencyRequestHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") == "/reset":
+                    tracker.reset()
+                body = json.dumps(tracker.snapshot()).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Keep request logging off the console
+
+        self.server = ThreadingHTTPServer((host, port), LatencyRequestHandler)
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        print(f"[INFO] Latency stats served on http://{host}:{port}/")
+        return self.server
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server = None
+
+
+class StartupTimer():
+    """Wall time of each startup phase, printed once the pillar is playable
+
+    mark(name) closes the phase that ran since the previous mark, so the
+    Controller and SoundManager can both add phases without nesting.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.last_mark = self.started
+        self.phases = []  # (name, seconds) in the order they ran
+
+    def mark(self, name):
+        now = time.perf_counter()
+        self.phases.append((name, now - self.last_mark))
+        self.last_mark = now
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def snapshot(self):
+        phases = {}
+        for name, seconds in self.phases:
+            phases[name] = phases.get(name, 0.0) + seconds
+        return dict(total=self.elapsed(), phases=phases)
+
+    def report(self, label="Playable"):
+        breakdown = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.phases)
+        print(f"[STARTUP] {label} after {self.elapsed():.2f}s: {breakdown}")
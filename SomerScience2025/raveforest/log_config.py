@@ -0,0 +1,86 @@
+import atexit
+import logging
+import logging.handlers
+import queue
+import sys
+
+# Subsystem loggers, each can be given its own level with --log_level
+SUBSYSTEMS = {
+    "serial": "raveforest.serial",
+    "mapping": "raveforest.mapping",
+    "sound": "raveforest.sound",
+    "controller": "raveforest.controller",
+}
+
+ROOT_LOGGER = "raveforest"
+
+_listener = None
+
+
+class TagFormatter(logging.Formatter):
+    """Formats records like the existing prints: [LEVEL] [subsystem] message"""
+
+    def format(self, record):
+        subsystem = record.name.rsplit(".", 1)[-1]
+        record.tag = f"[{record.levelname}] [{subsystem}]"
+        return super().format(record)
+
+
+def parse_level(level):
+    if isinstance(level, int):
+        return level
+    value = logging.getLevelName(str(level).upper())
+    if not isinstance(value, int):
+        raise ValueError(f"Unknown log level: {level}")
+    return value
+
+
+def parse_level_overrides(entries):
+    """Turn ["sound=DEBUG", "serial=WARNING"] into {"sound": 10, "serial": 30}"""
+    overrides = {}
+    for entry in entries or []:
+        name, _, level = entry.partition("=")
+        if name not in SUBSYSTEMS or not level:
+            raise ValueError(f"Expected <subsystem>=<LEVEL> with subsystem in {list(SUBSYSTEMS)}, got {entry!r}")
+        overrides[name] = parse_level(level)
+    return overrides
+
+
+def setup_logging(debug=False, levels=None, stream=None):
+    """Route the raveforest loggers through a queue to a single writer thread
+
+    Callers on the serial, sound and controller threads only pay for the
+    level check and a queue put, the formatting and the (possibly slow)
+    terminal or journald write happen on the QueueListener thread.
+
+    Args:
+        debug (bool): DEBUG for every subsystem, otherwise INFO
+        levels (dict): Optional per-subsystem overrides, e.g. {"sound": logging.WARNING}
+        stream: Output stream, defaults to stdout so logs interleave with the remaining prints
+
+    Returns:
+        logging.handlers.QueueListener: The running listener, stopped automatically at exit
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+
+    root = logging.getLogger(ROOT_LOGGER)
+    root.setLevel(logging.DEBUG if debug else logging.INFO)
+    root.propagate = False
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+
+    for name, logger_name in SUBSYSTEMS.items():
+        level = (levels or {}).get(name, logging.NOTSET)
+        logging.getLogger(logger_name).setLevel(level)
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(TagFormatter("%(tag)s %(message)s"))
+
+    log_queue = queue.SimpleQueue()
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+    return _listener
@@ -0,0 +1,181 @@
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+
+log = logging.getLogger("raveforest.sound")
+
+
+class LookaheadScheduler():
+    """Renders background/harmony voices ahead of time and plays them on a fixed timeline
+
+    A voice is a generator yielding (advance_beats, action, args) tuples:
+    action(*args) is run at the voice's current position and the position
+    then moves on by advance_beats (action may be None for a rest). Events
+    up to `lookahead` seconds ahead are pulled from every voice into a heap
+    of absolute time.monotonic() deadlines, and a dedicated thread sleeps
+    until each deadline and dispatches it.
+
+    Voice positions accumulate from a fixed start time instead of from
+    whenever the previous blocking play_note returned, so GC pauses or a
+    slow controller loop can delay a single event but never shift the
+    rest of the groove. Events that are still more than `lookahead` late
+    when the thread gets to them are dropped rather than played in a burst.
+    """
+
+    def __init__(self, tempo_function=None, lookahead=0.2, name="lookahead-scheduler", nice=-5):
+        self.tempo_function = tempo_function  # Returns beats per minute, read when events are rendered
+        self.lookahead = lookahead
+        self.name = name
+        self.nice = nice
+        self.heap = []  # (deadline, seq, voice_name, generation, action, args)
+        self.voices = {}  # name -> [generator, next_time, generation]
+        self.generations = itertools.count(1)
+        self.counter = itertools.count()
+        self.condition = threading.Condition()
+        self.thread = None
+        self.running = False
+
+        self.dispatched_count = 0
+        self.dropped_count = 0
+        self.max_lateness = 0.0
+        self.total_lateness = 0.0
+
+    def seconds_per_beat(self):
+        try:
+            tempo = self.tempo_function() if self.tempo_function is not None else 60.0
+            return 60.0 / tempo if tempo > 0 else 1.0
+        except Exception:
+            return 1.0
+
+    def add_voice(self, name, generator, start_time=None):
+        """Start a voice, replacing (and dropping the pending events of) any voice with the same name"""
+        with self.condition:
+            start = time.monotonic() if start_time is None else start_time
+            self.voices[name] = [generator, start, next(self.generations)]
+            self.condition.notify()
+
+    def remove_voice(self, name):
+        with self.condition:
+            return self.voices.pop(name, None) is not None
+
+    def has_voice(self, name):
+        with self.condition:
+            return name in self.voices
+
+    def clear(self):
+        with self.condition:
+            self.voices.clear()
+            self.heap.clear()
+
+    def stats(self):
+        with self.condition:
+            count = self.dispatched_count
+            return dict(
+                voices=list(self.voices),
+                pending=len(self.heap),
+                dispatched=count,
+                dropped=self.dropped_count,
+                mean_lateness_ms=self.total_lateness / count * 1000.0 if count else 0.0,
+                max_lateness_ms=self.max_lateness * 1000.0,
+            )
+
+    def _render_locked(self, now):
+        """Pull events from every voice until each is `lookahead` ahead of now"""
+        horizon = now + self.lookahead
+        seconds_per_beat = self.seconds_per_beat()
+        for name, voice in list(self.voices.items()):
+            generator, next_time, generation = voice
+            # A voice that fell far behind (e.g. long suspend) restarts from now instead of bursting
+            if next_time < now - self.lookahead:
+                next_time = now
+            while next_time < horizon:
+                try:
+                    advance, action, args = next(generator)
+                except StopIteration:
+                    del self.voices[name]
+                    break
+                except Exception as e:
+                    log.error("Voice %s failed and was removed: %s", name, e)
+                    del self.voices[name]
+                    break
+                if action is not None:
+                    heapq.heappush(self.heap, (next_time, next(self.counter), name, generation, action, args))
+                # Guard against a voice that never advances spinning this loop
+                next_time += max(advance, 0.01) * seconds_per_beat
+            voice[1] = next_time
+
+    def _next_wakeup_locked(self):
+        wakeup = self.heap[0][0] if self.heap else None
+        for _, next_time, _ in self.voices.values():
+            render_at = next_time - self.lookahead
+            if wakeup is None or render_at < wakeup:
+                wakeup = render_at
+        return wakeup
+
+    def _pop_due_locked(self, now):
+        due = []
+        heap = self.heap
+        while heap and heap[0][0] <= now:
+            event = heapq.heappop(heap)
+            voice = self.voices.get(event[2])
+            # Events of a replaced or removed voice are dropped
+            if voice is None or voice[2] != event[3]:
+                continue
+            if now - event[0] > self.lookahead:
+                self.dropped_count += 1
+                continue
+            due.append(event)
+        return due
+
+    def _dispatch(self, due):
+        for deadline, _, name, _, action, args in due:
+            lateness = time.monotonic() - deadline
+            try:
+                action(*args)
+            except Exception as e:
+                log.error("Lookahead event for %s failed: %s", name, e)
+            with self.condition:
+                self.dispatched_count += 1
+                self.total_lateness += lateness
+                if lateness > self.max_lateness:
+                    self.max_lateness = lateness
+
+    def start(self):
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+
+    def _raise_priority(self):
+        # Per-thread nice on Linux, needs privileges so failure is expected on dev machines
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), self.nice)
+        except (AttributeError, OSError) as e:
+            log.debug("Could not raise %s priority: %s", self.name, e)
+
+    def _run(self):
+        self._raise_priority()
+        while True:
+            with self.condition:
+                if not self.running:
+                    break
+                now = time.monotonic()
+                self._render_locked(now)
+                due = self._pop_due_locked(now)
+                if not due:
+                    wakeup = self._next_wakeup_locked()
+                    if wakeup is None:
+                        self.condition.wait()
+                    elif wakeup > now:
+                        self.condition.wait(wakeup - now)
+                    continue
+            self._dispatch(due)
@@ -7,17 +7,27 @@ import queue
 import time
 import os
 import traceback  # For improved error reporting
+import logging
 
 from pillar_hw_interface import Pillar
-from mapping_interface import RotationMapper, EventRotationMapper, LightSoundMapper, generate_mapping_interface
-from sound_manager import SoundManager
+from mapping_interface import RotationMapper, EventRotationMapper, LightSoundMapper, generate_mapping_interface, iter_bits
+from sound_manager import SoundManager, new_part
+from latency_stats import LatencyTracker, StartupTimer
+from log_config import SUBSYSTEMS, setup_logging, parse_level_overrides
+
+log = logging.getLogger("raveforest.controller")
 
 class Controller():
 
-    def __init__(self, hostname, config):
+    def __init__(self, hostname, config, event_driven=True, latency_port=None):
         # Add better error handling for critical initialization
         try:
+            # Time from here until the first test notes play, printed as [STARTUP]
+            self.startup_timer = StartupTimer()
             self.config = config
+            # Event-driven: the serial read thread wakes the loop on a touch edge
+            # Polling: the loop sleeps for min_loop_interval between iterations
+            self.event_driven = event_driven
             self.num_pillars = len(config["pillars"])        
             self.pillar_config = config["pillars"][hostname]
             
@@ -34,6 +44,7 @@ class Controller():
             except Exception as e:
                 print(f"[CRITICAL] Failed to initialize pillar manager: {e}")
                 raise
+            self.startup_timer.mark("pillar")
             
             # Initialize mapping interface
             try:
@@ -43,9 +54,23 @@ class Controller():
                 print(f"[CRITICAL] Failed to initialize mapping interface: {e}")
                 raise
             
+            # Per-stage touch -> sound latency, optionally served as JSON on localhost
+            self.latency_tracker = LatencyTracker()
+            if latency_port is not None:
+                try:
+                    self.latency_tracker.serve(latency_port)
+                except Exception as e:
+                    print(f"[WARNING] Failed to serve latency stats on port {latency_port}: {e}")
+            self.startup_timer.mark("mapping")
+
             # Initialize sound manager
             try:
-                self.sound_manager = SoundManager(hostname)
+                self.sound_manager = SoundManager(hostname, latency_tracker=self.latency_tracker,
+                                                  instrument_pool_size=self.pillar_config.get("instrument_pool_size", 16),
+                                                  shared_state_backend=self.pillar_config.get("shared_state_backend", "local"),
+                                                  lookahead=self.pillar_config.get("lookahead", 0.2),
+                                                  polyphony=self.pillar_config.get("polyphony", 8),
+                                                  startup_timer=self.startup_timer)
                 print(f"[INFO] Sound manager initialized for host: {hostname}")
             except Exception as e:
                 print(f"[CRITICAL] Failed to initialize sound manager: {e}")
@@ -64,6 +89,9 @@ class Controller():
             
             # Store previous LED status to detect changes
             self.previous_led_status = [(0, 0, 0) for _ in range(self.pillar_manager.num_tubes)]
+            # Versions of the last touch and light snapshots the loop processed
+            self.touch_version = 0
+            self.light_version = 0
             
             # OPTIMIZATION: More responsive touch with lower loop interval
             self.min_loop_interval = 1.0  # 100Hz max (10ms) for better responsiveness - increased from 50Hz
@@ -73,17 +101,13 @@ class Controller():
             self.touch_event_time = 0
             self.touch_processing_interval = 0.1  # 1ms - Process touch events at near-realtime (improved from 2ms)
             
-            # OPTIMIZATION: Preallocate arrays for touch status
-            # FIX: Use num_touch_sensors instead of num_tubes for correct array size
-            self.previous_touch_status = [False] * self.pillar_manager.num_touch_sensors
-            self.current_touch_status = [False] * self.pillar_manager.num_touch_sensors 
+            # Touch state is carried as an int bitmask, bit i set while tube i is touched
+            self.previous_touch_mask = 0
             self.last_touch_time = [0] * self.pillar_manager.num_touch_sensors
             # Remove debounce to respond to all touch events immediately
             self.touch_debounce = 0.05  # No debounce - respond to every touch instantly
             
-            # NEW: Latency monitoring
-            self.latency_history = []  # Store recent latency measurements
-            self.max_latency_history = 100  # Keep last 100 measurements
+            # NEW: Latency monitoring, samples are kept in self.latency_tracker
             self.latency_report_interval = 5.0  # Report every 5 seconds
             self.last_latency_report_time = time.time()
             
@@ -100,9 +124,12 @@ class Controller():
 
             print(f"[INFO] Controller initialized for hostname: {hostname}")
             print(f"[INFO] Using mapping: {self.pillar_config['map']}")
+            print(f"[INFO] Loop mode: {'event-driven' if self.event_driven else 'polling'}")
             
             # CRITICAL: Test the sound system at startup to ensure it's working
             self.test_sound_system()
+            self.startup_timer.mark("sound_test")
+            self.startup_timer.report()
         except Exception as e:
             error_traceback = traceback.format_exc()
             print(f"[CRITICAL] Failed to initialize controller: {e}")
@@ -141,7 +168,7 @@ class Controller():
                 if hasattr(self.sound_manager, 'session') and self.sound_manager.session is not None:
                     # Check if session has new_part method
                     if hasattr(self.sound_manager.session, 'new_part'):
-                        self.sound_manager._direct_instrument = self.sound_manager.session.new_part("piano")
+                        self.sound_manager._direct_instrument = new_part(self.sound_manager.session, "piano")
                         print("Recreated direct instrument")
                         
                         # Try again
@@ -157,10 +184,8 @@ class Controller():
             except Exception as e:
                 print(f"❌ REPAIR FAILED - Error: {e}")
                 
+        # The test notes are ended by the voice allocator, the loop can start while they ring
         print("===============================\n")
-        
-        # Sleep briefly to let the test notes play
-        time.sleep(0.5)
 
     def start(self, frequency):
         """Starts the main control loop
@@ -177,7 +202,12 @@ class Controller():
                 current_time = time.time()
                 elapsed = current_time - self.last_loop_time
                 
-                if elapsed < self.min_loop_interval:
+                if self.event_driven:
+                    # Block until a touch edge arrives, still running the
+                    # periodic LED/sound housekeeping every min_loop_interval
+                    timeout = max(0.0, self.min_loop_interval - elapsed)
+                    self.pillar_manager.wait_for_touch(timeout)
+                elif elapsed < self.min_loop_interval:
                     # Sleep to maintain the desired loop rate
                     time.sleep(self.min_loop_interval - elapsed)
                 
@@ -209,13 +239,13 @@ class Controller():
         
         print("[INFO] Controller stopped")
 
-    def process_touch_events(self, current_touch_status, current_led_status):
+    def process_touch_events(self, current_touch_mask, current_led_status):
         """
         ULTRA-OPTIMIZED fast-path handler specifically for touch events
         Critical path for minimal latency sound triggering
         
         Args:
-            current_touch_status (list): List of boolean touch status for each tube
+            current_touch_mask (int): Touch bitmask, bit i set while tube i is touched
             current_led_status (list): List of tuples (hue, brightness, effect) for each tube
             
         Returns:
@@ -224,36 +254,32 @@ class Controller():
         now = time.time()
         
         # Guard against invalid input
-        if not current_touch_status or not current_led_status:
+        if not current_led_status:
             return False
-            
-        # Ensure arrays are the right size
-        if len(current_touch_status) != len(self.previous_touch_status):
-            print(f"[WARNING] Touch status size mismatch: current={len(current_touch_status)}, previous={len(self.previous_touch_status)}")
-            # Resize previous_touch_status to match
-            self.previous_touch_status = [False] * len(current_touch_status)
-            # Also update last_touch_time
-            self.last_touch_time = [0] * len(current_touch_status)
         
-        # OPTIMIZATION: Initialize tubes lists
-        newly_touched_tubes = []
-        released_tubes = []
+        # OPTIMIZATION: Edges fall out of two mask operations, no per-tube loop
+        previous_touch_mask = self.previous_touch_mask
+        rising = current_touch_mask & ~previous_touch_mask  # 0→1
+        falling = previous_touch_mask & ~current_touch_mask  # 1→0
+        self.previous_touch_mask = current_touch_mask
+        if not (rising or falling):
+            return False
         
-        # OPTIMIZATION: Detect rising edges (0→1) and falling edges (1→0)
-        for tube_id, (prev, curr) in enumerate(zip(self.previous_touch_status, current_touch_status)):
-            if not prev and curr:  # Rising edge detected (0→1)
-                newly_touched_tubes.append(tube_id)
-                self.last_touch_time[tube_id] = now
-                # Only print if debugging enabled to avoid print latency
-                if self.show_touch_debug:
-                    print(f"[⚡TOUCH] Tube {tube_id} touched")
-            elif prev and not curr:  # Falling edge detected (1→0)
-                released_tubes.append(tube_id)
-                if self.show_touch_debug:
-                    print(f"[⚡RELEASE] Tube {tube_id} released")
+        newly_touched_tubes = list(iter_bits(rising))
+        released_tubes = list(iter_bits(falling))
+        
+        if newly_touched_tubes and newly_touched_tubes[-1] >= len(self.last_touch_time):
+            # More sensors than expected, grow instead of dropping the edge
+            self.last_touch_time.extend([0] * (newly_touched_tubes[-1] + 1 - len(self.last_touch_time)))
+        for tube_id in newly_touched_tubes:
+            self.last_touch_time[tube_id] = now
         
-        # Store current touch status for next iteration
-        self.previous_touch_status = current_touch_status.copy()
+        # Only log if debugging enabled to avoid latency
+        if self.show_touch_debug:
+            if newly_touched_tubes:
+                log.debug("Tubes %s touched", newly_touched_tubes)
+            if released_tubes:
+                log.debug("Tubes %s released", released_tubes)
         
         # Track if any notes were played or stopped
         notes_triggered = False
@@ -265,29 +291,18 @@ class Controller():
             # Track which tube each note comes from for stopping previous notes
             tube_note_mapping = {}
             
-            # OPTIMIZATION: Direct processing of touched tubes
-            for tube_id in newly_touched_tubes:
-                if tube_id < len(current_led_status):
-                    # Get the hue value from the LED status
-                    hue, brightness, _ = current_led_status[tube_id]
-                    
+            # OPTIMIZATION: Convert every tube's hue in one lookup table index
+            try:
+                tube_notes, tube_lit = self.mapping_interface.light_status_to_notes(current_led_status)
+                for tube_id in newly_touched_tubes:
                     # Skip if tube is not lit (brightness too low)
-                    if brightness < 20:
-                        continue
-                    
-                    # OPTIMIZATION: Direct conversion without function calls
-                    # Convert hue to note using LightSoundMapper's conversion
-                    try:
-                        semitone = self.mapping_interface.hue_to_semitone(hue)
-                        octave = getattr(self.mapping_interface, 'octave', 3)  # Default to 4 if not set
-                        note_to_play = semitone + (octave * 12)
-                        
-                        # OPTIMIZATION: Directly append without checking
+                    if tube_id < len(tube_notes) and tube_lit[tube_id]:
+                        note_to_play = int(tube_notes[tube_id])
                         reaction_notes.append(note_to_play)
                         # Record which tube this note came from
                         tube_note_mapping[tube_id] = note_to_play
-                    except Exception as e:
-                        print(f"[ERROR] Failed to convert hue to note: {e}")
+            except Exception as e:
+                log.error("Failed to convert hue to note: %s", e)
             
             """
             # OPTIMIZATION: Only print and trigger sound if we have notes to play
@@ -307,9 +322,7 @@ class Controller():
                     
                     # Track latency for statistics only if successful
                     if success:
-                        self.latency_history.append(latency_ms)
-                        if len(self.latency_history) > self.max_latency_history:
-                            self.latency_history.pop(0)  # Remove oldest measurement
+                        self.latency_tracker.record("mapped_to_play", latency_ms / 1000.0)
                     
                     # Measure and report latency (but don't wait for it)
                     if self.show_touch_debug:
@@ -351,40 +364,47 @@ class Controller():
             self.pillar_manager.read_from_serial()
 
             # CRITICAL PATH: Get current touch status for immediate processing
-            current_touch_status = self.pillar_manager.get_all_touch_status()
+            # Snapshots are immutable, a version compare tells us if anything moved
+            touch_snapshot = self.pillar_manager.touch_snapshot
+            touch_status_changed = touch_snapshot.version != self.touch_version
+            self.touch_version = touch_snapshot.version
+            current_touch_mask = touch_snapshot.mask
+            touch_trace = self.pillar_manager.pop_touch_trace()
+            
+            light_snapshot = self.pillar_manager.light_snapshot
+            led_status_changed = light_snapshot.version != self.light_version
+            self.light_version = light_snapshot.version
+            current_led_status = light_snapshot.status
             
             # OPTIMIZATION: Immediately process touch before anything else
-            current_led_status = self.pillar_manager.get_all_light_status()
-            touch_notes_sent_this_cycle = self.process_touch_events(current_touch_status, current_led_status)
+            if touch_status_changed:
+                touch_notes_sent_this_cycle = self.process_touch_events(current_touch_mask, current_led_status)
             
             # Only print touch status when needed and not too frequently
             if should_print and self.show_touch_debug:
-                print(f"[TOUCH] Status: {current_touch_status}")
+                log.debug("Touch mask: %s", bin(current_touch_mask))
             
             # The rest of the loop can continue at lower priority...
             # Periodically request LED status from the Teensy
             if current_time - self.last_led_request_time >= self.led_request_interval:
                 self.pillar_manager.request_led_status()
                 if should_print:
-                    print("[LED] Requesting LED status")
+                    log.debug("Requesting LED status")
                 self.last_led_request_time = current_time
             
-            # Optimize change detection by identifying specific changes
-            changed_tubes = []
-            for i, (curr, prev) in enumerate(zip(current_led_status, self.previous_led_status)):
-                if curr != prev:
-                    changed_tubes.append(i)
-            
-            led_status_changed = len(changed_tubes) > 0
+            # Only look for the specific changes when the version moved
             if led_status_changed and should_print and self.show_led_debug:
-                print(f"[LED] Changes detected in tubes: {changed_tubes}")
+                changed_tubes = [i for i, (curr, prev) in enumerate(zip(current_led_status, self.previous_led_status)) if curr != prev]
+                log.debug("Changes detected in tubes: %s", changed_tubes)
             
-            # Process LED status changes or periodic updates
-            should_process = led_status_changed or (current_time - self.last_led_process_time >= self.led_process_interval)
+            # Process touch edges, LED status changes or periodic updates
+            should_process = touch_status_changed or led_status_changed or (current_time - self.last_led_process_time >= self.led_process_interval)
             
             if should_process:
                 # Generate the sound and light state based on button presses
-                sound_state, light_state = self.mapping_interface.update_pillar(current_touch_status)
+                sound_state, light_state = self.mapping_interface.update_pillar(current_touch_mask)
+                if touch_trace is not None:
+                    touch_trace["mapped"] = time.perf_counter()
                 
                 # Only update light state if we're not using LightSoundMapper
                 if not isinstance(self.mapping_interface, LightSoundMapper):
@@ -394,30 +414,36 @@ class Controller():
                 for param_name, value in sound_state.items():
                     # Skip reaction_notes if we already sent them through the fast path
                     if param_name == "reaction_notes" and touch_notes_sent_this_cycle:
-                        print(f"[DEBUG] Skipping reaction_notes {value} since they were already played in fast path")
+                        log.debug("Skipping reaction_notes %s since they were already played in fast path", value)
                         continue
                     
                     try:
-                        self.sound_manager.update_pillar_setting(param_name, value) 
+                        if param_name == "reaction_notes":
+                            self.sound_manager.update_pillar_setting(param_name, value, trace=touch_trace)
+                        else:
+                            self.sound_manager.update_pillar_setting(param_name, value)
                     except Exception as e:
-                        print(f"[ERROR] Failed to update sound parameter {param_name}: {e}")
+                        log.error("Failed to update sound parameter %s: %s", param_name, e)
                 
                 # Update tracking variables
-                self.previous_led_status = current_led_status.copy()  # Make a copy to avoid reference issues
+                self.previous_led_status = current_led_status  # Snapshot tuples are immutable, no copy needed
                 self.last_led_process_time = current_time
             
             # Always process sound system with minimal time step
             try:
                 self.sound_manager.tick(time_delta=1/60.0)  # 60Hz sound system update
             except Exception as e:
-                print(f"[ERROR] Error in sound manager tick: {e}")
+                log.error("Error in sound manager tick: %s", e)
+
+            if self.show_latency_stats:
+                self.report_latency_stats()
 
             self.loop_idx += 1
             
         except Exception as e:
             error_traceback = traceback.format_exc()
-            print(f"[ERROR] Exception in controller loop: {e}")
-            print(f"[DEBUG] Traceback: {error_traceback}")
+            log.error("Exception in controller loop: %s", e)
+            log.debug("Traceback: %s", error_traceback)
             time.sleep(0.01)  # Very short sleep on error
 
     def play_direct_test_note(self, note_number=60):
@@ -429,36 +455,18 @@ class Controller():
             print(f"[ERROR] Failed to play test note {note_number}: {e}")
 
     def report_latency_stats(self):
-        """Report statistics on touch-to-sound latency"""
-        if not self.latency_history:
-            return
-            
+        """Report per-stage touch-to-sound latency percentiles"""
         now = time.time()
         if now - self.last_latency_report_time < self.latency_report_interval:
             return
-            
+        self.last_latency_report_time = now
+
         try:
-            latencies = self.latency_history
-            avg_latency = sum(latencies) / len(latencies)
-            max_latency = max(latencies)
-            min_latency = min(latencies)
-            
-            # Calculate 95th percentile
-            sorted_latencies = sorted(latencies)
-            p95_index = int(len(sorted_latencies) * 0.95)
-            p95_latency = sorted_latencies[p95_index]
-            
-            print("\n🔊 TOUCH-TO-SOUND LATENCY REPORT 🔊")
-            print(f"Sample size: {len(latencies)} touches")
-            print(f"Average latency: {avg_latency:.1f}ms")
-            print(f"95th percentile: {p95_latency:.1f}ms")
-            print(f"Min latency: {min_latency:.1f}ms")
-            print(f"Max latency: {max_latency:.1f}ms")
-            print("---------------------------------------")
-            
-            self.last_latency_report_time = now
+            report = self.latency_tracker.report_line()
+            if report:
+                log.info("Latency %s (ms)", report)
         except Exception as e:
-            print(f"[ERROR] Failed to report latency stats: {e}")
+            log.error("Failed to report latency stats: %s", e)
 
 if __name__=="__main__":
     parser = argparse.ArgumentParser(description="A script to parse host, port, and config file path.")
@@ -467,10 +475,17 @@ if __name__=="__main__":
     parser.add_argument("--frequency", default=5, type=int, help="Frequency of the controller loop")
     parser.add_argument("--hostname", default=None, type=str, help="The hostname if different from the base computer")
     parser.add_argument("--debug", action="store_true", help="Enable debug output")
+    parser.add_argument("--log_level", action="append", default=[], metavar="SUBSYSTEM=LEVEL",
+                        help=f"Per-subsystem log level, may be repeated. Subsystems: {', '.join(SUBSYSTEMS)}")
+    parser.add_argument("--polling", action="store_true", help="Use the fixed-interval polling loop instead of waking on touch events")
+    parser.add_argument("--latency_port", default=None, type=int, help="Serve touch-to-sound latency stats as JSON on this localhost port")
 
     args = parser.parse_args()
     print(args)
 
+    # Hot path logging is DEBUG level, so production runs only pay for the level check
+    setup_logging(debug=args.debug, levels=parse_level_overrides(args.log_level))
+
     # Get Hostname
     hostname = args.hostname if args.hostname is not None else socket.gethostname()
     print(f"[INFO] HOSTNAME is {hostname}")
@@ -528,7 +543,7 @@ if __name__=="__main__":
     # Create a Controller instance and pass the parsed values
     print("[INFO] Initializing and running Controller")
     try:
-        controller = Controller(hostname, config)
+        controller = Controller(hostname, config, event_driven=not args.polling, latency_port=args.latency_port)
         controller.start(args.frequency)
     except KeyboardInterrupt:
         print("[INFO] Keyboard interrupt detected, exiting")
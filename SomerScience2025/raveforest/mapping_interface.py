@@ -4,6 +4,7 @@ from typing import Tuple, List, Dict, Any, Optional
 import numpy as np
 import time
 import traceback
+import logging
 
 from interfaces import DEFAULT_STATE, SCALE_TYPES, INSTRUMENTS, MELODIES, SCALES_TYPES_LIST, BASELINE_STYLE
 import interfaces as ifc
@@ -11,6 +12,25 @@ import interfaces as ifc
 import matplotlib.pyplot as plt
 from matplotlib.colors import rgb_to_hsv
 
+log = logging.getLogger("raveforest.mapping")
+
+
+def mask_from_status(status):
+    """Pack a sequence of touch booleans into an int, bit i set when tube i is touched"""
+    mask = 0
+    for i, touched in enumerate(status):
+        if touched:
+            mask |= 1 << i
+    return mask
+
+
+def iter_bits(mask):
+    """Yield the index of every set bit in mask, lowest first"""
+    while mask:
+        lowest = mask & -mask
+        yield lowest.bit_length() - 1
+        mask ^= lowest
+
 
 class SoundState(object):
 
@@ -266,7 +286,6 @@ class Pillar_Mapper_Base(object):
                 self.sound_state = SoundState(None)
                 
             self.light_state = LightState(self.num_tubes, random_init=True)
-            self.state_array = [False for _ in range(self.num_tubes)]
         except Exception as e:
             print(f"[ERROR] Error initializing Pillar_Mapper_Base: {e}")
             traceback.print_exc()
@@ -274,32 +293,32 @@ class Pillar_Mapper_Base(object):
             self.num_tubes = 6
             self.sound_state = SoundState(None)
             self.light_state = LightState(self.num_tubes, random_init=True)
-            self.state_array = [False for _ in range(self.num_tubes)]
+        # Touch state as a bitmask, bit i is tube i
+        self.tube_mask = (1 << self.num_tubes) - 1
+        self.touch_mask = 0
 
-    def update_pillar(self, state_array) -> Tuple[SoundState, LightState]:
+    def update_pillar(self, touch_state) -> Tuple[SoundState, LightState]:
         """
-        Update pillar state based on new touch state array
+        Update pillar state based on new touch state
         
         Args:
-            state_array: Array of boolean values indicating touch state
+            touch_state: Int bitmask of touched tubes (bit i is tube i), or a sequence of booleans
             
         Returns:
             Tuple of (SoundState, LightState)
         """
         try:
-            # Make sure state_array is the right length
-            if len(state_array) != len(self.state_array):
-                # Truncate or pad with False as needed
-                if len(state_array) > len(self.state_array):
-                    state_array = state_array[:len(self.state_array)]
-                else:
-                    state_array = state_array + [False] * (len(self.state_array) - len(state_array))
+            touched = touch_state if isinstance(touch_state, int) else mask_from_status(touch_state)
+            # Ignore sensors beyond the tubes this pillar maps
+            touched &= self.tube_mask
 
-            # Update internal state
-            self.interaction_update_sound_light(self.state_array.copy(), state_array)
+            old_mask = self.touch_mask
+            rising = touched & ~old_mask
+            falling = old_mask & ~touched
+            self.touch_mask = touched
 
-            # Store new state for next update
-            self.state_array = state_array.copy()  # Make copy to avoid reference issues
+            # Update internal state
+            self.interaction_update_sound_light(touched, rising, falling)
 
             return self.sound_state, self.light_state
         except Exception as e:
@@ -307,8 +326,9 @@ class Pillar_Mapper_Base(object):
             return self.sound_state, self.light_state
 
     # This should be implemented in child classes
-    def interaction_update_sound_light(self, old_state, new_state):
-        # This function takes the tube_id and the current tube states (sound and light)
+    def interaction_update_sound_light(self, touched, rising, falling):
+        # This function takes the touch bitmasks, touched is the current state,
+        # rising/falling the tubes that were just touched/released
         # It changes the amplitude, synth and note and color for this pillar
         # Internally changes self.sound_state and self.light_state
         print("[DEBUG] In Pillar Mapper Base - this method should be overridden by child class")
@@ -351,24 +371,23 @@ class FixedMapper(Pillar_Mapper_Base):
             self.fixed_hue_map = {i: (i * 21) % 256 for i in range(12)}
 
     # This should be implemented in child classes
-    def interaction_update_sound_light(self, old_state, new_state):
+    def interaction_update_sound_light(self, touched, rising, falling):
         try:
             # Clears the reaction note for the Composer 
             self.sound_state.clear_reaction_notes()
 
             # If we now detect as active, we add a reaction note and change the light state as specified
-            for tube_id, (old_active, active) in enumerate(zip(old_state, new_state)):
+            for tube_id in iter_bits(rising):
                 if tube_id >= len(self.notes):
-                    continue  # Skip tubes without corresponding notes
-                    
-                if not old_active and active:
-                    note = self.notes[tube_id]
-                    note_to_play = note + self.octave * 12
-                    self.sound_state.append_reaction_notes(note_to_play)
+                    break  # Tubes without corresponding notes, bits come lowest first
                     
-                    # Get hue from fixed_hue_map or use a default if note not in map
-                    hue = self.fixed_hue_map.get(note % 12, (note * 21) % 256)
-                    self.light_state[tube_id] = (hue, 255, 255)
+                note = self.notes[tube_id]
+                note_to_play = note + self.octave * 12
+                self.sound_state.append_reaction_notes(note_to_play)
+                
+                # Get hue from fixed_hue_map or use a default if note not in map
+                hue = self.fixed_hue_map.get(note % 12, (note * 21) % 256)
+                self.light_state[tube_id] = (hue, 255, 255)
         except Exception as e:
             print(f"[ERROR] Error in FixedMapper.interaction_update_sound_light: {e}")
 
@@ -406,51 +425,50 @@ class RotationMapper(Pillar_Mapper_Base):
             self.tube_allocation = ["i", "t", "k+", "k-", "m", "s"][:self.num_tubes]
             self.cmap = lambda x: (1.0, 0.0, 0.0) if x < 0.5 else (0.0, 0.0, 1.0)
 
-    def interaction_update_sound_light(self, old_state, new_state):
+    def interaction_update_sound_light(self, touched, rising, falling):
         try:
-            # Handle each tube's state
-            for tube_id, active in enumerate(new_state):
+            # Handle every tube that is currently held
+            for tube_id in iter_bits(touched):
                 if tube_id >= len(self.tube_allocation):
-                    continue  # Skip invalid tube indices
+                    break  # Invalid tube indices, bits come lowest first
                     
                 tube_allocation = self.tube_allocation[tube_id]
                 
-                if active:
-                    delta = 1 
+                delta = 1 
+                try:
+                    if 'i' in tube_allocation:
+                        value = self.sound_state.change_instrument()
+                    elif 't' in tube_allocation:
+                        value = self.sound_state.change_tempo(delta=5)
+                    elif 'k+' in tube_allocation:
+                        value = self.sound_state.change_key(delta=5)
+                    elif 'k-' in tube_allocation:
+                        value = self.sound_state.change_key(delta=-4)
+                    elif 'm' in tube_allocation:
+                        value = self.sound_state.change_melody()
+                    elif 's' in tube_allocation:
+                        value = self.sound_state.change_scale()
+                    elif 'b' in tube_allocation:
+                        value = self.sound_state.change_baseline()
+
+                    # Generate a random color using the colormap
                     try:
-                        if 'i' in tube_allocation:
-                            value = self.sound_state.change_instrument()
-                        elif 't' in tube_allocation:
-                            value = self.sound_state.change_tempo(delta=5)
-                        elif 'k+' in tube_allocation:
-                            value = self.sound_state.change_key(delta=5)
-                        elif 'k-' in tube_allocation:
-                            value = self.sound_state.change_key(delta=-4)
-                        elif 'm' in tube_allocation:
-                            value = self.sound_state.change_melody()
-                        elif 's' in tube_allocation:
-                            value = self.sound_state.change_scale()
-                        elif 'b' in tube_allocation:
-                            value = self.sound_state.change_baseline()
-
-                        # Generate a random color using the colormap
-                        try:
-                            color_val = random.random()
-                            rgb_color = self.cmap(color_val)[:3]  # Get RGB values
-                            hsv_color = rgb_to_hsv(rgb_color)
-                            # Create a tuple of HSV values scaled to 0-255
-                            hsv_tuple = (
-                                int(hsv_color[0] * 255),
-                                int(hsv_color[1] * 255),
-                                int(hsv_color[2] * 255)
-                            )
-                            self.light_state[tube_id] = hsv_tuple
-                        except Exception as color_error:
-                            print(f"[ERROR] Failed to generate color: {color_error}")
-                            # Use a simple fallback color
-                            self.light_state[tube_id] = (random.randint(0, 255), 255, 255)
-                    except Exception as tube_error:
-                        print(f"[ERROR] Error processing tube {tube_id} with allocation {tube_allocation}: {tube_error}")
+                        color_val = random.random()
+                        rgb_color = self.cmap(color_val)[:3]  # Get RGB values
+                        hsv_color = rgb_to_hsv(rgb_color)
+                        # Create a tuple of HSV values scaled to 0-255
+                        hsv_tuple = (
+                            int(hsv_color[0] * 255),
+                            int(hsv_color[1] * 255),
+                            int(hsv_color[2] * 255)
+                        )
+                        self.light_state[tube_id] = hsv_tuple
+                    except Exception as color_error:
+                        print(f"[ERROR] Failed to generate color: {color_error}")
+                        # Use a simple fallback color
+                        self.light_state[tube_id] = (random.randint(0, 255), 255, 255)
+                except Exception as tube_error:
+                    print(f"[ERROR] Error processing tube {tube_id} with allocation {tube_allocation}: {tube_error}")
         except Exception as e:
             print(f"[ERROR] Error in RotationMapper.interaction_update_sound_light: {e}")
 
@@ -488,57 +506,63 @@ class EventRotationMapper(Pillar_Mapper_Base):
             self.tube_allocation = ["i", "t+", "t-", "k+", "k-", "m"][:self.num_tubes]
             self.cmap = lambda x: (1.0, 0.0, 0.0) if x < 0.5 else (0.0, 0.0, 1.0)
 
-    def interaction_update_sound_light(self, old_state, new_state):
+    def interaction_update_sound_light(self, touched, rising, falling):
         try:
-            # Handle each tube's state transition
-            for tube_id, (old_active, active) in enumerate(zip(old_state, new_state)):
+            # Only change on a rising edge (0→1)
+            for tube_id in iter_bits(rising):
                 if tube_id >= len(self.tube_allocation):
-                    continue  # Skip invalid tube indices
+                    break  # Invalid tube indices, bits come lowest first
                     
-                # Only change on a rising edge (0→1)
-                if not old_active and active:
-                    tube_allocation = self.tube_allocation[tube_id]
-                    delta = 1 
+                tube_allocation = self.tube_allocation[tube_id]
+                delta = 1 
+                try:
+                    if 'i' in tube_allocation:
+                        value = self.sound_state.change_instrument()
+                    elif 't+' in tube_allocation:
+                        value = self.sound_state.change_tempo(delta=10)
+                    elif 't-' in tube_allocation:
+                        value = self.sound_state.change_tempo(delta=-10)
+                    elif 'k+' in tube_allocation:
+                        value = self.sound_state.change_key(delta=5)
+                    elif 'k-' in tube_allocation:
+                        value = self.sound_state.change_key(delta=-4)
+                    elif 'm' in tube_allocation:
+                        value = self.sound_state.change_melody()
+                    elif 's' in tube_allocation:
+                        value = self.sound_state.change_scale()
+                    elif 'b' in tube_allocation:
+                        value = self.sound_state.change_baseline()
+
+                    # Generate a random color using the colormap
                     try:
-                        if 'i' in tube_allocation:
-                            value = self.sound_state.change_instrument()
-                        elif 't+' in tube_allocation:
-                            value = self.sound_state.change_tempo(delta=10)
-                        elif 't-' in tube_allocation:
-                            value = self.sound_state.change_tempo(delta=-10)
-                        elif 'k+' in tube_allocation:
-                            value = self.sound_state.change_key(delta=5)
-                        elif 'k-' in tube_allocation:
-                            value = self.sound_state.change_key(delta=-4)
-                        elif 'm' in tube_allocation:
-                            value = self.sound_state.change_melody()
-                        elif 's' in tube_allocation:
-                            value = self.sound_state.change_scale()
-                        elif 'b' in tube_allocation:
-                            value = self.sound_state.change_baseline()
-
-                        # Generate a random color using the colormap
-                        try:
-                            color_val = random.random()
-                            rgb_color = self.cmap(color_val)[:3]  # Get RGB values
-                            hsv_color = rgb_to_hsv(rgb_color)
-                            # Create a tuple of HSV values scaled to 0-255
-                            hsv_tuple = (
-                                int(hsv_color[0] * 255),
-                                int(hsv_color[1] * 255),
-                                int(hsv_color[2] * 255)
-                            )
-                            self.light_state[tube_id] = hsv_tuple
-                        except Exception as color_error:
-                            print(f"[ERROR] Failed to generate color: {color_error}")
-                            # Use a simple fallback color
-                            self.light_state[tube_id] = (random.randint(0, 255), 255, 255)
-                    except Exception as tube_error:
-                        print(f"[ERROR] Error processing tube {tube_id} with allocation {tube_allocation}: {tube_error}")
+                        color_val = random.random()
+                        rgb_color = self.cmap(color_val)[:3]  # Get RGB values
+                        hsv_color = rgb_to_hsv(rgb_color)
+                        # Create a tuple of HSV values scaled to 0-255
+                        hsv_tuple = (
+                            int(hsv_color[0] * 255),
+                            int(hsv_color[1] * 255),
+                            int(hsv_color[2] * 255)
+                        )
+                        self.light_state[tube_id] = hsv_tuple
+                    except Exception as color_error:
+                        print(f"[ERROR] Failed to generate color: {color_error}")
+                        # Use a simple fallback color
+                        self.light_state[tube_id] = (random.randint(0, 255), 255, 255)
+                except Exception as tube_error:
+                    print(f"[ERROR] Error processing tube {tube_id} with allocation {tube_allocation}: {tube_error}")
         except Exception as e:
             print(f"[ERROR] Error in EventRotationMapper.interaction_update_sound_light: {e}")
 
 class LightSoundMapper(Pillar_Mapper_Base):
+    # Hue quantisation modes for the note lookup tables
+    #   chromatic - 12 equal hue bins, one per semitone
+    #   fixed_hue - nearest hue in FIXED_NOTE_HUE_MAP, the inverse of the LED colours
+    #   scale     - chromatic, then snapped down onto the pillar's configured notes
+    QUANTISATION_MODES = ("chromatic", "fixed_hue", "scale")
+    NUM_OCTAVES = 10
+    MIN_BRIGHTNESS = 20
+
     def __init__(self, cfg, pillar_cfg):
         super().__init__(cfg, pillar_cfg)
         
@@ -555,94 +579,102 @@ class LightSoundMapper(Pillar_Mapper_Base):
                 elif len(self.notes) > self.num_tubes:
                     self.notes = self.notes[:self.num_tubes]
             else:
-                print("[WARNING] No notes in pillar config, using defaults")
+                log.warning("No notes in pillar config, using defaults")
                 self.notes = [0, 2, 4, 5, 7, 9][:self.num_tubes]  # Default to major scale
                 
             # Default octave is 4 if not specified
             self.octave = pillar_cfg.get("octave", 4)
+            self.quantisation = pillar_cfg.get("hue_quantisation", "chromatic")
+            if self.quantisation not in self.QUANTISATION_MODES:
+                log.warning("Unknown hue_quantisation %r, using chromatic", self.quantisation)
+                self.quantisation = "chromatic"
             
             # Create bidirectional mappings
             self.fixed_hue_map = getattr(ifc, "FIXED_NOTE_HUE_MAP", {})
             
             # If hue map is empty, create a default one
             if not self.fixed_hue_map:
-                print("[WARNING] FIXED_NOTE_HUE_MAP not found in interfaces, creating default")
+                log.warning("FIXED_NOTE_HUE_MAP not found in interfaces, creating default")
                 self.fixed_hue_map = {i: (i * 21) % 256 for i in range(12)}
                 
-            # Create reverse mapping from hue ranges to notes
-            self.hue_to_note_map = self._create_hue_to_note_map()
+            # hue -> MIDI note tables for every (octave, quantisation mode)
+            self.note_luts = self._build_note_luts()
             
-            # Keep track of light-driven note changes
-            self.light_driven_notes = [None] * self.num_tubes
+            # Keep track of light-driven note changes, -1 for no note
+            self.light_driven_notes = np.full(self.num_tubes, -1, dtype=np.int16)
             
             # Track timestamps for debugging
             self.last_update_time = time.time()
         except Exception as e:
-            print(f"[ERROR] Error initializing LightSoundMapper: {e}")
-            traceback.print_exc()
+            log.exception("Error initializing LightSoundMapper: %s", e)
             # Set safe defaults
             self.num_tubes = 6
             self.notes = [0, 2, 4, 5, 7, 9]  # Default to major scale
             self.octave = 4
+            self.quantisation = "chromatic"
             self.fixed_hue_map = {i: (i * 21) % 256 for i in range(12)}
-            self.hue_to_note_map = {i: i // 21 for i in range(256)}
-            self.light_driven_notes = [None] * self.num_tubes
+            self.note_luts = self._build_note_luts()
+            self.light_driven_notes = np.full(self.num_tubes, -1, dtype=np.int16)
             self.last_update_time = time.time()
             
-        print(f"[DEBUG] LightSoundMapper initialized with {self.num_tubes} tubes")
-        print(f"[DEBUG] Notes config: {self.notes}, Octave: {self.octave}")
-        print(f"[DEBUG] Hue-to-note map created with {len(set(self.hue_to_note_map.values()))} unique semitones")
-    
-    def _create_hue_to_note_map(self):
-        """Create a mapping from hue values (0-255) to semitones (0-11)"""
-        try:
-            # Create 12 equal-sized bins for the hue values
-            bin_size = 256 // 12
-            hue_to_note = {}
-            
-            for note in range(12):
-                # Calculate the hue range for this note
-                min_hue = note * bin_size
-                max_hue = (note + 1) * bin_size - 1
-                if note == 11:  # Make sure the last bin includes 255
-                    max_hue = 255
-                    
-                # Map each hue in this range to the note
-                for hue in range(min_hue, max_hue + 1):
-                    hue_to_note[hue] = note
-            
-            print(f"[DEBUG] Hue-to-note mapping created: bin_size={bin_size}")
-            print(f"[DEBUG] Example mappings: hue 0 -> {hue_to_note[0]}, hue 127 -> {hue_to_note[127]}, hue 255 -> {hue_to_note[255]}")
-                    
-            return hue_to_note
-        except Exception as e:
-            print(f"[ERROR] Error creating hue-to-note map: {e}")
-            # Return a simple default mapping
-            return {i: (i * 12) // 256 for i in range(256)}
+        log.info("LightSoundMapper initialized with %d tubes, notes %s, octave %d, %s quantisation",
+                 self.num_tubes, self.notes, self.octave, self.quantisation)
+
+    def _build_semitone_lut(self, mode):
+        """256 entry hue -> semitone (0-11) table for one quantisation mode"""
+        hues = np.arange(256)
+        # 12 equal-sized bins, the last one also takes the remainder up to 255
+        chromatic = np.minimum(hues // (256 // 12), 11)
+        if mode == "fixed_hue":
+            notes = np.array(list(self.fixed_hue_map.keys()))
+            centres = np.array(list(self.fixed_hue_map.values()))
+            # Hue is circular so compare distances both ways round
+            distance = np.abs(hues[:, None] - centres[None, :])
+            distance = np.minimum(distance, 256 - distance)
+            return notes[np.argmin(distance, axis=1)].astype(np.uint8)
+        if mode == "scale":
+            allowed = np.array(sorted(set(int(n) % 12 for n in self.notes)))
+            # Highest allowed semitone at or below the chromatic one, wrapping to the top
+            index = np.searchsorted(allowed, chromatic, side="right") - 1
+            return allowed[index].astype(np.uint8)
+        return chromatic.astype(np.uint8)
+
+    def _build_note_luts(self):
+        """Precompute hue -> MIDI note tables for every octave and quantisation mode"""
+        luts = {}
+        for mode in self.QUANTISATION_MODES:
+            semitones = self._build_semitone_lut(mode).astype(np.int16)
+            for octave in range(self.NUM_OCTAVES):
+                luts[(octave, mode)] = semitones + octave * 12
+        return luts
+
+    @property
+    def note_lut(self):
+        """The hue -> MIDI note table for the current octave and quantisation"""
+        octave = max(0, min(self.NUM_OCTAVES - 1, int(self.octave)))
+        return self.note_luts[(octave, self.quantisation)]
     
     def hue_to_semitone(self, hue):
         """Convert a hue value (0-255) to a semitone (0-11)"""
-        try:
-            # Ensure hue is within valid range
-            hue = max(0, min(255, int(hue)))
-            
-            # Use the pre-calculated mapping for consistent results
-            if hasattr(self, 'hue_to_note_map') and hue in self.hue_to_note_map:
-                semitone = self.hue_to_note_map[hue]
-            else:
-                # Fallback to direct calculation if mapping is not available
-                # Map 0-255 to 0-11 range (12 semitones)
-                semitone = (hue * 12) // 256
-            
-            # Ensure we get a value within 0-11 range
-            semitone = semitone % 12
-            
-            print(f"[MAPPING] Hue {hue} maps to semitone {semitone} (octave {self.octave})")
-            return semitone
-        except Exception as e:
-            print(f"[ERROR] Error in hue_to_semitone: {e}")
-            # Return a safe default
-            return 0
+        return int(self.note_lut[max(0, min(255, int(hue)))]) % 12
+
+    def hue_to_note(self, hue):
+        """Convert a hue value (0-255) to a MIDI note in the current octave"""
+        return int(self.note_lut[max(0, min(255, int(hue)))])
+
+    def light_status_to_notes(self, light_status):
+        """Convert a whole pillar's light status to notes in one table lookup
+
+        Args:
+            light_status: Sequence of (hue, brightness, ...) tuples, one per tube
+
+        Returns:
+            (notes, lit): int16 array of MIDI notes and bool array of tubes bright enough to play
+        """
+        status = np.asarray(light_status, dtype=np.int16).reshape(len(light_status), -1)
+        hues = np.clip(status[:, 0], 0, 255)
+        lit = status[:, 1] >= self.MIN_BRIGHTNESS
+        return self.note_lut[hues], lit
     
     def update_from_light_status(self, light_status):
         """
@@ -656,8 +688,7 @@ class LightSoundMapper(Pillar_Mapper_Base):
         """
         try:
             current_time = time.time()
-            time_since_last = current_time - self.last_update_time
-            print(f"[DEBUG] update_from_light_status called, {time_since_last:.2f}s since last update")
+            log.debug("update_from_light_status called, %.2fs since last update", current_time - self.last_update_time)
             self.last_update_time = current_time
             
             # Clear previous reaction notes
@@ -665,83 +696,48 @@ class LightSoundMapper(Pillar_Mapper_Base):
             
             # Guard against invalid light_status
             if not light_status or len(light_status) == 0:
-                print("[WARNING] Empty light_status provided to update_from_light_status")
+                log.warning("Empty light_status provided to update_from_light_status")
                 return self.sound_state
-                
-            # Track which tubes have active lights
-            active_tubes = 0
             
-            # Process each tube's light status
-            for tube_id, status in enumerate(light_status):
-                if tube_id >= len(self.light_driven_notes):
-                    continue  # Skip invalid tube indices
-                    
-                # Ensure status is valid
-                if not isinstance(status, (tuple, list)) or len(status) < 2:
-                    continue
-                    
-                hue, brightness = status[0], status[1]
-                
-                # Skip tubes with no brightness
-                if brightness < 20:
-                    continue
-                    
-                active_tubes += 1
-                
-                # Convert hue to semitone
-                semitone = self.hue_to_semitone(hue)
-                
-                # Calculate full note with octave
-                note_to_play = semitone + self.octave * 12
-                
-                # Add to reaction notes if different from previous
-                if note_to_play != self.light_driven_notes[tube_id]:
-                    self.sound_state.append_reaction_notes(note_to_play)
-                    self.light_driven_notes[tube_id] = note_to_play
-                    print(f"[DEBUG] Tube {tube_id}: Hue {hue} → Semitone {semitone} → Note {note_to_play}")
+            num_tubes = min(len(light_status), len(self.light_driven_notes))
+            notes, lit = self.light_status_to_notes(light_status[:num_tubes])
             
-            print(f"[DEBUG] {active_tubes} tubes active, {len(self.sound_state.reaction_notes)} new reaction notes")
+            # Add to reaction notes only for lit tubes whose note changed
+            changed = lit & (notes != self.light_driven_notes[:num_tubes])
+            for tube_id in np.flatnonzero(changed):
+                self.sound_state.append_reaction_notes(int(notes[tube_id]))
+            self.light_driven_notes[:num_tubes][changed] = notes[changed]
+            
+            log.debug("%d tubes active, %d new reaction notes %s", int(lit.sum()),
+                      len(self.sound_state.reaction_notes), self.sound_state.reaction_notes)
             return self.sound_state
         except Exception as e:
-            print(f"[ERROR] Error in update_from_light_status: {e}")
+            log.error("Error in update_from_light_status: %s", e)
             return self.sound_state
     
-    def interaction_update_sound_light(self, old_state, new_state):
+    def interaction_update_sound_light(self, touched, rising, falling):
         """Handle button press interactions"""
         try:
             # Clears the reaction note for the Composer 
             self.sound_state.clear_reaction_notes()
+            if not touched:
+                return False
     
             # Process all active tubes to support polyphony (multiple simultaneous touches)
-            active_tubes = []
-            
-            # First identify all active tubes
-            for tube_id, active in enumerate(new_state):
-                if active:
-                    # Collect all active tubes for processing
-                    active_tubes.append(tube_id)
+            notes, lit = self.light_status_to_notes(self.light_state.lights)
             
-            # Process each active tube
-            for tube_id in active_tubes:
-                # Make sure we have a valid hue for this tube
-                hue, brightness, _ = self.light_state[tube_id]
-                
-                # Skip if tube is not lit or has no brightness
-                if brightness < 20:
-                    continue
-                    
-                # Convert hue to note
-                semitone = self.hue_to_semitone(hue)
-                note_to_play = semitone + self.octave * 12
-                
-                # Add to reaction notes (these will be played in main.py)
-                self.sound_state.append_reaction_notes(note_to_play)
-                print(f"[DEBUG] Added reaction note {note_to_play} for tube {tube_id} (hue={hue})")
+            # Add to reaction notes (these will be played in main.py)
+            for tube_id in iter_bits(touched):
+                if tube_id >= len(notes):
+                    break
+                if lit[tube_id]:
+                    self.sound_state.append_reaction_notes(int(notes[tube_id]))
+            log.debug("Added reaction notes %s for touch mask %s", self.sound_state.reaction_notes, bin(touched))
                 
             # Return true if we added any notes
             return len(self.sound_state.reaction_notes) > 0
         except Exception as e:
-            print(f"[ERROR] Error in LightSoundMapper.interaction_update_sound_light: {e}")
+            log.error("Error in LightSoundMapper.interaction_update_sound_light: %s", e)
             return False
 
 def generate_mapping_interface(cfg, cfg_pillar) -> Pillar_Mapper_Base:
@@ -0,0 +1,145 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+log = logging.getLogger("raveforest.sound")
+
+
+class NoteExpiryScheduler():
+    """Deadline heap for note cutoffs, releases and cleanup
+
+    Each entry is keyed (e.g. ("reaction", note_id)) so scheduling the same
+    key again replaces the old deadline and cancel() is O(1). Replaced and
+    cancelled entries are only marked dead and skipped when they reach the
+    top of the heap, so run_expired() costs O(expired log n) rather than a
+    scan of every active note.
+
+    Expiries are run either by calling run_expired() from an existing loop
+    (SoundManager.tick) or by start() which runs them from a daemon thread
+    that sleeps until the next deadline.
+
+    clock defaults to time.monotonic, a headless SoundManager passes the
+    SCAMP session clock so note-offs follow fast-forwarded time.
+    """
+
+    def __init__(self, name="note-expiry", clock=time.monotonic):
+        self.name = name
+        self.clock = clock
+        self.heap = []  # [deadline, seq, key, callback, args, alive]
+        self.entries = {}  # key -> live heap entry
+        self.dead_count = 0
+        self.counter = itertools.count()
+        self.condition = threading.Condition()
+        self.thread = None
+        self.running = False
+
+    def schedule(self, key, delay, callback, *args):
+        """Run callback(*args) in delay seconds, replacing any pending entry for key"""
+        entry = [self.clock() + delay, next(self.counter), key, callback, args, True]
+        with self.condition:
+            self._cancel_locked(key)
+            self.entries[key] = entry
+            heapq.heappush(self.heap, entry)
+            if self.heap[0] is entry:
+                # New earliest deadline, wake the thread to shorten its wait
+                self.condition.notify()
+
+    def cancel(self, key):
+        """Drop the pending entry for key, returns True if there was one"""
+        with self.condition:
+            return self._cancel_locked(key)
+
+    def _cancel_locked(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return False
+        entry[5] = False
+        self.dead_count += 1
+        # Rebuild once most of the heap is dead entries so it can not grow unbounded
+        if self.dead_count > 64 and self.dead_count > len(self.heap) // 2:
+            self.heap = [e for e in self.heap if e[5]]
+            heapq.heapify(self.heap)
+            self.dead_count = 0
+        return True
+
+    def clear(self):
+        with self.condition:
+            self.heap.clear()
+            self.entries.clear()
+            self.dead_count = 0
+
+    def pending(self, key):
+        with self.condition:
+            return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _pop_expired_locked(self, now):
+        expired = []
+        heap = self.heap
+        while heap and heap[0][0] <= now:
+            entry = heapq.heappop(heap)
+            if not entry[5]:
+                self.dead_count -= 1
+                continue
+            del self.entries[entry[2]]
+            expired.append(entry)
+        return expired
+
+    def _next_deadline_locked(self):
+        heap = self.heap
+        while heap and not heap[0][5]:
+            heapq.heappop(heap)
+            self.dead_count -= 1
+        return heap[0][0] if heap else None
+
+    def _run_callbacks(self, expired):
+        # Called without the lock held so callbacks may schedule or cancel
+        for _, _, key, callback, args, _ in expired:
+            try:
+                callback(*args)
+            except Exception as e:
+                log.error("Note expiry callback for %s failed: %s", key, e)
+
+    def run_expired(self, now=None):
+        """Run every callback whose deadline has passed, returns how many ran"""
+        if now is None:
+            now = self.clock()
+        with self.condition:
+            if not self.heap or self.heap[0][0] > now:
+                return 0
+            expired = self._pop_expired_locked(now)
+        self._run_callbacks(expired)
+        return len(expired)
+
+    def start(self):
+        """Run expiries from a daemon thread instead of run_expired()"""
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                if not self.running:
+                    break
+                deadline = self._next_deadline_locked()
+                now = self.clock()
+                if deadline is None:
+                    self.condition.wait()
+                    continue
+                if deadline > now:
+                    self.condition.wait(deadline - now)
+                    continue
+                expired = self._pop_expired_locked(now)
+            self._run_callbacks(expired)
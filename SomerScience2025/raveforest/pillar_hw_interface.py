@@ -4,6 +4,8 @@ import threading
 import queue
 import time
 import copy
+import collections
+import logging
 
 import argparse
 import json
@@ -12,11 +14,214 @@ import os
 
 # from MappingInterface import  MappingInterface
 
+log = logging.getLogger("raveforest.serial")
+
 def clamp(val, b=0, c=255):
     return max(b, min(val, c))
 
-def read_serial_data(serial_port, cap_queue, light_queue, kill_event):
-    print(f"Serial Read Thread Started With {serial_port}")
+# ------- Binary serial framing
+#
+# Optional compact protocol negotiated at connect time. The Pi sends
+# PROTO_BINARY_REQUEST as a normal text command; firmware that supports it
+# replies with the PROTO_BINARY_ACK text line and from then on sends frames of
+#
+#   SYNC | TYPE | LEN | PAYLOAD[LEN] | CRC8(TYPE, LEN, PAYLOAD)
+#
+# CAP payload is a little-endian touch bitmask (bit i = touch sensor i), one
+# byte for up to 8 sensors and more bytes for larger pillars
+# LED payload is one hue byte per tube
+# Firmware that doesn't understand the request ignores it and we stay on text.
+
+FRAME_SYNC = 0xA5
+FRAME_CAP = 0x01
+FRAME_LED = 0x02
+FRAME_HEADER_SIZE = 3  # SYNC, TYPE, LEN
+FRAME_MAX_PAYLOAD = 32
+
+PROTO_BINARY_REQUEST = "PROTO,BIN;\n\r"
+PROTO_BINARY_ACK = "PROTO,BIN,OK"
+
+NUM_CAP_SENSORS = 6
+
+def _build_crc8_table(poly=0x07):
+    table = bytearray(256)
+    for i in range(256):
+        crc = i
+        for _ in range(8):
+            crc = ((crc << 1) ^ poly) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+        table[i] = crc
+    return bytes(table)
+
+CRC8_TABLE = _build_crc8_table()
+
+def crc8(data, start=0, end=None):
+    """CRC-8 (poly 0x07) over data[start:end] without slicing"""
+    crc = 0
+    table = CRC8_TABLE
+    for i in range(start, len(data) if end is None else end):
+        crc = table[crc ^ data[i]]
+    return crc
+
+def encode_frame(frame_type, payload):
+    """Build a binary frame, used by the mock teensy and for testing"""
+    body = bytes([frame_type, len(payload)]) + bytes(payload)
+    return bytes([FRAME_SYNC]) + body + bytes([crc8(body)])
+
+# One touch tuple per possible CAP bitmask, built once so decoding a frame
+# does not allocate.
+CAP_BITMASK_STATUS = [
+    tuple(bool(mask >> i & 1) for i in range(NUM_CAP_SENSORS))
+    for mask in range(1 << NUM_CAP_SENSORS)
+]
+
+def touch_mask(touch_status):
+    mask = 0
+    for i, touched in enumerate(touch_status):
+        if touched:
+            mask |= 1 << i
+    return mask
+
+def mask_to_status(mask, num_sensors=NUM_CAP_SENSORS):
+    """Per-sensor bool tuple for a touch bitmask, from the table for the usual 6 sensors"""
+    if num_sensors == NUM_CAP_SENSORS:
+        return CAP_BITMASK_STATUS[mask]
+    return tuple(bool(mask >> i & 1) for i in range(num_sensors))
+
+# Immutable status snapshots. Writers replace the whole snapshot, which is a
+# single reference assignment, so readers take it without a lock and detect
+# changes by comparing the version.
+TouchSnapshot = collections.namedtuple("TouchSnapshot", ["version", "mask", "status", "rx_time"])
+LightSnapshot = collections.namedtuple("LightSnapshot", ["version", "status"])
+
+class TouchState(threading.Event):
+    """Latest touch snapshot, published by the read thread
+
+    publish() only creates a new snapshot when the bitmask changes, stamping
+    it with the time.perf_counter() the bytes arrived so the latency of the
+    touch -> sound path can be measured, and sets the event to wake
+    Pillar.wait_for_touch().
+    """
+
+    def __init__(self, num_sensors=NUM_CAP_SENSORS):
+        super().__init__()
+        self.num_sensors = num_sensors
+        self.sensor_mask = (1 << num_sensors) - 1
+        self.publish_lock = threading.Lock()  # Serialises writers only
+        self.snapshot = TouchSnapshot(0, 0, mask_to_status(0, num_sensors), None)
+
+    def publish(self, mask):
+        with self.publish_lock:
+            snapshot, changed = self._publish_locked(mask)
+        if changed:
+            self.set()
+        return snapshot
+
+    def update(self, fn):
+        """Publish fn(current mask), read and written under one lock hold so no concurrent publish is lost"""
+        with self.publish_lock:
+            snapshot, changed = self._publish_locked(fn(self.snapshot.mask))
+        if changed:
+            self.set()
+        return snapshot
+
+    def _publish_locked(self, mask):
+        """The snapshot for mask and whether it is new"""
+        mask &= self.sensor_mask
+        current = self.snapshot
+        if mask == current.mask:
+            return current, False
+        snapshot = TouchSnapshot(current.version + 1, mask, mask_to_status(mask, self.num_sensors), time.perf_counter())
+        self.snapshot = snapshot
+        return snapshot, True
+
+class BinaryFrameReader():
+    """Parses binary frames straight out of a preallocated receive buffer
+
+    Bytes are read with readinto() into a fixed bytearray and parsed in place
+    through indices, so no per-frame decode/strip/split is done. Unconsumed
+    bytes are moved back to the front of the buffer when it runs out of room.
+    """
+
+    def __init__(self, touch_state, light_queue, buffer_size=1024):
+        self.touch_state = touch_state
+        self.light_queue = light_queue
+
+        self.buffer = bytearray(buffer_size)
+        self.view = memoryview(self.buffer)
+        self.start = 0
+        self.end = 0
+
+        self.frame_count = 0
+        self.crc_errors = 0
+
+    def read_from(self, serial_port):
+        """Read whatever is available (blocking up to the port timeout for the first byte)"""
+        if len(self.buffer) - self.end < FRAME_HEADER_SIZE + FRAME_MAX_PAYLOAD + 1:
+            self._compact()
+
+        space = len(self.buffer) - self.end
+        to_read = max(1, min(serial_port.in_waiting, space))
+        num_read = serial_port.readinto(self.view[self.end:self.end + to_read])
+        if num_read:
+            self.end += num_read
+            self.parse()
+        return num_read
+
+    def parse(self):
+        buf = self.buffer
+        pos = self.start
+        end = self.end
+        while end - pos > FRAME_HEADER_SIZE:
+            # Resynchronise on anything that isn't a plausible frame start
+            if buf[pos] != FRAME_SYNC:
+                pos += 1
+                continue
+            length = buf[pos + 2]
+            if length > FRAME_MAX_PAYLOAD:
+                pos += 1
+                continue
+            frame_end = pos + FRAME_HEADER_SIZE + length + 1
+            if frame_end > end:
+                break  # Wait for the rest of the frame
+            if crc8(buf, pos + 1, frame_end - 1) != buf[frame_end - 1]:
+                self.crc_errors += 1
+                pos += 1
+                continue
+            self._dispatch(buf[pos + 1], pos + FRAME_HEADER_SIZE, length)
+            self.frame_count += 1
+            pos = frame_end
+
+        if pos == end:
+            self.start = self.end = 0
+        else:
+            self.start = pos
+
+    def _compact(self):
+        remaining = self.end - self.start
+        if remaining >= len(self.buffer) - (FRAME_HEADER_SIZE + FRAME_MAX_PAYLOAD + 1):
+            # Buffer is full of unparseable bytes, drop them
+            remaining = 0
+        else:
+            self.buffer[:remaining] = self.view[self.start:self.end]
+        self.start = 0
+        self.end = remaining
+
+    def _dispatch(self, frame_type, offset, length):
+        buf = self.buffer
+        if frame_type == FRAME_CAP and length >= 1:
+            if length == 1:
+                self.touch_state.publish(buf[offset])
+            else:
+                self.touch_state.publish(int.from_bytes(buf[offset:offset + length], "little"))
+        elif frame_type == FRAME_LED:
+            for i in range(length):
+                self.light_queue.put((i, buf[offset + i], 255))
+
+def read_serial_data(serial_port, touch_state, light_queue, kill_event, serial_status=None):
+    log.info("Serial Read Thread Started With %s", serial_port)
+
+    # Set once the firmware acknowledges the binary protocol
+    binary_reader = None
     
     # Increase serial timeout for better reliability
     serial_port.timeout = 0.1
@@ -25,17 +230,22 @@ def read_serial_data(serial_port, cap_queue, light_queue, kill_event):
     try:
         serial_port.flushInput()
     except Exception as e:
-        print(f"[WARNING] Initial buffer flush failed: {e}")
+        log.warning("Initial buffer flush failed: %s", e)
     
     while True:
         if kill_event.is_set():
             break
             
         try:
+            if binary_reader is not None:
+                binary_reader.read_from(serial_port)
+                continue
+
             # Read response without flushing buffer every time
+            # readline() already blocks for up to serial_port.timeout, so no
+            # extra sleep is needed and a frame is handled as soon as it lands
             raw_response = serial_port.readline()
             if not raw_response:
-                time.sleep(0.05)
                 continue
                 
             # Decode the response with error handling
@@ -43,20 +253,30 @@ def read_serial_data(serial_port, cap_queue, light_queue, kill_event):
             if not response_str:
                 continue
                 
+            # Firmware accepted the binary protocol, everything after this line is framed
+            if response_str.startswith(PROTO_BINARY_ACK):
+                binary_reader = BinaryFrameReader(touch_state, light_queue)
+                if serial_status is not None:
+                    serial_status["protocol"] = "binary"
+                log.info("Serial protocol switched to binary frames")
+                continue
+
             # Only process valid message formats
             if response_str.startswith("CAP,"):
                 parts = response_str.split(",")
                 
-                if len(parts) >= 7:  # "CAP" + 6 values
+                num_sensors = touch_state.num_sensors
+                if len(parts) > num_sensors:  # "CAP" + one value per sensor
                     try:
-                        touch_values = [bool(int(parts[i])) for i in range(1, 7)]
-                        # Use a priority queue or set a flag for immediate processing
-                        cap_queue.put(touch_values)
-                        # Add timestamp to measure latency
-                        touch_time = time.time()
-                        print(f"[TOUCH] CAP event detected at {touch_time:.3f}: {touch_values}")
+                        mask = 0
+                        for i in range(num_sensors):
+                            if int(parts[i + 1]):
+                                mask |= 1 << i
+                        # Publishes a new snapshot and wakes the controller only if anything changed
+                        snapshot = touch_state.publish(mask)
+                        log.debug("CAP event detected: %s (version %d)", snapshot.status, snapshot.version)
                     except (ValueError, IndexError) as e:
-                        print(f"[ERROR] Failed to process CAP data: {e}")
+                        log.error("Failed to process CAP data: %s", e)
                         
             elif response_str.startswith("LED,") and len(response_str) >= 10:
                 parts = response_str.split(",")
@@ -67,42 +287,147 @@ def read_serial_data(serial_port, cap_queue, light_queue, kill_event):
                         for i in range(6):
                             hue = int(parts[i+1])
                             light_queue.put((i, hue, 255))
-                        print(f"[LED] Valid LED data received: {response_str[:20]}...")
+                        log.debug("Valid LED data received: %s...", response_str[:20])
                     except (ValueError, IndexError) as e:
-                        print(f"[ERROR] Error processing LED data: {e}")
+                        log.error("Error processing LED data: %s", e)
                         
         except Exception as e:
-            print(f"[ERROR] Error in read_serial_data: {e}")
+            log.error("Error in read_serial_data: %s", e)
             time.sleep(0.1)  # Pause on error to avoid tight loop
             
-    print(f"[INFO] Serial Read Thread Exiting")
+    log.info("Serial Read Thread Exiting")
+
+class SerialWriteScheduler():
+    """Coalescing, rate-limited queue for messages going to the Teensy
+
+    Messages are kept per type rather than in one FIFO:
+    - ALLLED: only the latest is kept, and it supersedes pending LED messages
+    - LED,<tube>: only the latest per tube is kept
+    - anything else (GETLED, PROTO, ...) is a control message, sent in order
+      ahead of LED state and never coalesced
+
+    Instead of fixed sleeps, each write is paced by the time its bytes take on
+    the wire at the configured baud rate (with min_write_interval as a floor so
+    the Teensy parser keeps up). Coalescing happens at send time, so an
+    animation pushing frames faster than the link can carry only ever sends the
+    newest frame.
+    """
+
+    def __init__(self, baud_rate=9600, min_write_interval=0.005, max_control_depth=256):
+        # 10 bits on the wire per byte (start + 8 data + stop)
+        self.byte_time = 10.0 / baud_rate
+        self.min_write_interval = min_write_interval
+        self.max_control_depth = max_control_depth
+
+        self.control = collections.deque()
+        self.latest = {}  # message key -> latest message, in first-queued order
+        self.condition = threading.Condition()
+        self.running = True
+
+        self.sent_count = 0
+        self.coalesced_count = 0
+        self.dropped_count = 0
+
+    @staticmethod
+    def message_key(message):
+        if message.startswith("ALLLED,"):
+            return "ALLLED"
+        if message.startswith("LED,"):
+            return message[:message.index(",", 4)]  # "LED,<tube>"
+        return None
+
+    def put(self, message):
+        key = self.message_key(message)
+        with self.condition:
+            if key is None:
+                if len(self.control) >= self.max_control_depth:
+                    # Only reachable if the link is dead, keep the newest requests
+                    self.control.popleft()
+                    self.dropped_count += 1
+                self.control.append(message)
+            else:
+                if key == "ALLLED":
+                    # A full update makes any pending single-tube update stale
+                    stale = [k for k in self.latest if k != "ALLLED"]
+                    for k in stale:
+                        del self.latest[k]
+                    self.coalesced_count += len(stale)
+                if key in self.latest:
+                    self.coalesced_count += 1
+                self.latest[key] = message
+            self.condition.notify()
+
+    def get(self):
+        """Block until a message is due, returns None once stopped"""
+        with self.condition:
+            while self.running and not self.control and not self.latest:
+                self.condition.wait()
+            if not self.running:
+                return None
+            if self.control:
+                return self.control.popleft()
+            return self.latest.pop(next(iter(self.latest)))
+
+    def mark_sent(self):
+        with self.condition:
+            self.sent_count += 1
+
+    def write_duration(self, num_bytes):
+        return max(self.min_write_interval, num_bytes * self.byte_time)
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+
+    def depth(self):
+        with self.condition:
+            return len(self.control) + len(self.latest)
+
+    def stats(self):
+        with self.condition:
+            return dict(
+                depth=len(self.control) + len(self.latest),
+                control_depth=len(self.control),
+                sent=self.sent_count,
+                coalesced=self.coalesced_count,
+                dropped=self.dropped_count,
+            )
 
-def write_serial_data(serial_port, write_queue):
-    print(f"Serial Write Thread Started With {serial_port}")
+def write_serial_data(serial_port, write_scheduler):
+    log.info("Serial Write Thread Started With %s", serial_port)
+    next_write_time = 0.0
     while True:
         try:
-            packet = write_queue.get()
-
-            if "kill" in packet:
-                # Method of killing the packet
+            # Wait out the previous write before picking the next message so
+            # coalesced state is as fresh as possible when it goes out
+            delay = next_write_time - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+            packet = write_scheduler.get()
+            if packet is None:
                 break
 
-            # print("Packet Sending", packet)
-            serial_port.write(packet.encode())
-            # Add a small delay to avoid overwhelming the serial port
-            time.sleep(0.01)
+            data = packet.encode()
+            serial_port.write(data)
+            write_scheduler.mark_sent()
+            next_write_time = time.monotonic() + write_scheduler.write_duration(len(data))
         except Exception as e:
-            print(f"[ERROR] Error writing data: {e}")
-        time.sleep(0.1)
+            log.error("Error writing data: %s", e)
+            time.sleep(0.1)
 
-    print("[INFO] Serial Write Thread Killed")
+    log.info("Serial Write Thread Killed")
 
 
 class Pillar():
 
-    def __init__(self, id, port, baud_rate=9600, **kwargs):
+    def __init__(self, id, port, baud_rate=9600, serial_protocol="text", **kwargs):
         self.id = id
 
+        # "text" or "binary", binary is only used if the firmware acknowledges it
+        self.serial_protocol = serial_protocol
+
         # self.mapping = MappingInterface(copy.deepcopy(kwargs))
         # Print all elements of the mapping object
         #print(f"Mapping Interface: {self.mapping.__dict__}")
@@ -111,23 +436,26 @@ class Pillar():
 
         self.num_tubes = 7
 
-        self.num_touch_sensors = 6
-        self.touch_status = [False for _ in range(self.num_touch_sensors)]
-        self.previous_received_status = []
+        # Touch state is a bitmask so pillars are not limited to the 6 sensors of the current tubes
+        self.num_touch_sensors = kwargs.get("num_touch_sensors", NUM_CAP_SENSORS)
+        # Published by the read thread, also the event set on a touch edge, see wait_for_touch()
+        self.touch_event = TouchState(self.num_touch_sensors)
+        # Version of the last touch snapshot read_from_serial has seen
+        self.touch_version_seen = 0
+        # Checkpoint times of the latest touch change, see latency_stats.TRACE_CHECKPOINTS
+        self.touch_trace = None
 
-        self.light_status = [(0, 0, 0) for _ in range(self.num_tubes)]
+        # Published by read_from_serial from the LED updates in light_queue
+        self.light_snapshot = LightSnapshot(0, tuple((0, 0, 0) for _ in range(self.num_tubes)))
+        self.light_publish_lock = threading.Lock()  # Serialises writers only
 
-        self.cap_queue = queue.Queue()
         self.light_queue = queue.Queue()  # Using light_queue for all LED status
-        self.write_queue = queue.Queue()
-
-        # Add lock for thread safety
-        self.status_lock = threading.Lock()
+        self.write_scheduler = None  # Created per connection in restart_serial
 
         self.kill_read_thread = threading.Event()
 
         self.ser = None
-        self.serial_status = dict(connected=False, port=port, baud_rate=baud_rate)
+        self.serial_status = dict(connected=False, port=port, baud_rate=baud_rate, protocol="text")
         self.ser = self.restart_serial(port, baud_rate)
 
         # Clear any leftover data
@@ -135,7 +463,7 @@ class Pillar():
             self.ser.flushInput()
             self.ser.flushOutput()
         except Exception as e:
-            print(f"[WARNING] Failed to flush serial buffers: {e}")
+            log.warning("Failed to flush serial buffers: %s", e)
 
         atexit.register(self.cleanup)
 
@@ -143,7 +471,7 @@ class Pillar():
     def restart_serial(self, port, baud_rate=None):
         if self.ser:
             # Signal threads to terminate
-            self.write_queue.put("kill")
+            self.write_scheduler.stop()
             self.kill_read_thread.set()
             
             # Wait for threads to terminate before cleanup
@@ -155,6 +483,7 @@ class Pillar():
 
         self.serial_status["port"] = port
         self.serial_status["baud_rate"] = baud_rate
+        self.serial_status["protocol"] = "text"
 
         try:
             self.ser = serial.Serial(port, baud_rate)
@@ -174,52 +503,72 @@ class Pillar():
         self.kill_read_thread = threading.Event()
         
         # Start the read thread
-        self.serial_thread = threading.Thread(target=read_serial_data, args=(self.ser, self.cap_queue, self.light_queue, self.kill_read_thread))
+        self.serial_thread = threading.Thread(target=read_serial_data, args=(self.ser, self.touch_event, self.light_queue, self.kill_read_thread, self.serial_status))
         self.serial_thread.daemon = True
         self.serial_thread.start()
 
         # Start the write thread
-        self.serial_write_thread = threading.Thread(target=write_serial_data, args=(self.ser, self.write_queue))
+        self.write_scheduler = SerialWriteScheduler(baud_rate)
+        self.serial_write_thread = threading.Thread(target=write_serial_data, args=(self.ser, self.write_scheduler))
         self.serial_write_thread.daemon = True
         self.serial_write_thread.start()
 
-        print(f"[INFO] Restarted Serial Connection to {port}, {baud_rate}")
+        # Ask the firmware to switch to binary frames, the read thread switches on the ack
+        if self.serial_protocol == "binary":
+            self.write_scheduler.put(PROTO_BINARY_REQUEST)
+
+        log.info("Restarted Serial Connection to %s, %s", port, baud_rate)
         return self.ser
 
     def cleanup(self):
-        print(f"[INFO] Cleaning up and closing the serial connection for pillar {self.id}")
+        log.info("Cleaning up and closing the serial connection for pillar %s", self.id)
         try:
             if self.ser and self.ser.is_open:
                 self.ser.close()
         except Exception as e:
-            print(f"[ERROR] Error during cleanup: {e}")
+            log.error("Error during cleanup: %s", e)
 
     def to_dict(self):
-        with self.status_lock:
-            return dict(
-                id=self.id, 
-                num_tubes=self.num_tubes, 
-                num_sensors=self.num_touch_sensors,
-                touch_status=self.touch_status.copy(), 
-                light_status=self.light_status.copy(), 
-                serial_status=self.serial_status.copy()
-            )
+        return dict(
+            id=self.id, 
+            num_tubes=self.num_tubes, 
+            num_sensors=self.num_touch_sensors,
+            touch_status=list(self.touch_snapshot.status), 
+            light_status=list(self.light_snapshot.status), 
+            serial_status=self.serial_status.copy(),
+            write_stats=self.get_write_stats()
+        )
+
+    @property
+    def touch_snapshot(self):
+        """Current TouchSnapshot(version, mask, status, rx_time), safe to read from any thread"""
+        return self.touch_event.snapshot
+
+    @property
+    def touch_status(self):
+        return self.touch_event.snapshot.status
+
+    @property
+    def light_status(self):
+        return self.light_snapshot.status
 
     def get_touch_status(self, tube_id):
-        with self.status_lock:
-            return self.touch_status[tube_id]
+        return self.touch_event.snapshot.status[tube_id]
 
     def get_all_touch_status(self):
-        with self.status_lock:
-            return self.touch_status.copy()
+        return list(self.touch_event.snapshot.status)
 
     def get_light_status(self, tube_id):
-        with self.status_lock:
-            return self.light_status[tube_id]
+        return self.light_snapshot.status[tube_id]
 
     def get_all_light_status(self):
-        with self.status_lock:
-            return self.light_status.copy()
+        return list(self.light_snapshot.status)
+
+    def get_write_stats(self):
+        """Queue depth, sent, coalesced and dropped counters for the serial writer"""
+        if self.write_scheduler is None:
+            return {}
+        return self.write_scheduler.stats()
 
     def send_light_change(self, tube_id, hue, brightness):
         """Sends a LED message to change the hue and brightness of an individual tube
@@ -232,10 +581,9 @@ class Pillar():
         This sends a LED,{tube_id},{hue},{brightness}; message to the serial port
         for a connected arduino to deal with.
 
-        *HOWEVER* note that this message cannot be sent in quick succession without
-        delays in between sends. The serial/message read seems to struggle to pick
-        out all of the individual messages. In a case where you need to send all please
-        use the `send_all_light_change` function.
+        Sends are paced by the write scheduler and only the latest pending
+        message per tube is kept, so this can be called in quick succession. In a
+        case where you need to send all please use the `send_all_light_change` function.
 
         """
         assert tube_id < self.num_tubes
@@ -243,7 +591,7 @@ class Pillar():
         assert 0 <= brightness <= 255
         message = f"LED,{tube_id},{hue},{brightness};\n\r"
         #print("Pushing to queue", message)
-        self.write_queue.put(message)
+        self.write_scheduler.put(message)
 
     def send_all_light_change(self, lights):
         """Send all the lights in one go
@@ -260,73 +608,70 @@ class Pillar():
             light_list.extend([str(hue), str(bright), str(0)])
         message = f"ALLLED,{','.join(light_list)};"
         # print(f'Message being sent: {message}')
-        
-        # FIXED: Don't use empty() - it only checks if empty, doesn't clear the queue
-        # Instead, use a new approach that's thread-safe
-        try:
-            # Clear pending light changes by emptying the queue
-            while not self.write_queue.empty():
-                try:
-                    self.write_queue.get_nowait()
-                except queue.Empty:
-                    break
-        except Exception as e:
-            print(f"[ERROR] Error clearing write queue: {e}")
-            
-        # Now put the new message
-        self.write_queue.put(message)
+
+        # The scheduler replaces any pending ALLLED/LED state with this message,
+        # control messages such as GETLED stay queued
+        self.write_scheduler.put(message)
+
+    def wait_for_touch(self, timeout=None):
+        """Block until the read thread reports a touch edge or the timeout expires
+
+        Args:
+            timeout (float): Maximum time to wait in seconds, None waits forever
+
+        Returns:
+            bool: True if woken by a touch edge, False on timeout
+        """
+        triggered = self.touch_event.wait(timeout)
+        # Clear before the caller reads the snapshot so a later edge is never missed
+        self.touch_event.clear()
+        return triggered
+
+    def pop_touch_trace(self):
+        """Return the checkpoint times of the latest touch change once, or None"""
+        trace, self.touch_trace = self.touch_trace, None
+        return trace
 
     def set_touch_status(self, touch_status):
-        # Thread-safe update of touch status
-        with self.status_lock:
-            self.touch_status = touch_status.copy()  # Make a copy to avoid reference issues
-            # print(f"UPDATING TOUCH STATUS to: {touch_status}")
+        self.touch_event.publish(touch_mask(touch_status))
 
     def set_touch_status_tube(self, tube_id, status):
-        with self.status_lock:
-            self.touch_status[tube_id] = bool(status)  # Ensure it's a boolean
+        bit = 1 << tube_id
+        self.touch_event.update(lambda mask: mask | bit if status else mask & ~bit)
 
     def reset_touch_status(self):
-        with self.status_lock:
-            # FIXED: Use False instead of 0 for consistency
-            self.touch_status = [False for _ in range(self.num_touch_sensors)]
+        self.touch_event.publish(0)
+
+    def set_light_status(self, updates):
+        """Publish a new light snapshot with {tube_id: (hue, brightness, effect)} applied"""
+        with self.light_publish_lock:
+            current = self.light_snapshot
+            status = list(current.status)
+            for tube_id, value in updates.items():
+                status[tube_id] = value
+            status = tuple(status)
+            if status != current.status:
+                self.light_snapshot = LightSnapshot(current.version + 1, status)
 
     def read_from_serial(self):
-        # Handle touch sensor data
+        # Handle touch sensor data, the read thread has already published it
         try:
-            while not self.cap_queue.empty():
-                received_status = self.cap_queue.get_nowait()
-                
-                # Ensure received_status has the correct length
-                if len(received_status) != self.num_touch_sensors:
-                    print(f"[WARNING] Received touch status has {len(received_status)} sensors, expected {self.num_touch_sensors}")
-                    # Pad with False if too short
-                    if len(received_status) < self.num_touch_sensors:
-                        received_status.extend([False] * (self.num_touch_sensors - len(received_status)))
-                    # Truncate if too long
-                    if len(received_status) > self.num_touch_sensors:
-                        received_status = received_status[:self.num_touch_sensors]
-                
-                # Get a thread-safe copy of the previous status
-                with self.status_lock:
-                    previous_status = self.previous_received_status.copy() if self.previous_received_status else []
-                
-                # Only update and print if status changed
-                if received_status != previous_status:
-                    print(f"[TOUCH] Processing touch status: {received_status}")
-                    self.set_touch_status(received_status)
-                    # Thread-safe update of previous status
-                    with self.status_lock:
-                        self.previous_received_status = received_status.copy()
-                    # Handle end of touch event
-                    self.handle_end_of_touch(received_status)
-        except queue.Empty:
-            pass
+            snapshot = self.touch_event.snapshot
+            # Only update and print if status changed
+            if snapshot.version != self.touch_version_seen:
+                self.touch_version_seen = snapshot.version
+                self.touch_trace = dict(dequeued=time.perf_counter())
+                if snapshot.rx_time is not None:
+                    self.touch_trace["rx"] = snapshot.rx_time
+                log.debug("Processing touch status: %s", snapshot.status)
+                # Handle end of touch event
+                self.handle_end_of_touch(snapshot.status)
         except Exception as e:
-            print(f"[ERROR] Error processing touch data: {e}")
+            log.error("Error processing touch data: %s", e)
 
-        # Handle LED status data
+        # Handle LED status data, published once for everything queued
         try:
+            updates = {}
             while not self.light_queue.empty():
                 led_data = self.light_queue.get_nowait()
                 
@@ -335,17 +680,17 @@ class Pillar():
                 
                 # Validate tube_id is in range
                 if 0 <= tube_id < self.num_tubes:
-                    # Thread-safe update of light status
-                    with self.status_lock:
-                        # Store as (hue, brightness, effect) - THIS IS THE IMPORTANT FORMAT
-                        self.light_status[tube_id] = (hue, brightness, 0)
-                    print(f"[LED] Updated light status for tube {tube_id}: hue={hue}, brightness={brightness}")
+                    # Store as (hue, brightness, effect) - THIS IS THE IMPORTANT FORMAT
+                    updates[tube_id] = (hue, brightness, 0)
+                    log.debug("Updated light status for tube %d: hue=%d, brightness=%d", tube_id, hue, brightness)
                 else:
-                    print(f"[WARNING] LED tube_id {tube_id} out of range (0-{self.num_tubes-1})")
+                    log.warning("LED tube_id %s out of range (0-%d)", tube_id, self.num_tubes - 1)
         except queue.Empty:
             pass
         except Exception as e:
-            print(f"[ERROR] Error processing light queue: {e}")
+            log.error("Error processing light queue: %s", e)
+        if updates:
+            self.set_light_status(updates)
 
     def handle_end_of_touch(self, received_status):
         if all(not status for status in received_status):  # All touch sensors are inactive - Boolean check
@@ -355,7 +700,7 @@ class Pillar():
 
     def notify_frontend_touch_reset(self):
         reset_message = json.dumps({"type": "touch_reset", "pillar_id": self.id})
-        print(f"[INFO] Touch reset for pillar {self.id}")
+        log.info("Touch reset for pillar %s", self.id)
         # Placeholder for actual WebSocket sending logic
         # send_to_all_clients(reset_message)  # You need to implement this based on your WebSocket setup
         
@@ -364,13 +709,12 @@ class Pillar():
         """Send a command to the Teensy to request current LED status for all tubes."""
         try:
             message = "GETLED;\n\r"
-            print(f"[DEBUG] Requesting LED status from Teensy: {message.strip()}")
-            self.write_queue.put(message)
-            # Short sleep to avoid overwhelming the serial buffer
-            time.sleep(0.1)
+            log.debug("Requesting LED status from Teensy: %s", message.strip())
+            # Pacing is handled by the write scheduler, no need to sleep here
+            self.write_scheduler.put(message)
             return True
         except Exception as e:
-            print(f"[ERROR] Failed to request LED status: {e}")
+            log.error("Failed to request LED status: %s", e)
             return False
 
     def process_serial_data(self, line):
@@ -379,26 +723,26 @@ class Pillar():
             # Process touch data
             if line.startswith("CAP"):
                 parts = line.split(",")
-                if len(parts) >= 7:  # "CAP" + 6 values
-                    touch_status = [bool(int(parts[i])) for i in range(1, 7)]
-                    with self.status_lock:
-                        self.touch_status = touch_status
+                if len(parts) > self.num_touch_sensors:  # "CAP" + one value per sensor
+                    touch_status = [bool(int(parts[i])) for i in range(1, self.num_touch_sensors + 1)]
+                    self.set_touch_status(touch_status)
             
             # Process LED data - NEW FORMAT: LED,hue1,hue2,hue3,hue4,hue5,hue6
             elif line.startswith("LED"):
                 parts = line.split(",")
                 if len(parts) >= 7:  # "LED" + 6 hue values
+                    updates = {}
                     for i in range(6):
                         try:
                             hue = int(parts[i+1])
                             # Fixed brightness
                             brightness = 255
                             effect = 0
-                            with self.status_lock:
-                                self.light_status[i] = (hue, brightness, effect)
+                            updates[i] = (hue, brightness, effect)
                         except ValueError:
-                            print(f"[ERROR] Error parsing LED value for tube {i}")
+                            log.error("Error parsing LED value for tube %d", i)
+                    self.set_light_status(updates)
         
         except Exception as e:
-            print(f"[ERROR] Error processing serial data: {e}")
+            log.error("Error processing serial data: %s", e)
         
\ No newline at end of file
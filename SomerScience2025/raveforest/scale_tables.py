@@ -0,0 +1,89 @@
+import itertools
+import random
+
+import numpy as np
+
+from interfaces import SCALE_TYPES
+
+MAX_CHORD_LEVEL = 2  # fork_harmony clamps chord_levels to this
+DEGREE_RANGE = 24  # Melody degrees -24..24 are tabulated, others fall back to the Scale object
+
+# Scales are built on this pitch and stored as offsets from it
+REFERENCE_KEY = 60
+
+
+def chord_offsets(scale_offsets, chord_level):
+    """Stacked thirds plus 7/9/11 etc for chord_level, wrapping up an octave past the scale"""
+    scale_length = len(scale_offsets)
+    chord = []
+    for offset in [0, 2, 4] + [6 + 2 * chord_level * i for i in range(chord_level)]:
+        if offset >= scale_length:
+            chord.append(scale_offsets[offset % scale_length] + (offset // scale_length) * 12)
+        else:
+            chord.append(scale_offsets[offset])
+    return chord
+
+
+def chord_voicings(chord):
+    """Every shuffle of chord with the notes from the tonic onwards raised an octave
+
+    The tonic is offset 0. Row i is one voicing, so picking a random row is
+    the same as the shuffle-then-raise fork_harmony used to do every bar.
+    """
+    voicings = []
+    for order in itertools.permutations(chord):
+        voicing = list(order)
+        for i in range(voicing.index(0), len(voicing)):
+            voicing[i] += 12
+        voicings.append(voicing)
+    return np.array(voicings, dtype=np.int_)
+
+
+class ScaleTables():
+    """Scale, degree and chord tables for every scale in SCALE_TYPES, built once at startup
+
+    Everything is stored as semitone offsets from the key, which is the same
+    for all 12 keys, so a lookup is an index plus `key +`. Harmony picks a row
+    from the precomputed voicings instead of building a Scale, shuffling and
+    searching a list each bar.
+    """
+
+    def __init__(self, scale_types=SCALE_TYPES, max_chord_level=MAX_CHORD_LEVEL, degree_range=DEGREE_RANGE):
+        self.scale_types = scale_types
+        self.max_chord_level = max_chord_level
+        self.degree_range = degree_range
+        self.scale_offsets = {}  # name -> one octave of the scale, octave included
+        self.degree_offsets = {}  # name -> offsets of degrees -degree_range..degree_range
+        self.voicings = {}  # (name, chord_level) -> (n_voicings, n_notes) offsets
+
+        for name, scale_type in scale_types.items():
+            try:
+                scale = scale_type(REFERENCE_KEY)
+                offsets = [int(round(pitch - REFERENCE_KEY)) for pitch in scale]
+                self.scale_offsets[name] = np.array(offsets, dtype=np.int_)
+                self.degree_offsets[name] = np.array(
+                    [scale.degree_to_pitch(degree) - REFERENCE_KEY for degree in range(-degree_range, degree_range + 1)],
+                    dtype=np.float64)
+                for level in range(max_chord_level + 1):
+                    self.voicings[(name, level)] = chord_voicings(chord_offsets(offsets, level))
+            except Exception as e:
+                print(f"[ERROR] Failed to build scale tables for {name}: {e}")
+
+    def scale_pitches(self, name, key):
+        """Pitches of one octave of the scale starting on key"""
+        return key + self.scale_offsets[name]
+
+    def degree_to_pitch(self, name, key, degree):
+        index = degree + self.degree_range
+        if isinstance(degree, int) and 0 <= index < len(self.degree_offsets[name]):
+            return key + float(self.degree_offsets[name][index])
+        return self.scale_types[name](key).degree_to_pitch(degree)
+
+    def random_chord(self, name, key, chord_level, rng=random):
+        """A random voicing of the chord for chord_level (clamped to the table) on key"""
+        level = min(max(int(chord_level), 0), self.max_chord_level)
+        voicings = self.voicings[(name, level)]
+        return key + voicings[rng.randrange(len(voicings))]
+
+
+SCALE_TABLES = ScaleTables()
@@ -0,0 +1,160 @@
+import logging
+import multiprocessing as mp
+import threading
+
+log = logging.getLogger("raveforest.sound")
+
+SHARED_STATE_BACKENDS = ("local", "shared_memory")
+
+
+class SharedValue():
+    """One field of SharedState, read with .value and changed atomically
+
+    Reads are a plain attribute load, writes and read-modify-writes (add,
+    update) hold a per-field lock so concurrent SCAMP forks can not lose an
+    update. Callbacks registered with subscribe() are called as
+    callback(name, old, new) after the lock is released, only when the
+    value actually changed.
+    """
+
+    def __init__(self, name, initial):
+        self.name = name
+        self._value = initial
+        self.lock = threading.Lock()
+        self.callbacks = []
+
+    @property
+    def value(self):
+        return self._value
+
+    @value.setter
+    def value(self, value):
+        self.set(value)
+
+    def _load(self):
+        return self._value
+
+    def _store(self, value):
+        self._value = value
+
+    def set(self, value):
+        return self.update(lambda _: value)
+
+    def update(self, function):
+        """Atomically replace the value with function(value), returns the new value"""
+        with self.lock:
+            old = self._load()
+            new = function(old)
+            changed = new != old
+            if changed:
+                self._store(new)
+        if changed and self.callbacks:
+            self._notify(old, new)
+        return new
+
+    def add(self, delta, minimum=None, maximum=None):
+        """Atomic += clamped to [minimum, maximum], returns the new value"""
+        def step(value):
+            value += delta
+            if maximum is not None and value > maximum:
+                value = maximum
+            if minimum is not None and value < minimum:
+                value = minimum
+            return value
+        return self.update(step)
+
+    def subscribe(self, callback):
+        self.callbacks.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self.callbacks:
+            self.callbacks.remove(callback)
+
+    def _notify(self, old, new):
+        for callback in list(self.callbacks):
+            try:
+                callback(self.name, old, new)
+            except Exception as e:
+                log.error("Shared state callback for %s failed: %s", self.name, e)
+
+
+class SharedMemoryValue(SharedValue):
+    """SharedValue kept in a multiprocessing shared memory ctypes value
+
+    Only needed when the state really has to cross a fork() into another
+    process. There is no server process, reads and writes go straight to the
+    shared page under its process-shared lock. Callbacks only fire in the
+    process that made the change.
+    """
+
+    def __init__(self, name, initial, typecode):
+        super().__init__(name, initial)
+        self.raw = mp.Value(typecode, initial)
+        self.lock = self.raw.get_lock()
+
+    @property
+    def value(self):
+        return self.raw.value
+
+    @value.setter
+    def value(self, value):
+        self.set(value)
+
+    def _load(self):
+        return self.raw.value
+
+    def _store(self, value):
+        self.raw.value = value
+
+
+def _typecode(value):
+    if isinstance(value, bool):
+        return "b"
+    if isinstance(value, int):
+        return "q"
+    if isinstance(value, float):
+        return "d"
+    raise ValueError(f"Shared memory backend only holds numbers, got {type(value).__name__}")
+
+
+class SharedState():
+    """Named SharedValues shared by the Composer and its forks
+
+    Replaces an mp.Manager() dict of proxies: the forks are SCAMP threads in
+    the same process so the default "local" backend is plain Python objects
+    with a lock per field, reads cost an attribute load instead of an IPC
+    round-trip. backend="shared_memory" keeps numeric fields in shared memory
+    for code that forks real processes.
+
+    Indexing keeps the old interface, shared_state["key"].value.
+    """
+
+    def __init__(self, fields, backend="local"):
+        if backend not in SHARED_STATE_BACKENDS:
+            raise ValueError(f"Unknown shared state backend {backend!r}, expected one of {SHARED_STATE_BACKENDS}")
+        self.backend = backend
+        self.values = {}
+        for name, initial in fields.items():
+            if backend == "shared_memory":
+                self.values[name] = SharedMemoryValue(name, initial, _typecode(initial))
+            else:
+                self.values[name] = SharedValue(name, initial)
+
+    def __getitem__(self, name):
+        return self.values[name]
+
+    def __contains__(self, name):
+        return name in self.values
+
+    def keys(self):
+        return self.values.keys()
+
+    def subscribe(self, name, callback):
+        self.values[name].subscribe(callback)
+
+    def unsubscribe(self, name, callback):
+        self.values[name].unsubscribe(callback)
+
+    def snapshot(self):
+        """Plain dict of the current values"""
+        return {name: shared.value for name, shared in self.values.items()}
@@ -2,16 +2,18 @@ from scamp import Session, wait, current_clock
 import scamp_extensions.process as seprocess
 import expenvelope as expe
  
-import multiprocessing as mp
 from queue import Queue
 import random
 import numpy as np
 import copy
+from collections import OrderedDict
+import functools
 import time
 import threading
 import json
 import os
 import traceback
+import logging
 
 try:
     import psutil
@@ -30,11 +32,171 @@ except ImportError:
     HAS_SCAMP = False
 
 from interfaces import *
+from note_expiry import NoteExpiryScheduler
+from shared_state import SharedState
+from lookahead_scheduler import LookaheadScheduler
+from voice_allocator import VoiceAllocator
+from headless import HeadlessSession
+from latency_stats import StartupTimer
+from scale_tables import SCALE_TABLES
+
+log = logging.getLogger("raveforest.sound")
+
+# SCAMP reserves fluidsynth channels for a new part by reading and then
+# incrementing the shared soundfont host's used_channels without a lock, so
+# parts are only ever created one at a time, across every session and pool
+PART_CREATION_LOCK = threading.Lock()
+
+def new_part(session, name):
+    with PART_CREATION_LOCK:
+        return session.new_part(name)
+
+class InstrumentPool:
+    """LRU cache of SCAMP parts keyed by instrument name
+
+    Creating a part loads its soundfont preset, which is slow enough to be
+    heard if it happens on a touch. The pool creates parts ahead of time
+    (prewarm) and hands out the cached part afterwards, so swapping an
+    instrument is a dictionary lookup. At most `capacity` parts are kept,
+    the least recently used unpinned part is evicted when a new one is
+    needed. Parts in use by an InstrumentManager are pinned.
+
+    The real limit is fluidsynth's channels: SCAMP never gives channels back,
+    even when a part is removed from the session, and every part takes 8 of
+    the synth's 256. So an evicted part is kept as a spare and the next miss
+    switches its channels to the new preset instead of creating a part. The
+    pool therefore never holds more than capacity + overflow parts' worth of
+    channels (16 parts plus the direct instrument use 136 of the 256).
+
+    prewarm() creates parts one after the other, optionally on a background
+    thread. Parts can not be created in parallel (see PART_CREATION_LOCK),
+    and the preset lookup is pure Python so threads would not help anyway.
+    """
+
+    def __init__(self, session, capacity=16):
+        self.session = session
+        self.capacity = capacity  # None keeps every part ever created
+        self.parts = OrderedDict()  # name -> part, least recently used first
+        self.pinned = {}  # name -> pin count
+        self.loading = set()  # names being created by prewarm outside the lock
+        self.spares = []  # evicted parts whose channels are reused by the next miss
+        self.lock = threading.RLock()
+        self.prewarm_thread = None
+
+    def __contains__(self, name):
+        return name in self.parts
+
+    def __len__(self):
+        return len(self.parts)
+
+    def get(self, name):
+        """Return the part for name, creating it (and evicting) on a miss"""
+        with self.lock:
+            part = self.parts.get(name)
+            if part is not None:
+                self.parts.move_to_end(name)
+                return part
+            self._evict_locked(room=1)
+            part = self._reuse_spare_locked(name)
+            if part is None:
+                part = new_part(self.session, name)
+                log.debug("Instrument pool created part: %s", name)
+            self.parts[name] = part
+            return part
+
+    def pin(self, name):
+        with self.lock:
+            self.pinned[name] = self.pinned.get(name, 0) + 1
+
+    def unpin(self, name):
+        with self.lock:
+            count = self.pinned.get(name, 0) - 1
+            if count > 0:
+                self.pinned[name] = count
+            else:
+                self.pinned.pop(name, None)
+            self._evict_locked()
+
+    def _evict_locked(self, room=0):
+        """Move least recently used unpinned parts to the spares until `room` more fit"""
+        if self.capacity is None:
+            return
+        while len(self.parts) + room > self.capacity:
+            victim = next((name for name in self.parts if name not in self.pinned), None)
+            if victim is None:
+                return  # Everything is in use, allow the pool to overflow
+            self.spares.append(self.parts.pop(victim))
+            log.debug("Instrument pool evicted part: %s", victim)
+
+    def _reuse_spare_locked(self, name):
+        """Switch a spare part's channels to the preset for name, None if there is no spare"""
+        while self.spares:
+            part = self.spares.pop()
+            try:
+                part.end_all_notes()
+                with PART_CREATION_LOCK:
+                    for playback in part.playback_implementations:
+                        if hasattr(playback, "soundfont_instrument"):
+                            preset = self.session._resolve_preset_from_name(name, playback.soundfont)
+                            playback.soundfont_instrument.set_to_preset(*preset)
+                            playback.bank_and_preset = playback.soundfont_instrument.bank_and_preset = preset
+            except Exception as e:
+                log.warning("Could not switch a spare part to %s: %s", name, e)
+                continue
+            part.name = name
+            log.debug("Instrument pool reused a spare part for: %s", name)
+            return part
+        return None
+
+    def _load(self, name):
+        """Create the part for name without holding the lock, returns True if it was added"""
+        with self.lock:
+            if name in self.parts or name in self.loading:
+                return False
+            if self.capacity is not None and len(self.parts) + len(self.loading) >= self.capacity:
+                return False
+            self.loading.add(name)
+        try:
+            part = new_part(self.session, name)
+        except Exception as e:
+            log.warning("Failed to pre-load instrument %s: %s", name, e)
+            with self.lock:
+                self.loading.discard(name)
+            return False
+        with self.lock:
+            self.loading.discard(name)
+            if name in self.parts:
+                # get() created it while we were loading, keep that one and its channels for later
+                self.spares.append(part)
+                return False
+            self.parts[name] = part
+        return True
+
+    def prewarm(self, names, background=True):
+        """Create parts for names up to capacity without evicting anything
+
+        Args:
+            names: Instrument names in priority order
+            background (bool): Run in a daemon thread so startup is not delayed
+        """
+        def _prewarm():
+            started = time.time()
+            created = sum(self._load(name) for name in names)
+            log.info("Instrument pool pre-loaded %d parts in %.2fs", created, time.time() - started)
+
+        if not background:
+            _prewarm()
+            return None
+        self.prewarm_thread = threading.Thread(target=_prewarm, name="instrument-prewarm", daemon=True)
+        self.prewarm_thread.start()
+        return self.prewarm_thread
 
 class InstrumentManager:
 
-    def __init__(self, session):
+    def __init__(self, session, pool=None):
         self.session = session
+        # Parts come from a shared pool so swapping instruments never loads a preset
+        self.pool = pool if pool is not None else InstrumentPool(session, capacity=None)
 
         self.instrument_names= {
             "melody": None,
@@ -49,28 +211,25 @@ class InstrumentManager:
         }
 
     def update_instrument(self, instrument_name, function="melody"):
-        print(f"[DEBUG] Sound Manager updating {function} instrument to {instrument_name}")
+        log.debug("Sound Manager updating %s instrument to %s", function, instrument_name)
         if self.instrument_names[function] == instrument_name:
             return
         
-        if self.instrument_names[function] is not None:
-            try:
-                # Remove Existing Instrument
-                current_instruments = [i.name for i in self.session.instruments]
-                idx = list(current_instruments).index(self.instrument_names[function])
-                self.session.pop_instrument(idx)
-                print(f"[DEBUG] Previous instrument removed: {self.instrument_names[function]}")
-            except Exception as e:
-                print(f"[WARNING] Could not remove previous instrument: {e}")
-        
+        previous_name = self.instrument_names[function]
         try:    
-            self.instruments[function] = self.session.new_part(instrument_name)
+            self.pool.pin(instrument_name)
+            self.instruments[function] = self.pool.get(instrument_name)
             self.instrument_names[function] = instrument_name
-            print(f"[DEBUG] New instrument added: {self.instrument_names[function]}")
+            log.debug("New instrument selected: %s", instrument_name)
         except Exception as e:
             print(f"[ERROR] Failed to add new instrument {instrument_name}: {e}")
+            self.pool.unpin(instrument_name)
             self.instruments[function] = None
             self.instrument_names[function] = None
+        
+        # The previous part stays cached in the pool until it is evicted
+        if previous_name is not None:
+            self.pool.unpin(previous_name)
 
     def melody_instrument(self):
         return self.instruments["melody"]
@@ -83,15 +242,14 @@ class InstrumentManager:
 
 class Composer:
 
-    def __init__(self, session, initial_state):
+    def __init__(self, session, initial_state, expiry_scheduler=None, instrument_pool=None, shared_state_backend="local",
+                 lookahead_scheduler=None, voice_allocator=None):
         self.session = session
 
         self.state = copy.deepcopy(initial_state)
 
-        self.mp_manager = mp.Manager()
-
         # Instruments
-        self.instrument_manager = InstrumentManager(self.session)
+        self.instrument_manager = InstrumentManager(self.session, instrument_pool)
         self.update_instruments(self.state["instruments"])
 
         # Note pitch-wise "60" = Middle C
@@ -100,10 +258,12 @@ class Composer:
         self.key_generator = self.generate_key_generator()
         self.melody_generator = self.generate_melody_generator(next(self.key_generator))
 
-        self.shared_state = {
-            "key": self.mp_manager.Value('s', next(self.key_generator)),
-            "chord_levels": self.mp_manager.Value('d', 0)
-        }
+        # The forks are SCAMP threads in this process, so no manager process is needed
+        self.shared_state = SharedState({
+            "key": next(self.key_generator),
+            "chord_levels": 0
+        }, backend=shared_state_backend)
+        self.shared_state.subscribe("key", self.on_shared_state_change)
 
         self.active_forks = {
             "melody": None,
@@ -111,43 +271,36 @@ class Composer:
             "background": None
         }
         
-        # Track active reaction notes for debugging and max duration control
-        self.active_reaction_notes = {}  # {note_id: {"note": note, "start_time": timestamp}}
-        self.max_note_duration = 3.0  # Maximum duration in seconds for reaction notes
+        # When given, harmony and background are rendered ahead and played by its
+        # thread instead of running as blocking SCAMP forks
+        self.lookahead_scheduler = lookahead_scheduler
+        self.active_voices = set()
+        
+        # Notes are terminated by deadline rather than by polling, the SoundManager
+        # shares its scheduler (already started unless headless), standalone we run our own thread
+        if expiry_scheduler is None:
+            expiry_scheduler = NoteExpiryScheduler("composer-note-expiry")
+            expiry_scheduler.start()
+        self.expiry_scheduler = expiry_scheduler
         
-        # Create a thread to monitor and terminate long-running notes
-        self.note_monitor_thread = threading.Thread(target=self.monitor_active_notes, daemon=True)
-        self.note_monitor_thread.start()
+        # Reaction notes are played in pooled voices rather than one fork per note,
+        # the SoundManager shares its allocator so touches and reactions share the polyphony
+        if voice_allocator is None:
+            voice_allocator = VoiceAllocator(self.expiry_scheduler, beat_seconds=lambda: 60.0 / self.session.tempo)
+        self.voice_allocator = voice_allocator
+        self.reaction_voices = []  # Tokens of the reaction notes started by the last update
         
         print("[DEBUG] Composer initialized with instruments:", self.state["instruments"])
 
-    def monitor_active_notes(self):
-        """Thread function to monitor active notes and terminate those that exceed max duration"""
-        while True:
-            current_time = time.time()
-            notes_to_remove = []
-            
-            # Check all active notes
-            for note_id, note_info in self.active_reaction_notes.items():
-                if current_time - note_info["start_time"] > self.max_note_duration:
-                    # Note has exceeded max duration, mark for removal
-                    notes_to_remove.append(note_id)
-                    print(f"[DEBUG] Terminating long-running note {note_info['note']} (exceeded {self.max_note_duration}s)")
-            
-            # Remove expired notes
-            for note_id in notes_to_remove:
-                del self.active_reaction_notes[note_id]
-            
-            # Sleep to avoid excessive CPU usage
-            time.sleep(0.5)
+    def on_shared_state_change(self, name, old, new):
+        log.debug("Shared %s changed %s -> %s", name, old, new)
 
     def update(self, setting_name, value):
-        print(f"[DEBUG] Updating {setting_name} with value: {value}")
+        log.debug("Updating %s with value: %s", setting_name, value)
 
         if self.state[setting_name] != value:
             # Interaction
-            if self.shared_state["chord_levels"].value < 4:
-                self.shared_state["chord_levels"].value += 1
+            self.shared_state["chord_levels"].add(1, maximum=4)
 
             value = copy.deepcopy(value)
             # The copy is important here
@@ -159,34 +312,24 @@ class Composer:
             if setting_name == "key":
                 self.update_key(value)
             if setting_name == "bpm":
-                print(f"[DEBUG] Setting tempo target to {value}")
+                log.debug("Setting tempo target to %s", value)
                 self.session.set_tempo_target(value, 0.2)
             if setting_name == "reaction_notes":
-                # Clear previous reaction note forks
-                for note_id in list(self.active_reaction_notes.keys()):
-                    print(f"[DEBUG] Clearing previous note: {self.active_reaction_notes[note_id]['note']}")
-                    del self.active_reaction_notes[note_id]
+                # End the previous reaction notes
+                self.clear_active_notes()
                 
-                # Start new note forks
-                for i, note in enumerate(value):
-                    print(f"[DEBUG] Playing reaction note: {note}")
-                    note_id = f"note_{time.time()}_{i}"
-                    self.active_reaction_notes[note_id] = {
-                        "note": note,
-                        "start_time": time.time()
-                    }
-                    self.session.fork(self.fork_melody_single_note, args=(note, note_id))
+                # Start the new ones in pooled voices
+                self.play_reaction_notes(value)
             
     def update_instruments(self, instruments):
         for k,v in instruments.items():
             self.instrument_manager.update_instrument(v, function=k)
 
     def update_key(self, key):
-        print(f"[DEBUG] Updating key to {key}")
-        self.shared_state["key"].value = key
+        self.shared_state["key"].set(key)
 
     def update_chord_leve(self, level):
-        self.shared_state["chord_levels"].value += level
+        self.shared_state["chord_levels"].add(level)
 
     def generate_key_generator(self):
         # return seprocess.generators.random_walk(self.all_keys[0], clamp_min=min(self.all_keys), clamp_max=max(self.all_keys))
@@ -194,65 +337,63 @@ class Composer:
         return seprocess.generators.non_repeating_shuffle(list(circle_fifths))
     
     def generate_melody_generator(self, key):
-        notes = SCALE_TYPES[self.state["melody_scale"]](key)
-        return seprocess.generators.non_repeating_shuffle(list(notes))
+        notes = SCALE_TABLES.scale_pitches(self.state["melody_scale"], key)
+        return seprocess.generators.non_repeating_shuffle(notes.tolist())
 
     def play(self):
+        if self.lookahead_scheduler is not None:
+            self.start_voice("harmony", self.harmony_events)
+            self.start_voice("background", self.background_events)
+            return
         # self.start_fork("melody", self.fork_melody)
         self.start_fork("harmony", self.fork_harmony)
         self.start_fork("background", self.fork_background)
         
     def clear_active_notes(self):
-        """Clear all active reaction notes"""
-        print(f"[DEBUG] Clearing all active notes. Count: {len(self.active_reaction_notes)}")
-        self.active_reaction_notes.clear()
+        """End the reaction notes started by the last update"""
+        log.debug("Clearing all active notes. Count: %s", len(self.reaction_voices))
+        for token in self.reaction_voices:
+            self.voice_allocator.release(token)
+        self.reaction_voices = []
         
+    def start_voice(self, voice_name, events):
+        # The scheduler outlives composers, so a new composer replaces the voice once
+        if voice_name not in self.active_voices or not self.lookahead_scheduler.has_voice(voice_name):
+            log.debug("Starting lookahead voice: %s", voice_name)
+            self.lookahead_scheduler.add_voice(voice_name, events(self.shared_state))
+            self.active_voices.add(voice_name)
+
     def start_fork(self, function_name, function):
         # If a fork is active or not alive, then start the new fork
         if self.active_forks[function_name] is None or not self.active_forks[function_name].alive:
-            print(f"[DEBUG] Starting fork: {function_name}")
+            log.debug("Starting fork: %s", function_name)
             self.active_forks[function_name] = self.session.fork(function, args=(self.shared_state,))
     
-    def fork_melody_single_note(self, note, note_id=None):
+    def play_reaction_notes(self, notes):
+        """Start reaction notes in pooled voices, no fork or thread per note"""
         volume = self.state["volume"]["melody"]
         
         # Skip if melody volume is 0
         if volume == 0:
-            print(f"[DEBUG] Skipping note {note} - melody volume is 0")
+            log.debug("Skipping notes %s - melody volume is 0", notes)
             return
         
-        # Cache the instrument for faster access
-        if not hasattr(self, '_melody_instrument_cache'):
-            self._melody_instrument_cache = self.instrument_manager.melody_instrument()
-            if self._melody_instrument_cache is None:
-                print("[DEBUG] Initializing melody instrument because it doesn't exist")
-                self.instrument_manager.update_instrument(self.state["instruments"]["melody"], function="melody")
-                self._melody_instrument_cache = self.instrument_manager.melody_instrument()
-        
-        instrument = self._melody_instrument_cache
-        
-        # Record time to measure latency
-        start_time = time.time()
+        instrument = self.instrument_manager.melody_instrument()
+        if instrument is None:
+            log.debug("Initializing melody instrument because it doesn't exist")
+            self.instrument_manager.update_instrument(self.state["instruments"]["melody"], function="melody")
+            instrument = self.instrument_manager.melody_instrument()
         
-        # Use very short duration for immediate response
-        try:
-            # Non-blocking with shorter duration for faster response
-            # instrument.play_note(note, volume, 0.5, "staccato", blocking=False) # Old short staccato
-            # Play longer note without staccato
-            instrument.play_note(note, volume, 1, blocking=False)
-            print(f"[SOUND] ⚡ Note {note} started at {start_time:.3f}, latency: {time.time() - start_time:.3f}s")
-        except Exception as e:
-            print(f"[ERROR] Failed to play note {note}: {e}")
-            # Try simpler approach as fallback
-            try:
-                # instrument.play_note(note, volume, 0.2, blocking=False) # Old fallback
-                instrument.play_note(note, volume, 1.0, blocking=False) # Longer fallback
-            except Exception as e2:
-                print(f"[ERROR] Fallback play failed: {e2}")
+        for note in notes:
+            token = self.voice_allocator.allocate(instrument, note, volume)
+            if token is not None:
+                self.reaction_voices.append(token)
+                log.debug("Reaction note %s started in voice %s", note, token[0])
 
     def fork_melody(self, shared_state):        
         # Generate initial note
-        scale = SCALE_TYPES[self.state["melody_scale"]](self.shared_state["key"].value)
+        scale_name = self.state["melody_scale"]
+        key = self.shared_state["key"].value
         melody_num = self.state["melody_number"]
         melody = MELODIES[melody_num]
         
@@ -262,62 +403,60 @@ class Composer:
             if n is None:
                 note = None
             else:
-                note = scale.degree_to_pitch(n)
+                note = SCALE_TABLES.degree_to_pitch(scale_name, key, n)
             instrument.play_note(note, volume, d, blocking=True)
 
+    def run_events(self, events):
+        """Play a voice generator from inside a SCAMP fork, used when there is no LookaheadScheduler"""
+        for advance, action, args in events:
+            if action is not None:
+                action(*args)
+            wait(advance)
+
     def fork_harmony(self, shared_state):
-        # Skip completely if harmony_enabled is False or volume is 0
-        if hasattr(self, 'harmony_enabled') and not self.harmony_enabled:
-            print("[DEBUG] Harmony playback skipped - disabled")
-            return
-        
-        if hasattr(self, 'harmony_volume') and self.harmony_volume == 0:
-            print("[DEBUG] Harmony playback skipped - volume is 0")
-            return
-        
-        instrument = self.instrument_manager.harmony_instrument()
-        key = next(self.key_generator)
-        print(f"[DEBUG] Harmony using key: {key}")
-        scale = list(SCALE_TYPES[self.state["melody_scale"]](key))
-
-        # Add 7/9/11/13 etc depending on chord_levels
-        chord_levels = min(shared_state["chord_levels"].value, 2)  # Limit complexity
-
-        chord = []
-        gen_chords = [0, 2, 4] + [6 + 2*chord_levels*i for i in range(chord_levels)]
-        for offset in gen_chords:
-            if offset >= len(scale):
-                new_offset = offset % len(scale)
-                number_up = offset // len(scale)
-                note = scale[new_offset] + number_up * 12
-            else:
-                note = scale[offset]
-            chord.append(int(note))
-
-        # Adjust voicings
-        random.shuffle(chord)
-        key_idx = chord.index(key)
-        chord = np.array(chord)
-        chord[key_idx:] += 12 # If some of the chords are below tonic, shift down octave
-        
-        volume = self.state["volume"]["harmony"]
-        
-        # Create a short attack/decay to avoid long sustained harmony
-        envelope = expe.envelope.Envelope.adsr(0.1, volume, 0.3, 0.4, 0.15, 0.2)
-        
-        # Reduce duration from 4.0 to 2.0 to avoid long sustained harmony
-        print(f"[DEBUG] Playing harmony chord: {chord} for 2.0 seconds")
-        instrument.play_chord(chord, envelope, 2.0, blocking=True)
+        self.run_events(self.harmony_events(shared_state))
+
+    def harmony_events(self, shared_state):
+        """Harmony chords as (advance_beats, action, args) events, see LookaheadScheduler"""
+        while True:
+            # Rest for the chord length while harmony_enabled is False or volume is 0
+            if hasattr(self, 'harmony_enabled') and not self.harmony_enabled:
+                yield (2.0, None, ())
+                continue
+            
+            if hasattr(self, 'harmony_volume') and self.harmony_volume == 0:
+                yield (2.0, None, ())
+                continue
+            
+            instrument = self.instrument_manager.harmony_instrument()
+            key = next(self.key_generator)
+            log.debug("Harmony using key: %s", key)
 
-        if chord_levels > 0:
-            shared_state["chord_levels"].value -= 1
+            # Add 7/9/11/13 etc depending on chord_levels
+            chord_levels = min(shared_state["chord_levels"].value, 2)  # Limit complexity
 
-        shared_state["key"].value = key
+            # A random precomputed voicing, notes from the tonic onwards an octave up
+            chord = SCALE_TABLES.random_chord(self.state["melody_scale"], key, chord_levels)
+            
+            volume = self.state["volume"]["harmony"]
+            
+            # Create a short attack/decay to avoid long sustained harmony
+            envelope = expe.envelope.Envelope.adsr(0.1, volume, 0.3, 0.4, 0.15, 0.2)
+            
+            # Reduce duration from 4.0 to 2.0 to avoid long sustained harmony
+            log.debug("Playing harmony chord: %s for 2.0 beats", chord)
+            yield (2.0, functools.partial(instrument.play_chord, blocking=False), (chord, envelope, 2.0))
+
+            if chord_levels > 0:
+                shared_state["chord_levels"].add(-1, minimum=0)
+
+            shared_state["key"].set(key)
 
     def fork_background(self, shared_state):
-        instrument = self.instrument_manager.background_instrument()
-        volume = self.state["volume"]["background"]
-        
+        self.run_events(self.background_events(shared_state))
+
+    def background_events(self, shared_state):
+        """Bassline as (advance_beats, action, args) events, see LookaheadScheduler"""
         # Add bassline patterns based on current scale
         bassline_patterns = {
             "walking": [0, 3, 5, 7],
@@ -336,6 +475,10 @@ class Composer:
         fill_played = False
         
         while True:
+            # Looked up per bar so instrument and volume changes apply without a restart
+            play = functools.partial(self.instrument_manager.background_instrument().play_note, blocking=False)
+            volume = self.state["volume"]["background"]
+            
             # Get base note
             note = shared_state["key"].value - 24  # 2 octaves below the current key
             
@@ -352,14 +495,14 @@ class Composer:
             
             if should_play_fill:
                 # Play a fill since melody hasn't changed in over 10 seconds
-                print(f"Playing background fill - melody static for {melody_static_duration:.1f}s")
+                log.debug("Playing background fill - melody static for %.1fs", melody_static_duration)
                 
                 # Create a fill pattern that's musically interesting
                 fill_notes = [note, note+7, note+12, note+7, note+5, note+7, note+3, note]
                 
                 # Play the fill with a different articulation
                 for fill_note in fill_notes:
-                    instrument.play_note(fill_note, volume * 1.1, 0.5, "marcato", blocking=True)
+                    yield (0.5, play, (fill_note, volume * 1.1, 0.5, "marcato"))
                 
                 # Mark that we've played a fill
                 fill_played = True
@@ -378,37 +521,47 @@ class Composer:
                         bass_note = note + offset
                         # Shorter duration for each note in the pattern
                         duration = 4.0 * 4 / len(pattern)
-                        instrument.play_note(bass_note, volume, duration, blocking=True)
+                        yield (duration, play, (bass_note, volume, duration))
                     
                 elif self.state["baseline_style"] == "pulsing":
                     # For pulsing, apply the pattern with tremolo effect
                     for offset in pattern:
                         bass_note = note + offset
                         duration = 4.0 * 4 / len(pattern)
-                        instrument.play_note(bass_note, volume, duration, "tremolo", blocking=True)
+                        yield (duration, play, (bass_note, volume, duration, "tremolo"))
                     
                 else:  # "beat" style
                     # For beat style, play staccato notes following the pattern
                     for offset in pattern:
                         bass_note = note + offset
-                        instrument.play_note(bass_note, volume, 0.5, "staccato", blocking=True)
-                    wait(0.5)
+                        yield (0.5, play, (bass_note, volume, 0.5, "staccato"))
+                    yield (0.5, None, ())
                 
                 # Occasionally change the pattern (10% chance)
                 if random.random() < 0.1:
                     new_pattern = random.choice(list(bassline_patterns.keys()))
                     if new_pattern != current_pattern:
-                        print(f"Changing bassline pattern from {current_pattern} to {new_pattern}")
+                        log.debug("Changing bassline pattern from %s to %s", current_pattern, new_pattern)
                         current_pattern = new_pattern
 
 
 class SoundManager:
     """Class to manage the sound output for a pillar"""
     
-    def __init__(self, pillar_id=0):
-        """Initializes the sound manager"""
+    def __init__(self, pillar_id=0, latency_tracker=None, instrument_pool_size=16, shared_state_backend="local",
+                 lookahead=0.2, polyphony=8, headless=False, startup_timer=None):
+        """Initializes the sound manager
+
+        headless=True runs on silent parts logged to session.event_log with
+        no audio output, see headless.py. Startup phases are recorded in
+        startup_timer (a latency_stats.StartupTimer) when one is given.
+        """
         print(f"Initializing SoundManager for pillar: {pillar_id}")
         self.pillar_id = pillar_id
+        self.headless = headless
+        self.startup_timer = startup_timer if startup_timer is not None else StartupTimer()
+        # Optional latency_stats.LatencyTracker, fed the traces of reaction notes
+        self.latency_tracker = latency_tracker
 
         # Load configuration with proper defaults
         default_state = {
@@ -427,20 +580,38 @@ class SoundManager:
             self.state = default_state
             
             # Initialize attributes with defaults - ensures they exist even if errors occur
-            self._instruments_cache = {}
+            self.instrument_pool = None
+            self.instrument_pool_size = instrument_pool_size
+            self.shared_state_backend = shared_state_backend
             self._direct_instrument = None
             self.last_notes_played = []
             self.last_play_time = 0
             self.debounce_time = 0.05
             self.last_clear_time = time.time()
             self.clear_interval = 5.0
+            # Note-offs of the voice allocator, shared with the composer. They run on the scheduler's
+            # own thread so they land on time, the controller loop only ticks on touches or once a second.
+            # Headless runs fast forward the session clock, which only tick() follows
+            self.expiry_scheduler = NoteExpiryScheduler(clock=self.note_clock)
+            if not headless:
+                self.expiry_scheduler.start()
+            # Fixed pool of voices for touch and reaction notes, a tube owns its voice until released.
+            # Unreleased notes end after one beat, like play_note(note, volume, 1) did
+            self.voice_allocator = VoiceAllocator(self.expiry_scheduler, polyphony=polyphony, note_duration=1.0,
+                                                  beat_seconds=lambda: 60.0 / self.current_tempo())
+            # Plays harmony/background `lookahead` seconds ahead on its own thread, 0 or None keeps the SCAMP forks
+            # Headless runs are fast forwarded on the SCAMP clock, which a wall clock thread can not follow
+            self.lookahead_scheduler = None
+            if lookahead and not headless:
+                self.lookahead_scheduler = LookaheadScheduler(self.current_tempo, lookahead=lookahead)
+                self.lookahead_scheduler.start()
             
             # Initialize SCAMP session with proper error handling
             self.session = None
             if HAS_SCAMP:
                 try:
                     print("[SOUND] Initializing SCAMP session...")
-                    self.session = Session()
+                    self.session = self._new_session()
                     
                     # Set basic tempo but handle version differences
                     self.session.tempo = 120  # Higher tempo can reduce perceived latency
@@ -452,6 +623,9 @@ class SoundManager:
                     else:
                         print("[SOUND] SCAMP session initialized (set_synchronization_mode not available in this version)")
                     
+                    self.instrument_pool = InstrumentPool(self.session, capacity=self.instrument_pool_size)
+                    self.startup_timer.mark("session")
+                    
                     # CRITICAL: Instrument preloading
                     try:
                         self._preload_instruments()
@@ -459,6 +633,7 @@ class SoundManager:
                     except Exception as preload_error:
                         print(f"[ERROR] Instrument preloading failed: {preload_error}")
                         self._direct_instrument = None
+                    self.startup_timer.mark("instruments")
                 except Exception as e:
                     print(f"[ERROR] Failed to initialize SCAMP session: {e}")
                     print(f"[DEBUG] SCAMP exception details: {traceback.format_exc()}")
@@ -472,7 +647,8 @@ class SoundManager:
             if self.session is not None:
                 try:
                     print("[SOUND] Creating sound composer...")
-                    self.composer = Composer(self.session, default_state)
+                    self.composer = Composer(self.session, default_state, self.expiry_scheduler, self.instrument_pool, self.shared_state_backend,
+                                             self.lookahead_scheduler, self.voice_allocator)
                     
                     # Explicitly set volume properties
                     self.composer.melody_volume = default_state["volume"]["melody"]
@@ -492,12 +668,13 @@ class SoundManager:
                     print(f"[ERROR] Failed to create sound composer: {e}")
                     print(f"[DEBUG] Composer exception details: {traceback.format_exc()}")
                     self.composer = None
+                self.startup_timer.mark("composer")
             else:
                 print("[ERROR] Cannot create composer - no valid session")
                 self.composer = None
             
             # Set process priority if psutil is available
-            if HAS_PSUTIL:
+            if HAS_PSUTIL and not headless:
                 try:
                     process = psutil.Process(os.getpid())
                     # Check for platform-specific priority constants
@@ -526,18 +703,17 @@ class SoundManager:
             
             # CRITICAL: Create dedicated instrument for direct note playing
             # This avoids any initialization delay when a touch happens
-            self._direct_instrument = self.session.new_part("xylophone")
+            self._direct_instrument = new_part(self.session, "xylophone")
             print("[SOUND] Created dedicated fast-response instrument")
             
-            # Cache other commonly used instruments
-            instruments = ["piano", "flute", "strings", "synth", "glockenspiel"]
-            for name in instruments:
-                try:
-                    instrument = self.session.new_part(name)
-                    self._instruments_cache[name] = instrument
-                    print(f"[SOUND] Pre-loaded instrument: {name}")
-                except Exception as e:
-                    print(f"[SOUND] Failed to pre-load {name}: {e}")
+            # The configured presets are loaded and waited for (the Composer needs
+            # them), then the rest of INSTRUMENTS fills the pool in the background
+            # so rotating instruments on a touch only swaps a cached part
+            if self.instrument_pool is not None:
+                preferred = list(dict.fromkeys(self.state["instruments"].values()))
+                self.instrument_pool.prewarm(preferred, background=False)
+                self.instrument_pool.prewarm([i for i in INSTRUMENTS if i not in preferred],
+                                             background=not self.headless)
                     
         except Exception as e:
             print(f"[ERROR] Failed in instrument preloading: {e}")
@@ -560,7 +736,7 @@ class SoundManager:
         try:
             if self.session is not None:
                 try:
-                    piano = self.session.new_part("piano")
+                    piano = new_part(self.session, "piano")
                     piano.play_note(60, 0.5, 0.5)  # Play middle C
                     from scamp import wait
                     wait(0.5)
@@ -596,13 +772,13 @@ class SoundManager:
                 # Try to create the instrument directly - prioritize responsive instruments
                 try:
                     # Xylophone is generally more responsive with clear attack
-                    self._direct_instrument = self.session.new_part("xylophone")
+                    self._direct_instrument = new_part(self.session, "xylophone")
                     print("[SOUND] Direct xylophone instrument created for responsive playback")
                     return True
                 except Exception:
                     # Fallback to piano if xylophone fails
                     try:
-                        self._direct_instrument = self.session.new_part("piano")
+                        self._direct_instrument = new_part(self.session, "piano")
                         print("[SOUND] Direct piano instrument created (fallback)")
                         return True
                     except Exception as e:
@@ -617,7 +793,7 @@ class SoundManager:
                     # Try instruments one by one until one works
                     for inst_name in available_instruments:
                         try:
-                            self._direct_instrument = self.session.new_part(inst_name)
+                            self._direct_instrument = new_part(self.session, inst_name)
                             print(f"[SOUND] Created fallback instrument: {inst_name}")
                             return True
                         except Exception:
@@ -636,24 +812,28 @@ class SoundManager:
             print(f"[ERROR] Failed to create direct instrument: {e}")
             return False
 
-    def update_pillar_setting(self, param_name, value):
-        """Updates the settings dictionary for a specific pillar."""
-        print(f"[SOUND] Updating parameter: {param_name} = {value}")
+    def update_pillar_setting(self, param_name, value, trace=None):
+        """Updates the settings dictionary for a specific pillar.
+
+        trace is the optional touch latency trace, passed on to play_direct_notes
+        """
+        log.debug("Updating parameter: %s = %s", param_name, value)
         
         # First check if composer is properly initialized
         if self.composer is None:
-            print("[ERROR] Cannot update settings - composer not initialized")
+            log.error("Cannot update settings - composer not initialized")
             # Try to reinitialize the composer
             try:
                 if self.session is not None:
-                    print("[SOUND] Attempting to recreate composer...")
-                    self.composer = Composer(self.session, self.state)
-                    print("[SOUND] Successfully recreated composer")
+                    log.info("Attempting to recreate composer...")
+                    self.composer = Composer(self.session, self.state, self.expiry_scheduler, self.instrument_pool, self.shared_state_backend,
+                                             self.lookahead_scheduler, self.voice_allocator)
+                    log.info("Successfully recreated composer")
                 else:
-                    print("[ERROR] Cannot recreate composer - no valid session")
+                    log.error("Cannot recreate composer - no valid session")
                     return
             except Exception as e:
-                print(f"[ERROR] Failed to recreate composer: {e}")
+                log.error("Failed to recreate composer: %s", e)
                 return
         
         try:
@@ -664,36 +844,36 @@ class SoundManager:
                 
                 # Explicitly handle harmony silencing when volume is 0
                 if "harmony" in value and value["harmony"] == 0:
-                    print("[SOUND] Explicitly disabling harmony (volume=0)")
+                    log.debug("Explicitly disabling harmony (volume=0)")
                     self.composer.harmony_enabled = False
                 else:
                     self.composer.harmony_enabled = True
             
             # Special handling for reaction notes
             elif param_name == "reaction_notes" and value:
-                print(f"[SOUND] Playing reaction notes: {value}")
+                log.debug("Playing reaction notes: %s", value)
                 
                 # Ensure melody instrument is initialized and working
                 instrument_name = self.state["instruments"]["melody"]
                 if self.composer.instrument_manager.melody_instrument() is None:
-                    print(f"[FIX] Reinitializing melody instrument '{instrument_name}'")
+                    log.warning("Reinitializing melody instrument '%s'", instrument_name)
                     self.composer.instrument_manager.update_instrument(instrument_name, function="melody")
                 
                 # Test direct note generation for debugging
-                self.play_direct_notes(value)
+                self.play_direct_notes(value, trace=trace)
             
             # Default handling for other parameters
             else:
                 self.composer.update(param_name, value)
                 
         except Exception as e:
-            print(f"[ERROR] Failed to update parameter {param_name}: {e}")
+            log.error("Failed to update parameter %s: %s", param_name, e)
             # Try to recover the composer if needed
             if self.composer is None:
-                print("[RECOVERY] Attempting to restore composer...")
+                log.warning("Attempting to restore composer...")
                 self.verify_initialization()
 
-    def play_direct_notes(self, notes, tube_note_mapping=None):
+    def play_direct_notes(self, notes, tube_note_mapping=None, trace=None):
         """
         ULTRA LOW LATENCY direct note player - optimized for minimal delay
         Bypass all normal processing for the fastest possible response time.
@@ -701,9 +881,12 @@ class SoundManager:
         Args:
             notes: List of MIDI note numbers to play
             tube_note_mapping: Dict mapping tube_id to note, used to track and stop notes from the same tube
+            trace: Optional dict of touch checkpoint times, completed here and recorded in the latency tracker
         """
         if not notes:
             return False
+        if trace is not None:
+            trace["play"] = time.perf_counter()
             
         # Track notes by tube for proper note management
         if tube_note_mapping is None:
@@ -715,17 +898,17 @@ class SoundManager:
         
         # Get starting timestamp for latency measurement
         start_time = time.time()
-        print(f"[⚡FAST] Playing {len(notes)} notes: {notes}, from tubes: {list(tube_note_mapping.keys())}")
+        log.debug("Playing %s notes: %s, from tubes: %s", len(notes), notes, list(tube_note_mapping.keys()))
         
         try:
             # Phase 1: Get or create the direct instrument
             # Make sure we have a direct instrument 
             if not hasattr(self, '_direct_instrument') or self._direct_instrument is None:
-                print("[FIX] Direct instrument not available - creating one")
+                log.warning("Direct instrument not available - creating one")
                 success = self.ensure_direct_instrument()
                 if not success:
                     # If we couldn't create a direct instrument, try using the composer's instrument
-                    print("[FIX] Falling back to composer's instrument")
+                    log.warning("Falling back to composer's instrument")
                     if hasattr(self, 'composer') and self.composer is not None:
                         try:
                             self._direct_instrument = self.composer.instrument_manager.melody_instrument()
@@ -733,123 +916,63 @@ class SoundManager:
                                 self.composer.instrument_manager.update_instrument("xylophone", function="melody")
                                 self._direct_instrument = self.composer.instrument_manager.melody_instrument()
                         except Exception as e:
-                            print(f"[ERROR] Fallback to composer instrument failed: {e}")
+                            log.error("Fallback to composer instrument failed: %s", e)
             
             # Phase 2: Play notes using the available instrument
             if hasattr(self, '_direct_instrument') and self._direct_instrument is not None:
                 # Our primary instrument is available
                 instrument = self._direct_instrument
-                print(f"[SOUND] Using direct instrument for playback")
+                log.debug("Using direct instrument for playback")
             elif hasattr(self, 'composer') and self.composer is not None:
                 # Try the composer's instrument as backup
                 instrument = self.composer.instrument_manager.melody_instrument()
-                print(f"[SOUND] Using composer instrument for playback")
+                log.debug("Using composer instrument for playback")
             elif hasattr(self, 'session') and self.session is not None:
                 # Last resort - create a one-time instrument
-                print(f"[SOUND] Creating one-time emergency instrument")
-                instrument = self.session.new_part("piano")
+                log.debug("Creating one-time emergency instrument")
+                instrument = new_part(self.session, "piano")
             else:
-                print("[ERROR] No valid instrument or session available")
+                log.error("No valid instrument or session available")
                 return False
             
-            # Initialize structure for tracking active notes by tube if it doesn't exist
-            if not hasattr(self, '_active_tube_notes'):
-                self._active_tube_notes = {}
-                
-            # Also track active notes by their pitch value (for instruments without end_note)
-            if not hasattr(self, '_active_notes'):
-                self._active_notes = {}
-                
-            # Phase 3: Play each note with maximal reliability
+            # Phase 3: Play each note in a pooled voice, a tube's new note takes over its previous voice
             volume = 1.0  # Maximum volume
             success_count = 0
-            
-            # First check if end_note is supported by the instrument
-            has_end_note = hasattr(instrument, 'end_note')
-            
-            # For each tube in the mapping, stop previous notes if needed
-            for tube_id, note in tube_note_mapping.items():
-                # Stop previous note on this tube if one exists
-                if tube_id in self._active_tube_notes:
-                    try:
-                        previous_note = self._active_tube_notes[tube_id]
-                        
-                        # Try to stop the note using the most appropriate method
-                        if has_end_note:
-                            print(f"[SOUND] Stopping previous note {previous_note} on tube {tube_id}")
-                            instrument.end_note(previous_note)
-                        elif hasattr(instrument, 'stop_note'):
-                            # Alternative method in some SCAMP versions
-                            print(f"[SOUND] Stopping previous note {previous_note} using stop_note")
-                            instrument.stop_note(previous_note)
-                        elif hasattr(self, '_active_notes') and previous_note in self._active_notes:
-                            # Try to release the note in the _active_notes dictionary
-                            # Mark it for release by setting its volume to 0
-                            print(f"[SOUND] Marking previous note {previous_note} for release")
-                            self._active_notes[previous_note]['releasing'] = True
-                            
-                            # Play a zero-volume note to "cut off" the previous one (hack)
-                            try:
-                                instrument.play_note(previous_note, 0, 0.01, blocking=False)
-                            except Exception as e:
-                                print(f"[WARNING] Failed to cut off note with zero volume: {e}")
-                    except Exception as stop_error:
-                        print(f"[WARNING] Failed to stop previous note: {stop_error}")
-                
-                # Store the new active note for this tube
-                self._active_tube_notes[tube_id] = note
+            tube_for_note = {note: tube_id for tube_id, note in tube_note_mapping.items()}
             
             # Play each note with minimal latency
             for note in notes:
-                try:
-                    # Use non-blocking to maximize responsiveness
-                    # Use a longer duration for better sound quality (1.5 seconds)
-                    instrument.play_note(note, volume, 1, blocking=False)
-                    
-                    # Track this note with its start time for future management
-                    self._active_notes[note] = {
-                        'start_time': now,
-                        'releasing': False,
-                        'volume': volume
-                    }
-                    
-                    success_count += 1
-                    
-                    # Calculate latency but don't wait for it
-                    latency_ms = (time.time() - start_time) * 1000
-                    print(f"[⚡LATENCY] Note {note} triggered in {latency_ms:.1f}ms")
-                except Exception as note_error:
-                    print(f"[ERROR] Note {note} failed: {note_error}")
-            
-            # Clean up old notes from tracking dictionary to prevent memory leaks
-            # Only keep notes that started in the last 10 seconds
-            if hasattr(self, '_active_notes'):
-                old_notes = []
-                for note, info in self._active_notes.items():
-                    if now - info['start_time'] > 10.0:
-                        old_notes.append(note)
+                token = self.voice_allocator.allocate(instrument, note, volume, owner=tube_for_note.get(note))
+                if token is None:
+                    continue
+                if trace is not None and "dispatched" not in trace:
+                    trace["dispatched"] = time.perf_counter()
+                success_count += 1
                 
-                for note in old_notes:
-                    if note in self._active_notes:
-                        del self._active_notes[note]
+                # Calculate latency but don't wait for it
+                latency_ms = (time.time() - start_time) * 1000
+                log.debug("Note %s triggered in voice %s in %.1fms", note, token[0], latency_ms)
             
+            if trace is not None and self.latency_tracker is not None:
+                self.latency_tracker.record_trace(trace)
+
             # Return success if we played at least one note
             return success_count > 0
             
         except Exception as e:
-            print(f"[ERROR] Note playback system completely failed: {e}")
+            log.error("Note playback system completely failed: %s", e)
             # If EVERYTHING else failed, create a completely new session as absolute last resort
             try:
                 if HAS_SCAMP:
                     emergency_session = Session()
-                    emergency_instrument = emergency_session.new_part("piano")
+                    emergency_instrument = new_part(emergency_session, "piano")
                     for note in notes:
                         emergency_instrument.play_note(note, 1.0, 0.2, blocking=False)
-                    print("[EMERGENCY] Created completely new session for last-resort playback")
+                    log.warning("Created completely new session for last-resort playback")
                     return True
                 return False
             except Exception as final_error:
-                print(f"[FATAL] Complete system failure: {final_error}")
+                log.critical("Complete system failure: %s", final_error)
                 return False
                 
     def stop_notes(self, tubes):
@@ -865,123 +988,35 @@ class SoundManager:
         if not tubes:
             return False
             
-        print(f"[SOUND] Stopping notes for tubes: {tubes}")
-        
-        # Get the current instrument
-        instrument = None
-        if hasattr(self, '_direct_instrument') and self._direct_instrument is not None:
-            instrument = self._direct_instrument
-        elif hasattr(self, 'composer') and self.composer is not None:
-            instrument = self.composer.instrument_manager.melody_instrument()
-        elif hasattr(self, 'session') and self.session is not None:
-            # Last resort - create a one-time instrument
-            try:
-                instrument = self.session.new_part("piano")
-            except Exception as e:
-                print(f"[ERROR] Failed to create emergency instrument: {e}")
-        
-        if instrument is None:
-            print("[ERROR] No valid instrument available to stop notes")
-            return False
-            
-        # Check if we have active tube notes to stop
-        if not hasattr(self, '_active_tube_notes'):
-            print("[WARNING] No active tube notes to stop")
-            return False
-            
-        # Track success
-        success_count = 0
-        
-        # Check if end_note or stop_note is supported
-        has_end_note = hasattr(instrument, 'end_note')
-        has_stop_note = hasattr(instrument, 'stop_note')
+        log.debug("Stopping notes for tubes: %s", tubes)
         
-        # For each tube, stop its note if it exists
-        for tube_id in tubes:
-            if tube_id in self._active_tube_notes:
-                try:
-                    note = self._active_tube_notes[tube_id]
-                    print(f"[SOUND] Stopping note {note} for tube {tube_id}")
-                    
-                    # Try to stop the note using the most appropriate method
-                    if has_end_note:
-                        instrument.end_note(note)
-                        success_count += 1
-                    elif has_stop_note:
-                        instrument.stop_note(note)
-                        success_count += 1
-                    elif hasattr(self, '_active_notes') and note in self._active_notes:
-                        # Mark it for release using zero volume
-                        self._active_notes[note]['releasing'] = True
-                        
-                        # Play a zero-volume note to "cut off" the previous one
-                        try:
-                            instrument.play_note(note, 0, 0.01, blocking=False)
-                            success_count += 1
-                        except Exception as e:
-                            print(f"[WARNING] Failed to stop note with zero volume: {e}")
-                    
-                    # Remove the note from active tube notes regardless of success
-                    del self._active_tube_notes[tube_id]
-                    
-                except Exception as e:
-                    print(f"[ERROR] Failed to stop note for tube {tube_id}: {e}")
-        
-        return success_count > 0
+        # Each tube owns at most one voice, ending it is a real note-off on its NoteHandle
+        return self.voice_allocator.release_owners(tubes) > 0
 
     def manage_active_notes(self):
         """
         Manage the lifecycle of active notes - release old notes, clean up memory
-        This should be called periodically from the tick method
+        This should be called periodically from the tick method, it only touches
+        notes whose release or cleanup deadline has passed. Only headless runs
+        need it, otherwise the scheduler runs expiries on its own thread
         """
-        now = time.time()
-        
-        if not hasattr(self, '_active_notes') or not self._active_notes:
-            return  # Nothing to do
-        
-        # Get the current instrument if available
-        instrument = None
-        if hasattr(self, '_direct_instrument') and self._direct_instrument:
-            instrument = self._direct_instrument
-        elif hasattr(self, 'composer') and self.composer and hasattr(self.composer, 'instrument_manager'):
-            instrument = self.composer.instrument_manager.melody_instrument()
-        
-        if not instrument:
-            # No valid instrument to work with, just clean up old notes
-            self._active_notes = {}
-            return
-            
-        # Identify notes to clean up
-        notes_to_remove = []
-        
-        # Process each active note
-        for note, info in self._active_notes.items():
-            age = now - info['start_time']
-            
-            # Notes older than 10 seconds should be removed
-            if age > 10.0:
-                notes_to_remove.append(note)
-                # Try to explicitly stop old notes if possible
-                if hasattr(instrument, 'end_note'):
-                    try:
-                        instrument.end_note(note)
-                    except Exception:
-                        pass  # Ignore errors when stopping old notes
-            
-            # Notes in releasing state should fade out
-            elif info.get('releasing', False):
-                # Play a zero-volume version to effectively stop it
-                try:
-                    instrument.play_note(note, 0, 0.01, blocking=False)
-                    notes_to_remove.append(note)  # Remove after processing
-                except Exception:
-                    pass  # Ignore errors
-        
-        # Clean up notes marked for removal
-        for note in notes_to_remove:
-            if note in self._active_notes:
-                del self._active_notes[note]
-                
+        if not self.headless:
+            return 0
+        return self.expiry_scheduler.run_expired()
+
+    def _new_session(self):
+        return HeadlessSession() if self.headless else Session()
+
+    def note_clock(self):
+        """Time note-offs are scheduled on, session time when headless so they follow fast forwarding"""
+        if self.headless and self.session is not None:
+            return self.session.time()
+        return time.monotonic()
+
+    def current_tempo(self):
+        """Session tempo in BPM, follows set_tempo_target ramps"""
+        return self.session.tempo if self.session is not None else 60.0
+
     def tick(self, time_delta=1/30.0):
         """Process a time step in the sound system."""
         try:
@@ -991,7 +1026,7 @@ class SoundManager:
             # Periodically clear reaction notes
             current_time = time.time()
             if current_time - self.last_clear_time > self.clear_interval:
-                print("[SOUND] Periodic reaction notes clearing")
+                log.debug("Periodic reaction notes clearing")
                 self.update_pillar_setting("reaction_notes", [])
                 self.last_clear_time = current_time
                 
@@ -1001,9 +1036,9 @@ class SoundManager:
                     self.composer.play()
                     wait(time_delta, units="time")
                 except Exception as e:
-                    print(f"[ERROR] Composer play/wait failed: {e}")
+                    log.error("Composer play/wait failed: %s", e)
         except Exception as e:
-            print(f"[ERROR] Error in sound manager tick: {e}")
+            log.error("Error in sound manager tick: %s", e)
 
     def get_pillar_settings(self):
         """Return current sound settings for diagnostics"""
@@ -1015,33 +1050,20 @@ class SoundManager:
             "last_notes": getattr(self, "last_notes", [])
         }
 
-    def cleanup(self):
-        """Clean up resources properly before shutdown"""
+    def cleanup(self, keep_session=False):
+        """Clean up resources properly before shutdown
+
+        keep_session stops every note and fork but leaves the session and its
+        parts loaded, for restart_sound_system
+        """
         print("[SOUND] Performing sound system cleanup...")
         
         try:
             # Stop any active notes
-            if hasattr(self, '_active_notes') and self._active_notes:
-                # Get the main instrument
-                instrument = None
-                if hasattr(self, '_direct_instrument') and self._direct_instrument:
-                    instrument = self._direct_instrument
-                elif hasattr(self, 'composer') and self.composer and self.composer.instrument_manager:
-                    instrument = self.composer.instrument_manager.melody_instrument()
-                
-                if instrument:
-                    # Try to stop each active note
-                    for note in self._active_notes.keys():
-                        try:
-                            if hasattr(instrument, 'end_note'):
-                                instrument.end_note(note)
-                            elif hasattr(instrument, 'stop_note'):
-                                instrument.stop_note(note)
-                        except Exception:
-                            pass  # Ignore errors when stopping notes
-                
-                # Clear the active notes dictionary
-                self._active_notes.clear()
+            self.voice_allocator.release_all()
+            self.expiry_scheduler.clear()
+            if self.lookahead_scheduler is not None:
+                self.lookahead_scheduler.clear()
             
             # Clear any composer resources
             if hasattr(self, 'composer') and self.composer:
@@ -1055,11 +1077,11 @@ class SoundManager:
                             pass
                 
                 # Clear active notes in composer
-                if hasattr(self.composer, 'active_reaction_notes'):
-                    self.composer.active_reaction_notes.clear()
+                if hasattr(self.composer, 'clear_active_notes'):
+                    self.composer.clear_active_notes()
             
             # Close the SCAMP session if present
-            if hasattr(self, 'session') and self.session:
+            if hasattr(self, 'session') and self.session and not keep_session:
                 # Some SCAMP versions have an explicit shutdown method
                 if hasattr(self.session, 'cleanup') and callable(self.session.cleanup):
                     try:
@@ -1086,32 +1108,53 @@ class SoundManager:
             return False
             
     def restart_sound_system(self):
-        """Attempt to restart the sound system after failures"""
+        """Attempt to restart the sound system after failures
+
+        A session that is still there is kept together with its pooled parts
+        and composer, only the notes and forks are reset, so no preset is
+        loaded again. A new session is only created when there is none.
+        """
         print("[SOUND] Attempting to restart sound system...")
+        self.startup_timer = StartupTimer()
         
         try:
+            reuse_session = self.session is not None and self.instrument_pool is not None
             # Clean up existing resources
-            self.cleanup()
+            self.cleanup(keep_session=reuse_session)
             
-            # Create a new session
             if HAS_SCAMP:
-                self.session = Session()
-                print("[SOUND] Created new SCAMP session")
+                if reuse_session:
+                    print(f"[SOUND] Reusing SCAMP session with {len(self.instrument_pool)} loaded parts")
+                else:
+                    self.session = self._new_session()
+                    self.session.tempo = 120
+                    self.instrument_pool = InstrumentPool(self.session, capacity=self.instrument_pool_size)
+                    # Parts and composer of the old session can not play on the new one
+                    self._direct_instrument = None
+                    self.composer = None
+                    print("[SOUND] Created new SCAMP session")
+                self.startup_timer.mark("session")
                 
                 # Recreate direct instrument
+                if self._direct_instrument is None:
+                    self._preload_instruments()
                 success = self.ensure_direct_instrument()
                 if not success:
                     print("[WARNING] Failed to recreate direct instrument")
+                self.startup_timer.mark("instruments")
                 
                 # Recreate composer if needed
                 if not hasattr(self, 'composer') or self.composer is None:
                     try:
-                        self.composer = Composer(self.session, self.state)
+                        self.composer = Composer(self.session, self.state, self.expiry_scheduler, self.instrument_pool, self.shared_state_backend,
+                                                 self.lookahead_scheduler, self.voice_allocator)
                         print("[SOUND] Created new composer")
                     except Exception as e:
                         print(f"[ERROR] Failed to recreate composer: {e}")
+                self.startup_timer.mark("composer")
                 
                 print("[SOUND] Sound system restarted successfully")
+                self.startup_timer.report("Sound system restarted")
                 return True
             else:
                 print("[ERROR] SCAMP not available - cannot restart sound system")
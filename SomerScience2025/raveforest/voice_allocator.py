@@ -0,0 +1,147 @@
+import logging
+import threading
+import time
+
+log = logging.getLogger("raveforest.sound")
+
+
+class Voice():
+    """One preallocated polyphony slot"""
+
+    __slots__ = ("index", "generation", "handle", "note", "owner", "start_time")
+
+    def __init__(self, index):
+        self.index = index
+        self.generation = 0
+        self.handle = None  # SCAMP NoteHandle while sounding
+        self.note = None
+        self.owner = None  # e.g. the tube id that started it
+        self.start_time = 0.0
+
+    @property
+    def active(self):
+        return self.handle is not None
+
+
+class VoiceAllocator():
+    """Fixed polyphony pool for reaction notes, played through SCAMP NoteHandles
+
+    Notes are started with instrument.start_note() and ended with
+    NoteHandle.end(), so nothing is forked per note and note-off is a real
+    note-off rather than a zero-volume retrigger. Each voice can be owned by
+    a tube: a new note from the same tube takes over that tube's voice and
+    releasing the tube ends it. When every slot is busy the oldest voice is
+    stolen. Notes that are never released end after `note_duration` beats
+    (converted with beat_seconds(), e.g. 60 / tempo, when the note starts)
+    through the shared NoteExpiryScheduler.
+
+    allocate() returns a (index, generation) token, release() ignores tokens
+    whose voice has since been reused.
+    """
+
+    def __init__(self, expiry_scheduler, polyphony=8, note_duration=1.0, beat_seconds=None):
+        self.expiry_scheduler = expiry_scheduler
+        self.note_duration = note_duration  # beats
+        self.beat_seconds = beat_seconds if beat_seconds is not None else (lambda: 1.0)
+        self.voices = [Voice(i) for i in range(polyphony)]
+        self.owners = {}  # owner -> voice index
+        self.lock = threading.Lock()
+
+        self.started_count = 0
+        self.stolen_count = 0
+
+    @property
+    def polyphony(self):
+        return len(self.voices)
+
+    def _end_locked(self, voice):
+        if voice.handle is not None:
+            try:
+                voice.handle.end()
+            except Exception as e:
+                log.debug("Ending note %s on voice %s failed: %s", voice.note, voice.index, e)
+        if voice.owner is not None and self.owners.get(voice.owner) == voice.index:
+            del self.owners[voice.owner]
+        voice.handle = None
+        voice.note = None
+        voice.owner = None
+        self.expiry_scheduler.cancel(("voice", voice.index))
+
+    def _pick_locked(self, owner):
+        if owner is not None and owner in self.owners:
+            return self.voices[self.owners[owner]]
+        oldest = None
+        for voice in self.voices:
+            if not voice.active:
+                return voice
+            if oldest is None or voice.start_time < oldest.start_time:
+                oldest = voice
+        self.stolen_count += 1
+        log.debug("Stealing voice %s (note %s)", oldest.index, oldest.note)
+        return oldest
+
+    def allocate(self, instrument, note, volume, owner=None, duration=None):
+        """Start note on instrument in a free, owned or stolen voice, returns its token or None
+
+        duration is in beats, note_duration when None.
+        """
+        with self.lock:
+            voice = self._pick_locked(owner)
+            self._end_locked(voice)
+            try:
+                voice.handle = instrument.start_note(note, volume)
+            except Exception as e:
+                log.error("Failed to start note %s: %s", note, e)
+                return None
+            voice.generation += 1
+            voice.note = note
+            voice.owner = owner
+            voice.start_time = time.monotonic()
+            if owner is not None:
+                self.owners[owner] = voice.index
+            self.started_count += 1
+            token = (voice.index, voice.generation)
+            # Scheduled under the lock so a racing allocate can not replace it with a stale token
+            beats = self.note_duration if duration is None else duration
+            self.expiry_scheduler.schedule(("voice", voice.index), beats * self.beat_seconds(), self.release, token)
+        return token
+
+    def release(self, token):
+        """End the voice a token refers to, if it has not been reused since"""
+        index, generation = token
+        with self.lock:
+            voice = self.voices[index]
+            if voice.generation != generation or not voice.active:
+                return False
+            self._end_locked(voice)
+            return True
+
+    def release_owners(self, owners):
+        """End the voices owned by e.g. the released tubes, returns how many ended"""
+        released = 0
+        with self.lock:
+            for owner in owners:
+                index = self.owners.get(owner)
+                if index is not None:
+                    self._end_locked(self.voices[index])
+                    released += 1
+        return released
+
+    def release_all(self):
+        with self.lock:
+            for voice in self.voices:
+                if voice.active:
+                    self._end_locked(voice)
+
+    def active_notes(self):
+        with self.lock:
+            return {voice.index: (voice.note, voice.owner) for voice in self.voices if voice.active}
+
+    def stats(self):
+        with self.lock:
+            return dict(
+                polyphony=len(self.voices),
+                active=sum(1 for voice in self.voices if voice.active),
+                started=self.started_count,
+                stolen=self.stolen_count,
+            )
@@ -35,6 +35,13 @@ const unsigned long period2 = 50;   // Updating lights based on touch sensor sta
 const unsigned int serial_max_char = 150;
 int msg_count = 0;
 
+// Binary framing (negotiated by the Pi sending "PROTO,BIN;")
+// SYNC | TYPE | LEN | PAYLOAD[LEN] | CRC8(TYPE, LEN, PAYLOAD)
+#define FRAME_SYNC 0xA5
+#define FRAME_CAP 0x01
+#define FRAME_LED 0x02
+bool binary_mode = false;
+
 // LEDs
 CRGB leds[6][MAX_LEDS];
 int led_status[6][3] = { { 0, 0 }, { 0, 0 }, { 0, 0 }, { 0, 0 }, { 0, 0 }, { 0, 0 } };
@@ -122,7 +129,62 @@ void light_tube_number(int tnum, int hue, int brightness) {
   }
 }
 
+uint8_t crc8(const uint8_t *data, uint8_t len) {
+  uint8_t crc = 0;
+  for (uint8_t i = 0; i < len; i++) {
+    crc ^= data[i];
+    for (uint8_t b = 0; b < 8; b++) {
+      crc = (crc & 0x80) ? (uint8_t)((crc << 1) ^ 0x07) : (uint8_t)(crc << 1);
+    }
+  }
+  return crc;
+}
+
+void sendframe(uint8_t type, const uint8_t *payload, uint8_t len) {
+  uint8_t frame[3 + NUM_CAPS + 1];
+  frame[0] = FRAME_SYNC;
+  frame[1] = type;
+  frame[2] = len;
+  memcpy(&frame[3], payload, len);
+  frame[3 + len] = crc8(&frame[1], len + 2);
+  Serial.write(frame, len + 4);
+}
+
+void parsecommandsfromserial() {
+  // Only protocol negotiation is acted on, anything else is discarded
+  // (LED command parsing is disabled in this firmware)
+  static char command[serial_max_char];
+  static unsigned int commandPos = 0;
+
+  while (Serial.available()) {
+    char inChar = (char)Serial.read();
+    if (inChar == ';') {
+      command[commandPos] = '\0';
+      commandPos = 0;
+      if (strcmp(command, "PROTO,BIN") == 0) {
+        Serial.println("PROTO,BIN,OK");
+        binary_mode = true;
+      } else if (strcmp(command, "PROTO,TXT") == 0) {
+        binary_mode = false;
+        Serial.println("PROTO,TXT,OK");
+      }
+    } else if (inChar != '\n' && inChar != '\r' && commandPos < serial_max_char - 1) {
+      command[commandPos++] = inChar;
+    }
+  }
+}
+
 void sendledstatus() {
+  if (binary_mode) {
+    uint8_t hues[6];
+    for (int i = 0; i < 6; i++) {
+      led_status[i][0] = tube[i][0];
+      hues[i] = (uint8_t)tube[i][0];
+    }
+    sendframe(FRAME_LED, hues, 6);
+    return;
+  }
+
   String msg = "LED";
   for (int i = 0; i < 6; i++) {
     led_status[i][0] = tube[i][0];
@@ -255,6 +317,17 @@ void readallcaps() {
     }
   }
 
+  if (binary_mode) {
+    uint8_t mask = 0;
+    for (int i = 0; i < NUM_CAPS; i++) {
+      if (capDecay_Serial[i] > 0) {
+        mask |= (1 << i);
+      }
+    }
+    sendframe(FRAME_CAP, &mask, 1);
+    return;
+  }
+
   // Send array of capStatus with serial-specific filtering applied
   String capmsg = "CAP";
   for (int i = 0; i < NUM_CAPS; i++) {
@@ -299,6 +372,9 @@ void loop() {
   //   parseledfromserial();
   // }
 
+  // Protocol negotiation from the Pi
+  parsecommandsfromserial();
+
   // Read capacitive sensors
   if (currentMillis - startMillis1 >= period1) {
     startMillis1 = currentMillis;
@@ -1,8 +1,13 @@
 import argparse
+import os
+import sys
 import pygame
 import serial
 import time
 
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'raveforest'))
+from pillar_hw_interface import encode_frame, FRAME_CAP, PROTO_BINARY_ACK
+
 # Initialize pygame
 pygame.init()
 
@@ -41,6 +46,9 @@ pygame.display.set_caption("Simulated Arduino Buttons")
 # Create button states (initially all false)
 button_states = [False] * 6
 
+# Switched on when the controller negotiates binary framing
+binary_mode = False
+
 # Create button rectangles
 buttons = [
     pygame.Rect(
@@ -51,6 +59,12 @@ buttons = [
 
 # Send button states over serial
 def send_button_states():
+    if binary_mode:
+        mask = sum(1 << i for i, state in enumerate(button_states) if state)
+        arduino_sim.write(encode_frame(FRAME_CAP, [mask]))
+        print(f"Sent: CAP frame {mask:06b}")
+        return
+
     state_strings = ["1" if state else "0" for state in button_states]
     message = f"CAP,{','.join(state_strings)}\n"
     arduino_sim.write(message.encode('utf-8'))
@@ -63,6 +77,14 @@ last_send_time = time.time()
 while running:
     screen.fill(WHITE)
 
+    # Answer protocol negotiation from the controller
+    if arduino_sim.in_waiting:
+        incoming = arduino_sim.read(arduino_sim.in_waiting)
+        if b"PROTO,BIN;" in incoming:
+            arduino_sim.write(f"{PROTO_BINARY_ACK}\n".encode('utf-8'))
+            binary_mode = True
+            print("Switched to binary framing")
+
     # Event handling
     for event in pygame.event.get():
         if event.type == pygame.QUIT: